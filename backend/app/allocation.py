@@ -0,0 +1,206 @@
+# backend/app/allocation.py
+
+"""
+Lot-aware allocation of stock to builds and requisitions, and pick lists.
+
+An (item, location) row can hold several lots (``stock_lots``), each with a
+lot number, a quantity, when it was received and optionally when it
+expires. To allocate, each component gets a priority queue (a heap) of its
+lots across all its rows. FEFO orders them by expiry, then receipt; FIFO by
+receipt alone. Ties go to the preferred locations, then to the location's
+place in the depth-first location order, so equal lots are picked along one
+walk. Stock a row holds beyond its lots was received before lots were
+tracked: it has no date and counts as the oldest.
+
+A component pops lots off its queue until its requirement is met: a
+heapify per component plus a pop per lot actually used, and one query for
+the lots of the whole build. The result is a ``Plan``: the picks per
+component, any shortages, and a pick list grouped by location in walk
+order. Its ``plan_id`` hashes the picks, so a plan can be previewed and
+then committed only if re-planning against the stock at commit time comes
+out the same. Committing draws exactly the picked lots.
+"""
+
+import hashlib
+import heapq
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+from app import crud
+from app.database import get_connection
+from app.store import store
+from app.transactions import StockTransaction
+
+POLICIES = ("fefo", "fifo")
+Pick = Tuple[int, Optional[str], int]  # location_id, lot_number (None: untracked stock), quantity
+NO_LOT = {"lot_number": None, "received_at": None, "expires_at": None}
+
+
+def describe_lot(lots: Dict[Tuple[int, int], crud.LotRow], stock_id: int, location_id: int,
+                 lot_number: Optional[str]) -> dict:
+    """A lot's number and dates for responses; a lot received without a number shows as null."""
+    lot = lots.get((stock_id, location_id), {}).get(lot_number) if lot_number is not None else None
+    if lot is None:
+        return dict(NO_LOT)
+    return {"lot_number": lot_number or None, "received_at": lot[0], "expires_at": lot[1]}
+
+
+class Allocator:
+    def __init__(self, rows: Callable[[int], Iterable[Tuple[int, int]]], lots: Dict[Tuple[int, int], crud.LotRow],
+                 policy: str = "fefo", prefer: Sequence[int] = ()):
+        self.rows = rows  # stock id -> (location_id, quantity) rows to draw from
+        self.lots = lots
+        self.policy = policy
+        self.prefer = list(prefer)
+        self.queues: Dict[int, list] = {}
+        self.positions = store.tree.positions()
+        self._places: Dict[int, Tuple[int, int]] = {}  # location id -> (preference rank, position)
+
+    def _place(self, location_id: int) -> Tuple[int, int]:
+        place = self._places.get(location_id)
+        if place is None:
+            rank = next((rank for rank, preferred in enumerate(self.prefer) if store.tree.contains(preferred, location_id)),
+                        len(self.prefer))
+            place = self._places[location_id] = (rank, self.positions.get(location_id, len(self.positions)))
+        return place
+
+    def _key(self, location_id: int, received_at: Optional[str], expires_at: Optional[str]) -> tuple:
+        if self.policy == "fefo":
+            return crud.lot_order(received_at, expires_at) + self._place(location_id)
+        return (received_at or "",) + self._place(location_id)
+
+    def queue(self, stock_id: int) -> list:
+        heap = self.queues.get(stock_id)
+        if heap is None:
+            heap = []
+            for location_id, quantity in self.rows(stock_id):
+                # Lots are capped at what the row holds now; the rest of the row is untracked
+                for lot_number, (received_at, expires_at, units) in self.lots.get((stock_id, location_id), {}).items():
+                    units = min(units, quantity)
+                    if units > 0:
+                        heap.append((self._key(location_id, received_at, expires_at), len(heap), location_id, lot_number, units))
+                        quantity -= units
+                if quantity > 0:
+                    heap.append((self._key(location_id, None, None), len(heap), location_id, None, quantity))
+            heapq.heapify(heap)
+            self.queues[stock_id] = heap
+        return heap
+
+    def take(self, stock_id: int, amount: int) -> Tuple[List[Pick], int]:
+        """``(location_id, lot_number, quantity)`` picks for ``amount``, best first, and what's still missing."""
+        heap = self.queue(stock_id)
+        picks = []
+        while amount > 0 and heap:
+            key, order, location_id, lot_number, available = heapq.heappop(heap)
+            take = min(available, amount)
+            picks.append((location_id, lot_number, take))
+            amount -= take
+            if take < available:
+                heapq.heappush(heap, (key, order, location_id, lot_number, available - take))
+        return picks, amount
+
+
+class Plan:
+    def __init__(self, policy: str, lots: Dict[Tuple[int, int], crud.LotRow]):
+        self.policy = policy
+        self.lots = lots
+        self.required: Dict[int, int] = {}
+        self.picks: Dict[int, List[Pick]] = {}
+        self.missing: Dict[int, int] = {}
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+    @property
+    def plan_id(self) -> str:
+        picks = sorted((stock_id, lid, lot or "", lot is None, qty) for stock_id, rows in self.picks.items() for lid, lot, qty in rows)
+        return hashlib.sha1(f"{self.policy}:{picks}:{sorted(self.missing.items())}".encode()).hexdigest()[:16]
+
+    @property
+    def shortages(self) -> List[dict]:
+        return [
+            {"stock_id": stock_id, "barcode": store.get_item(stock_id).barcode if store.get_item(stock_id) else None,
+             "required": self.required[stock_id], "missing": missing}
+            for stock_id, missing in self.missing.items()
+        ]
+
+    def pick_list(self) -> List[dict]:
+        """One stop per location, in walk order, with every line picked there."""
+        stops: Dict[int, List[dict]] = {}
+        for stock_id, picks in self.picks.items():
+            item = store.get_item(stock_id)
+            for location_id, lot_number, quantity in picks:
+                stops.setdefault(location_id, []).append({
+                    "stock_id": stock_id, "barcode": item.barcode if item else None, "name": item.name if item else None,
+                    "quantity": quantity, **describe_lot(self.lots, stock_id, location_id, lot_number),
+                })
+        return [
+            {"location_id": location_id, "path": " / ".join(loc.name for loc in store.location_path(location_id)),
+             "lines": sorted(stops[location_id], key=lambda line: line["barcode"] or "")}
+            for location_id in sorted(stops, key=store.tree.position)
+        ]
+
+    def as_dict(self) -> dict:
+        allocations = []
+        for stock_id, required in self.required.items():
+            item = store.get_item(stock_id)
+            allocations.append({
+                "stock_id": stock_id, "barcode": item.barcode if item else None, "required": required,
+                "allocated": required - self.missing.get(stock_id, 0),
+                "picks": [{"location_id": lid, "quantity": qty, **describe_lot(self.lots, stock_id, lid, lot)}
+                          for lid, lot, qty in self.picks[stock_id]],
+            })
+        return {
+            "plan_id": self.plan_id, "policy": self.policy, "complete": self.complete,
+            "units": sum(qty for picks in self.picks.values() for _, _, qty in picks),
+            "allocations": allocations, "shortages": self.shortages, "pick_list": self.pick_list(),
+        }
+
+    def stage(self, tx: StockTransaction, action: str, details: dict):
+        """Take the picked lots away and log one entry per component."""
+        for stock_id, picks in self.picks.items():
+            locations: Dict[str, int] = {}
+            for location_id, lot_number, quantity in picks:
+                tx.draw(stock_id, location_id, lot_number, quantity)
+                locations[str(location_id)] = locations.get(str(location_id), 0) + quantity
+            lots = [lot for lot in dict.fromkeys(lot for _, lot, _ in picks) if lot]
+            entry = {**details, "locations": locations}
+            if lots:
+                entry["lots"] = lots
+            tx.log(action, store.get_item(stock_id).barcode, self.required[stock_id], tx.total(stock_id), entry)
+
+
+def _plan(allocator: Allocator, requirements: Dict[int, int]) -> Plan:
+    plan = Plan(allocator.policy, allocator.lots)
+    for stock_id, required in requirements.items():
+        picks, missing = allocator.take(stock_id, required)
+        plan.required[stock_id] = required
+        plan.picks[stock_id] = picks
+        if missing:
+            plan.missing[stock_id] = missing
+    return plan
+
+
+def preview(requirements: Dict[int, int], policy: str = "fefo", prefer: Sequence[int] = ()) -> Plan:
+    """Plan against the stock as it is now, without locking or writing anything."""
+    lots = crud.read_lots(get_connection(), requirements)
+    with store.lock:
+        return _plan(Allocator(store.rows_for_item, lots, policy, prefer), requirements)
+
+
+def plan_in(tx: StockTransaction, requirements: Dict[int, int], policy: str = "fefo", prefer: Sequence[int] = ()) -> Plan:
+    """Plan inside a transaction, against its staged quantities."""
+    def rows(stock_id: int):
+        return [(lid, tx.quantity(stock_id, lid) or 0) for lid in tx.locations(stock_id)]
+
+    return _plan(Allocator(rows, crud.read_lots(get_connection(), requirements), policy, prefer), requirements)
+
+
+def require_complete(plan: Plan):
+    """Fail the request the way the old one-component-at-a-time check did."""
+    if plan.missing:
+        stock_id = next(iter(plan.missing))
+        item = store.get_item(stock_id)
+        raise HTTPException(status_code=400, detail=f"Not enough {item.name if item else stock_id} in stock")
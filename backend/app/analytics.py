@@ -0,0 +1,270 @@
+# backend/app/analytics.py
+
+"""
+Consumption analytics over the stock logs.
+
+The log history is mirrored into NumPy columns (time, barcode code, action
+code, amount). They are read in full on first use. After that, each refresh
+appends only the entries past the last id seen. Consumption per barcode per
+day is kept in a matrix that grows the same way. That makes rates,
+variability, days of cover and reorder points for every item a few array
+operations over a slice of it. Rollups are grouped with np.unique and
+np.bincount over the columns. Results are cached until new entries arrive
+or the day changes.
+
+Consumption means stock leaving for good: consume, scan_remove and scrap,
+plus the negative side of adjust and import. Transfers only move stock
+between locations and are not counted.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.cache import LRUCache
+from app.logstore import log_store, LogRow
+from app.store import store
+
+DAY = 86400
+# 1970-01-01 was a Thursday; shifting by three days makes weeks start on Monday
+WEEK_OFFSET = 3 * DAY
+BUCKETS = {"day": (DAY, 0), "week": (7 * DAY, WEEK_OFFSET)}
+CONSUMING = ("consume", "scan_remove", "scrap")
+SIGNED = ("adjust", "import")  # consumption when the amount is negative
+READ_BATCH = 50000
+
+COLUMNS = {"id": np.int64, "ts": np.int64, "barcode": np.int32, "action": np.int16, "amount": np.int64}
+
+
+def today() -> int:
+    return int(time.time()) // DAY
+
+
+def day_string(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+class LogAnalytics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cache = LRUCache(maxsize=64)
+        self.reset()
+
+    def reset(self):
+        self.size = 0
+        self.first_id: Optional[int] = None
+        self.last_id = 0
+        self.cols = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        self.barcodes: List[str] = []
+        self.barcode_codes: Dict[str, int] = {}
+        self.actions: List[str] = []
+        self.action_codes: Dict[str, int] = {}
+        # daily[code, day - origin] = units of that barcode consumed that day
+        self.origin: Optional[int] = None
+        self.days = 0
+        self.daily = np.zeros((0, 0), np.int64)
+        self.cache.clear()
+
+    def col(self, name: str) -> np.ndarray:
+        return self.cols[name][:self.size]
+
+    # ---------- LOADING ----------
+    def refresh(self):
+        """Pull in the entries appended since the last call."""
+        with self._lock:
+            oldest = log_store.first_id()
+            if self.size and (oldest is None or oldest > self.first_id):
+                # Retention dropped entries we hold; start over
+                self.reset()
+            batch: List[LogRow] = []
+            for row in log_store.iter_rows(after=self.last_id, chunk_size=5000):
+                batch.append(row)
+                if len(batch) >= READ_BATCH:
+                    self._extend(batch)
+                    batch = []
+            if batch:
+                self._extend(batch)
+
+    def _extend(self, rows: Sequence[LogRow]):
+        n = len(rows)
+        ids = np.fromiter((row[0] for row in rows), np.int64, n)
+        ts = np.array([row[1] for row in rows], dtype="datetime64[us]").astype("datetime64[s]").astype(np.int64)
+        barcodes = self._encode([row[2] for row in rows], self.barcodes, self.barcode_codes, np.int32)
+        actions = self._encode([row[3] for row in rows], self.actions, self.action_codes, np.int16)
+        amounts = np.fromiter((row[4] for row in rows), np.int64, n)
+        self._append(id=ids, ts=ts, barcode=barcodes, action=actions, amount=amounts)
+        self._add_daily(ts // DAY, barcodes, self.consumed(actions, amounts))
+        if self.first_id is None:
+            self.first_id = int(ids[0])
+        self.last_id = int(ids[-1])
+        self.cache.clear()
+
+    @staticmethod
+    def _encode(values: List[str], names: List[str], codes: Dict[str, int], dtype) -> np.ndarray:
+        uniques, inverse = np.unique(np.array(values, dtype=object), return_inverse=True)
+        lookup = np.empty(len(uniques), dtype)
+        for i, value in enumerate(uniques):
+            if value not in codes:
+                codes[value] = len(names)
+                names.append(value)
+            lookup[i] = codes[value]
+        return lookup[inverse]
+
+    def _append(self, **new: np.ndarray):
+        need = self.size + len(new["id"])
+        if need > len(self.cols["id"]):
+            capacity = max(need, 2 * len(self.cols["id"]), 1024)
+            for name, arr in self.cols.items():
+                grown = np.empty(capacity, arr.dtype)
+                grown[:self.size] = arr[:self.size]
+                self.cols[name] = grown
+        for name, values in new.items():
+            self.cols[name][self.size:need] = values
+        self.size = need
+
+    def _add_daily(self, days: np.ndarray, barcodes: np.ndarray, consumed: np.ndarray):
+        mask = consumed > 0
+        days, barcodes, consumed = days[mask], barcodes[mask], consumed[mask]
+        if not len(days):
+            return
+        lo = int(days.min()) if self.origin is None else min(self.origin, int(days.min()))
+        hi = max(int(days.max()), (self.origin + self.days - 1) if self.origin is not None else lo)
+        rows, cols = self.daily.shape
+        shift = (self.origin - lo) if self.origin is not None else 0
+        if len(self.barcodes) > rows or hi - lo + 1 > cols or shift:
+            grown = np.zeros((max(len(self.barcodes), 2 * rows), max(hi - lo + 1, 2 * cols)), np.int64)
+            grown[:rows, shift:shift + self.days] = self.daily[:, :self.days]
+            self.daily = grown
+        self.origin, self.days = lo, hi - lo + 1
+        np.add.at(self.daily, (barcodes, days - lo), consumed)
+
+    def consumed(self, actions: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        """Units consumed by each entry (0 for entries that don't consume)."""
+        consuming = np.isin(actions, [self.action_codes[a] for a in CONSUMING if a in self.action_codes])
+        signed = np.isin(actions, [self.action_codes[a] for a in SIGNED if a in self.action_codes])
+        return np.where(consuming, np.abs(amounts), np.where(signed & (amounts < 0), -amounts, 0))
+
+    def window(self, days: int, end: int) -> np.ndarray:
+        """Consumption per barcode for the ``days`` days up to and including ``end``."""
+        out = np.zeros((len(self.barcodes), days), np.int64)
+        if self.origin is None:
+            return out
+        start = end - days + 1
+        lo, hi = max(start, self.origin), min(end, self.origin + self.days - 1)
+        if lo <= hi:
+            rows = min(len(self.barcodes), self.daily.shape[0])
+            out[:rows, lo - start:hi - start + 1] = self.daily[:rows, lo - self.origin:hi - self.origin + 1]
+        return out
+
+    # ---------- RESULTS ----------
+    def _cached(self, key, compute):
+        self.refresh()
+        key = (key, self.last_id, today())
+        result = self.cache.get(key)
+        if result is None:
+            with self._lock:
+                result = compute()
+            self.cache.put(key, result)
+        return result
+
+    def rollup(self, bucket: str = "day", since: Optional[datetime] = None, until: Optional[datetime] = None,
+               barcode: Optional[str] = None, action: Optional[str] = None) -> List[dict]:
+        """Entry count and amount per (bucket, barcode, action)."""
+        return self._cached(("rollup", bucket, since, until, barcode, action),
+                            lambda: self._rollup(bucket, since, until, barcode, action))
+
+    def _rollup(self, bucket, since, until, barcode, action) -> List[dict]:
+        width, offset = BUCKETS[bucket]
+        ts, barcodes, actions, amounts = self.col("ts"), self.col("barcode"), self.col("action"), self.col("amount")
+        mask = np.ones(self.size, bool)
+        if since is not None:
+            mask &= ts >= int(np.datetime64(since, "s").astype(np.int64))
+        if until is not None:
+            mask &= ts < int(np.datetime64(until, "s").astype(np.int64))
+        for value, codes, column in ((barcode, self.barcode_codes, barcodes), (action, self.action_codes, actions)):
+            if value is not None:
+                if value not in codes:
+                    return []
+                mask &= column == codes[value]
+        if not mask.any():
+            return []
+
+        nb, na = len(self.barcodes), len(self.actions)
+        buckets = (ts[mask] + offset) // width
+        keys = (buckets * nb + barcodes[mask]) * na + actions[mask]
+        uniques, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=amounts[mask]).astype(np.int64)
+        starts = (uniques // (na * nb)) * width - offset
+        return [
+            {"bucket": day_string(start // DAY), "barcode": self.barcodes[b], "action": self.actions[a],
+             "count": int(count), "amount": int(total)}
+            for start, b, a, count, total in zip(
+                starts.tolist(), ((uniques // na) % nb).tolist(), (uniques % na).tolist(), counts.tolist(), sums.tolist())
+        ]
+
+    def consumption(self, window: int = 30, lead_time: int = 7, z: float = 1.65) -> Dict[str, dict]:
+        """Per barcode over the last ``window`` days: units consumed, daily rate
+        and its standard deviation, and the reorder point covering ``lead_time``
+        days of demand plus ``z`` deviations of safety stock."""
+        return self._cached(("consumption", window, lead_time, z), lambda: self._consumption(window, lead_time, z))
+
+    def _consumption(self, window, lead_time, z) -> Dict[str, dict]:
+        daily = self.window(window, today())
+        consumed = daily.sum(axis=1)
+        rate = consumed / window
+        std = daily.std(axis=1)
+        reorder = np.ceil(rate * lead_time + z * std * math.sqrt(lead_time)).astype(np.int64)
+        return {
+            self.barcodes[code]: {"consumed": int(consumed[code]), "rate_per_day": round(float(rate[code]), 3),
+                                  "std_per_day": round(float(std[code]), 3), "reorder_point": int(reorder[code])}
+            for code in np.flatnonzero(consumed).tolist()
+        }
+
+    def series(self, barcode: str, days: int = 90, window: int = 7) -> List[dict]:
+        """Daily consumption of one barcode with its rolling ``window``-day average."""
+        return self._cached(("series", barcode, days, window), lambda: self._series(barcode, days, window))
+
+    def _series(self, barcode, days, window) -> List[dict]:
+        end = today()
+        code = self.barcode_codes.get(barcode)
+        row = self.window(days + window - 1, end)[code] if code is not None else np.zeros(days + window - 1, np.int64)
+        sums = np.concatenate(([0], np.cumsum(row)))
+        rolling = (sums[window:] - sums[:-window]) / window
+        values = row[window - 1:]
+        return [
+            {"date": day_string(day), "consumed": int(value), "rolling_rate": round(float(rate), 3)}
+            for day, value, rate in zip(range(end - days + 1, end + 1), values.tolist(), rolling.tolist())
+        ]
+
+
+def reorder_report(window: int = 30, lead_time: int = 7, z: float = 1.65, due_only: bool = True,
+                   limit: Optional[int] = None) -> List[dict]:
+    """Items with recent consumption, most urgent first: on hand, days of cover,
+    reorder point and how many to order to cover another ``window`` days."""
+    stats = analytics.consumption(window, lead_time, z)
+    report = []
+    for barcode, entry in stats.items():
+        item = store.get_by_barcode(barcode)
+        if not item:
+            continue
+        on_hand = store.total_quantity(item.id)
+        rate = entry["rate_per_day"]
+        due = on_hand <= entry["reorder_point"]
+        if due_only and not due:
+            continue
+        report.append({
+            "stock_id": item.id, "barcode": barcode, "name": item.name, "on_hand": on_hand, **entry,
+            "days_of_cover": round(on_hand / rate, 1) if rate else None,
+            "due": due,
+            "order_qty": max(0, math.ceil(entry["reorder_point"] + rate * window - on_hand)) if due else 0,
+        })
+    report.sort(key=lambda row: (row["days_of_cover"] is None, row["days_of_cover"] or 0))
+    return report[:limit] if limit else report
+
+
+analytics = LogAnalytics()
@@ -0,0 +1,197 @@
+# backend/app/bom_engine.py
+
+"""
+Multi-level BOM engine.
+
+A component whose barcode has its own BOM is a sub-assembly. The engine
+keeps a reverse (component -> products) index so a BOM change only
+invalidates the rollups of the products above it, and memoizes each
+product's per-unit leaf requirements; shared sub-assemblies are expanded
+once, in topological order, instead of once per path that reaches them.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.store import store, InventoryStore
+
+
+class BOMEngine:
+    def __init__(self, store: InventoryStore):
+        self.store = store
+        self._parents: Optional[Dict[str, Set[str]]] = None
+        self._leaf_memo: Dict[str, Dict[str, int]] = {}
+        self._order_memo: Dict[str, List[str]] = {}
+        store.subscribe(self._on_change)
+
+    # ---------- INVALIDATION ----------
+    def _on_change(self, kind: str, key):
+        if kind == "bom":
+            for barcode in self.ancestors(key) | {key}:
+                self._leaf_memo.pop(barcode, None)
+                self._order_memo.pop(barcode, None)
+            self._parents = None
+        elif kind == "reset":
+            self._leaf_memo.clear()
+            self._order_memo.clear()
+            self._parents = None
+
+    def parents(self) -> Dict[str, Set[str]]:
+        if self._parents is None:
+            parents: Dict[str, Set[str]] = {}
+            for bom in self.store.iter_boms():
+                for component in bom.components:
+                    parents.setdefault(component, set()).add(bom.product_barcode)
+            self._parents = parents
+        return self._parents
+
+    def ancestors(self, barcode: str) -> Set[str]:
+        parents = self.parents()
+        seen: Set[str] = set()
+        stack = [barcode]
+        while stack:
+            for parent in parents.get(stack.pop(), ()):
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        return seen
+
+    # ---------- VALIDATION ----------
+    def find_cycle(self, product: str, components: Dict[str, int]) -> Optional[List[str]]:
+        """The path that would lead back to ``product`` if it used ``components``."""
+        def children(barcode: str):
+            if barcode == product:
+                return components
+            bom = self.store.get_bom(barcode)
+            return bom.components if bom else {}
+
+        stack: List[Tuple[str, List[str]]] = [(product, [product])]
+        seen: Set[str] = set()
+        while stack:
+            barcode, path = stack.pop()
+            for component in children(barcode):
+                if component == product:
+                    return path + [product]
+                if component not in seen:
+                    seen.add(component)
+                    stack.append((component, path + [component]))
+        return None
+
+    # ---------- ROLLUPS ----------
+    def topological_order(self, barcode: str) -> List[str]:
+        """``barcode`` and every sub-assembly and part below it, each after all its users."""
+        order = self._order_memo.get(barcode)
+        if order is None:
+            visited: Set[str] = set()
+            post: List[str] = []
+            stack: List[Tuple[str, bool]] = [(barcode, False)]
+            while stack:
+                node, done = stack.pop()
+                if done:
+                    post.append(node)
+                    continue
+                if node in visited:
+                    continue
+                visited.add(node)
+                stack.append((node, True))
+                bom = self.store.get_bom(node)
+                for component in (bom.components if bom else ()):
+                    if component not in visited:
+                        stack.append((component, False))
+            order = post[::-1]
+            self._order_memo[barcode] = order
+        return order
+
+    def leaf_requirements(self, barcode: str) -> Dict[str, int]:
+        """Raw parts needed for one unit of ``barcode``, fully exploded."""
+        memo = self._leaf_memo.get(barcode)
+        if memo is not None:
+            return memo
+        # Children first, so each sub-assembly is rolled up once and reused
+        for node in reversed(self.topological_order(barcode)):
+            if node in self._leaf_memo:
+                continue
+            bom = self.store.get_bom(node)
+            if not bom:
+                self._leaf_memo[node] = {node: 1}
+                continue
+            rollup: Dict[str, int] = {}
+            for component, qty in bom.components.items():
+                # A component not rolled up yet closes a cycle (BOMs are
+                # checked on write, but another worker's can slip past):
+                # count it as a part rather than expand it forever
+                for leaf, leaf_qty in self._leaf_memo.get(component, {component: 1}).items():
+                    rollup[leaf] = rollup.get(leaf, 0) + qty * leaf_qty
+            self._leaf_memo[node] = rollup
+        return self._leaf_memo[barcode]
+
+    def on_hand(self, barcode: str) -> int:
+        item = self.store.get_by_barcode(barcode)
+        return self.store.total_quantity(item.id) if item else 0
+
+    def net_requirements(self, barcode: str, quantity: int) -> Dict[str, int]:
+        """Parts to build ``quantity`` units, using on-hand sub-assemblies first (MRP netting)."""
+        gross: Dict[str, int] = {barcode: quantity}
+        shortfall: Dict[str, int] = {}
+        done: Set[str] = set()
+        for node in self.topological_order(barcode):
+            done.add(node)
+            need = gross.get(node, 0)
+            bom = self.store.get_bom(node)
+            if node != barcode:
+                available = self.on_hand(node)
+                if not bom:
+                    shortfall[node] = need
+                    continue
+                need = max(0, need - available)
+                if need == 0:
+                    continue
+            for component, qty in bom.components.items():
+                if component in done:
+                    # Closes a cycle: needed as a part, as in leaf_requirements
+                    shortfall[component] = shortfall.get(component, 0) + need * qty
+                else:
+                    gross[component] = gross.get(component, 0) + need * qty
+        return shortfall
+
+    def _feasible(self, barcode: str, quantity: int) -> bool:
+        return all(need <= self.on_hand(part) for part, need in self.net_requirements(barcode, quantity).items())
+
+    def buildable(self, barcode: str) -> dict:
+        bom = self.store.get_bom(barcode)
+
+        # One level: what POST /stock can consume right now
+        direct = min((self.on_hand(c) // qty for c, qty in bom.components.items() if qty > 0), default=0)
+        direct_limiting = [
+            {"barcode": c, "on_hand": self.on_hand(c), "per_unit": qty, "short_for_next": qty * (direct + 1) - self.on_hand(c)}
+            for c, qty in bom.components.items() if qty > 0 and self.on_hand(c) // qty == direct
+        ]
+
+        # All levels: also build missing sub-assemblies from their parts.
+        # Feasibility is monotone in quantity, so gallop then bisect.
+        low, exploded_limiting = None, []
+        if any(self.leaf_requirements(barcode).values()):
+            low, high = 0, 1
+            while self._feasible(barcode, high):
+                low, high = high, high * 2
+            while high - low > 1:
+                mid = (low + high) // 2
+                if self._feasible(barcode, mid):
+                    low = mid
+                else:
+                    high = mid
+            exploded_limiting = [
+                {"barcode": part, "on_hand": self.on_hand(part), "needed_for_next": need}
+                for part, need in sorted(self.net_requirements(barcode, low + 1).items())
+                if need > self.on_hand(part)
+            ]
+
+        return {
+            "product_barcode": barcode,
+            "max_buildable": direct,
+            "limiting_components": direct_limiting,
+            "max_buildable_exploded": low,
+            "limiting_parts": exploded_limiting,
+        }
+
+
+bom_engine = BOMEngine(store)
@@ -0,0 +1,482 @@
+# backend/app/bulk.py
+
+"""
+Bulk import and export of stock, stock quantities, locations and categories.
+
+Imports are parsed while the body is still arriving. The parser runs in a
+worker thread and pulls each chunk from the event loop as it needs it, so
+even a very large file is never held in memory. Rows are collected into
+batches. Each batch is validated inside one write transaction, against the
+store's lookup dicts (barcodes, location names and ids, category names) and
+against what earlier rows of the same file added. The valid rows of the
+batch are then written together. A bad row doesn't stop the import: it is
+skipped and reported with its line number and the reason. A batch the
+database still refuses (a constraint the checks didn't catch, a write lock
+held past the busy timeout, a full disk) is rolled back whole and ends the
+import; the report says which line was the last one written.
+
+Exports walk the store in id order, a chunk at a time under the store lock,
+and stream CSV or NDJSON without materializing the collection.
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from anyio import from_thread
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app import crud
+from app.changefeed import change_feed
+from app.database import transaction
+from app.models import Stock, Location, CategoryTag
+from app.store import store
+from app.transactions import StockTransaction
+
+FORMATS = ("csv", "ndjson")
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "2000"))
+EXPORT_CHUNK_ROWS = 1000
+# The report lists this many failed rows; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+STOCK_COLUMNS = tuple(Stock.model_fields)
+STOCK_LOCATION_COLUMNS = ("stock_id", "barcode", "location_id", "location", "quantity")
+# ``parent`` names the enclosing location, so a file can be imported into another database
+LOCATION_COLUMNS = tuple(Location.model_fields) + ("parent",)
+CATEGORY_COLUMNS = tuple(CategoryTag.model_fields)
+
+Record = Dict[str, object]
+
+
+class RowError(ValueError):
+    pass
+
+
+def describe(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in exc.errors())
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return str(exc)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.aborted: Optional[str] = None
+
+    def error(self, line: int, exc: Exception):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": describe(exc)})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows, "created": self.created, "updated": self.updated,
+            "unchanged": self.unchanged, "failed": self.failed,
+            # Rows are checked a batch at a time, not strictly in file order
+            "errors": sorted(self.errors, key=lambda err: err["line"]),
+            "errors_truncated": self.failed > len(self.errors), "aborted": self.aborted,
+        }
+
+
+# ---------- READING ----------
+class BodyStream(io.RawIOBase):
+    """Blocking file over a request body, for parsing in a worker thread;
+    each read waits on the event loop for the next chunk from the client."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = memoryview(from_thread.run(self._chunks.__anext__))
+            except StopAsyncIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def iter_records(raw: io.RawIOBase, format: str) -> Iterator[Tuple[int, object]]:
+    """``(line, record)`` pairs; blank values are left out so defaults apply.
+    A record that isn't an object is passed through for the caller to reject."""
+    text = io.TextIOWrapper(io.BufferedReader(raw, 64 * 1024), encoding="utf-8-sig", newline="")
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {
+                key.strip(): value.strip() for key, value in row.items()
+                if key is not None and value is not None and value.strip()
+            }
+        return
+    for line, raw_line in enumerate(text, 1):
+        if not raw_line.strip():
+            continue
+        try:
+            record = json.loads(raw_line)
+        except ValueError:
+            yield line, RowError("Not valid JSON")
+            continue
+        if isinstance(record, dict):
+            record = {key: value for key, value in record.items() if value is not None and value != ""}
+        yield line, record
+
+
+def run_import(raw: io.RawIOBase, importer: "Importer", format: str) -> dict:
+    """Parse and apply a whole upload; runs in a worker thread."""
+    report = ImportReport()
+    batch: List[Tuple[int, Record]] = []
+    line = 0
+    committed = 0  # Last line of the last batch written
+    try:
+        try:
+            for line, record in iter_records(raw, format):
+                report.rows += 1
+                if isinstance(record, Exception):
+                    report.error(line, record)
+                elif not isinstance(record, dict):
+                    report.error(line, RowError("Each line must be a JSON object"))
+                else:
+                    batch.append((line, record))
+                if len(batch) >= IMPORT_BATCH_ROWS:
+                    apply_batch(importer, batch, report)
+                    committed, batch = batch[-1][0], []
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # Batches before this point are already in; say where we stopped
+            report.aborted = f"Unreadable input after line {line}: {exc}"
+        if batch:
+            apply_batch(importer, batch, report)
+    except sqlite3.DatabaseError as exc:
+        written = f"the last line imported is {committed}" if committed else "nothing was imported"
+        report.aborted = f"Lines {batch[0][0]}-{batch[-1][0]} were rolled back ({exc}); {written}"
+    return report.as_dict()
+
+
+def apply_batch(importer: "Importer", batch: List[Tuple[int, Record]], report: ImportReport):
+    """Apply one batch; if the database rejects it, none of its rows count as written."""
+    counts = (report.created, report.updated, report.unchanged)
+    try:
+        importer.apply(batch, report)
+    except sqlite3.DatabaseError:
+        report.created, report.updated, report.unchanged = counts
+        raise
+
+
+def _int(record: Record, name: str) -> int:
+    try:
+        value = record[name]
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if isinstance(value, bool) or isinstance(value, float):
+            raise ValueError
+        return int(value)
+    except KeyError:
+        raise RowError(f"{name} is required")
+    except (TypeError, ValueError):
+        raise RowError(f"{name} must be a whole number")
+
+
+def _barcode(record: Record) -> str:
+    return str(record.get("barcode", "")).strip()
+
+
+def _location_id(record: Record) -> int:
+    """Location named by ``location`` (name or id) or ``location_id``."""
+    key = record.get("location", record.get("location_id"))
+    if key is None:
+        raise RowError("location is required")
+    matches = store.match_locations(str(key).strip())
+    if not matches:
+        raise RowError(f"Location {key} not found")
+    return matches[0]
+
+
+# ---------- IMPORTERS ----------
+class Importer:
+    """Applies batches of one kind of record; instances live for one upload."""
+
+    def __init__(self, upsert: bool = False):
+        self.upsert = upsert
+        # Natural key -> line that first used it, across the whole file
+        self.seen: Dict[str, int] = {}
+
+    def apply(self, batch: List[Tuple[int, Record]], report: ImportReport):
+        raise NotImplementedError
+
+    def claim(self, key: str, label: str, line: int):
+        first = self.seen.setdefault(key, line)
+        if first != line:
+            raise RowError(f"{label} is already used on line {first}")
+
+
+class StockImporter(Importer):
+    """Items keyed by barcode. Optional ``location`` and ``quantity`` columns
+    give a new item its starting quantity (or set it, when upserting).
+    Imported items don't consume BOM components."""
+
+    def apply(self, batch, report):
+        existing = [store.barcodes.get(_barcode(record)) for _, record in batch]
+        with StockTransaction(sid for sid in existing if sid is not None) as tx:
+            for line, record in batch:
+                try:
+                    self._stage(tx, line, dict(record), report)
+                except (RowError, ValidationError, HTTPException) as exc:
+                    report.error(line, exc)
+
+    def _stage(self, tx: StockTransaction, line: int, record: Record, report: ImportReport):
+        record.pop("id", None)
+        placement = None
+        if "location" in record or "location_id" in record or "quantity" in record:
+            placement = (_location_id(record), _int(record, "quantity"))
+            if placement[1] < 0:
+                raise RowError("quantity cannot be negative")
+        for name in ("location", "location_id", "quantity"):
+            record.pop(name, None)
+
+        barcode = record["barcode"] = _barcode(record)
+        if not barcode:
+            raise RowError("barcode is required")
+        current = store.get_by_barcode(barcode)
+        if current:
+            merged = Stock.model_validate({**current.model_dump(), **record})
+            self.claim(barcode, f"Barcode {barcode}", line)
+            if not self.upsert:
+                raise RowError("Item with this barcode already exists")
+            fields = merged.model_dump(include=set(record) - {"id"})
+            if fields:
+                tx.update(current.id, **fields)
+            if placement:
+                tx.set_quantity(current.id, *placement)
+            total = tx.total(current.id)
+            tx.log("update", barcode, total, total, {"updated_item": current.id, "source": "import"})
+            report.updated += 1
+        else:
+            item = Stock.model_validate(record)
+            self.claim(barcode, f"Barcode {barcode}", line)
+            quantities = [placement] if placement else []
+            qty = placement[1] if placement else 0
+            tx.create(item, quantities)
+            tx.log("create", barcode, qty, qty, {"source": "import"})
+            report.created += 1
+
+
+class StockLocationImporter(Importer):
+    """Quantities per (item, location): ``barcode`` or ``stock_id``,
+    ``location`` (name or id) or ``location_id``, and ``quantity``, which
+    replaces the current amount or, with mode ``add``, is added to it."""
+
+    def __init__(self, mode: str = "set"):
+        super().__init__()
+        self.mode = mode
+
+    def apply(self, batch, report):
+        resolved = []
+        for line, record in batch:
+            try:
+                resolved.append((line, self._item_id(record)))
+            except RowError as exc:
+                report.error(line, exc)
+        records = dict(batch)
+        with StockTransaction(sid for _, sid in resolved) as tx:
+            for line, stock_id in resolved:
+                try:
+                    self._stage(tx, line, stock_id, records[line], report)
+                except (RowError, HTTPException) as exc:
+                    report.error(line, exc)
+
+    @staticmethod
+    def _item_id(record: Record) -> int:
+        if "stock_id" in record:
+            stock_id = _int(record, "stock_id")
+        elif "barcode" in record:
+            stock_id = store.barcodes.get(_barcode(record))
+            if stock_id is None:
+                raise RowError(f"Item {record['barcode']} not found")
+        else:
+            raise RowError("barcode or stock_id is required")
+        return stock_id
+
+    def _stage(self, tx: StockTransaction, line: int, stock_id: int, record: Record, report: ImportReport):
+        item = store.get_item(stock_id)
+        if not item:
+            raise RowError(f"Item {stock_id} not found")
+        location_id = _location_id(record)
+        amount = _int(record, "quantity")
+        self.claim(f"{stock_id}:{location_id}", f"Item {item.barcode} at location {location_id}", line)
+
+        before = tx.quantity(stock_id, location_id)
+        new_qty = (before or 0) + amount if self.mode == "add" else amount
+        if before is not None and new_qty == before:
+            report.unchanged += 1
+            return
+        tx.set_quantity(stock_id, location_id, new_qty)
+        tx.log("import", item.barcode, new_qty - (before or 0), new_qty, {"location_id": location_id})
+        if before is None:
+            report.created += 1
+        else:
+            report.updated += 1
+
+
+class LocationImporter(Importer):
+    """Locations keyed by name (case-insensitive). The enclosing location is
+    given by name in ``parent`` (which may be created earlier in the same
+    file) or by ``parent_id``."""
+
+    def __init__(self, upsert: bool = False):
+        super().__init__(upsert)
+        # Lowercase name -> id of locations this upload wrote; the store only
+        # sees them once their batch commits
+        self.ids: Dict[str, int] = {}
+
+    def _parent_id(self, record: Record) -> Optional[int]:
+        name = record.pop("parent", None)
+        if name is None:
+            if record.get("parent_id") is None:
+                return None
+            parent_id = _int(record, "parent_id")
+            if not store.get_location(parent_id) and parent_id not in self.ids.values():
+                raise RowError(f"Parent location {parent_id} not found")
+            return parent_id
+        name = str(name).strip()
+        parent_id = self.ids.get(name.lower())
+        if parent_id is None:
+            parent = store.get_location_by_name(name)
+            if not parent:
+                raise RowError(f"Parent location {name} not found")
+            parent_id = parent.id
+        return parent_id
+
+    def apply(self, batch, report):
+        with transaction():
+            change_feed.catch_up()
+            for line, record in batch:
+                try:
+                    record = {k: v for k, v in record.items() if k != "id"}
+                    record["parent_id"] = self._parent_id(record)
+                    location = Location.model_validate(record)
+                    self.claim(location.name.lower(), f"Location {location.name}", line)
+                    current = store.get_location_by_name(location.name)
+                    if current and not self.upsert:
+                        raise RowError("Location with this name already exists")
+                    if current and location.parent_id is not None and store.tree.contains(current.id, location.parent_id):
+                        raise RowError("A location can't be placed inside itself or its own sub-locations")
+                except (RowError, ValidationError) as exc:
+                    report.error(line, exc)
+                    continue
+                location.id = current.id if current else None
+                crud.save_location(location)
+                self.ids[location.name.lower()] = location.id
+                if current:
+                    report.updated += 1
+                else:
+                    report.created += 1
+
+
+class CategoryImporter(Importer):
+    """Categories keyed by name (case-insensitive)."""
+
+    def apply(self, batch, report):
+        with transaction():
+            change_feed.catch_up()
+            for line, record in batch:
+                try:
+                    record = {k: v for k, v in record.items() if k != "id"}
+                    cat = CategoryTag.model_validate(record)
+                    self.claim(cat.name.lower(), f"Category {cat.name}", line)
+                    current = store.get_category_by_name(cat.name)
+                    if current and not self.upsert:
+                        raise RowError("Category already exists")
+                except (RowError, ValidationError) as exc:
+                    report.error(line, exc)
+                    continue
+                cat.id = current.id if current else None
+                crud.save_category(cat)
+                if current:
+                    report.updated += 1
+                else:
+                    report.created += 1
+
+
+# ---------- EXPORT ----------
+def _stock_pages() -> Iterator[List[Stock]]:
+    """All items in id order, a page at a time, each read under the store lock."""
+    cursor = None
+    while True:
+        with store.lock:
+            page = list(islice(store.iter_sorted("id", after=cursor), EXPORT_CHUNK_ROWS))
+            rows = [(item, [(lid, qty, store.get_location(lid)) for lid, qty in store.rows_for_item(item.id)])
+                    for item in page]
+        if not page:
+            return
+        yield rows
+        cursor = (page[-1].id, page[-1].id)
+
+
+def stock_records() -> Iterator[List[Record]]:
+    for page in _stock_pages():
+        yield [item.model_dump() for item, _ in page]
+
+
+def stock_location_records() -> Iterator[List[Record]]:
+    for page in _stock_pages():
+        records = []
+        for item, rows in page:
+            for location_id, quantity, location in rows:
+                records.append({
+                    "stock_id": item.id, "barcode": item.barcode, "location_id": location_id,
+                    "location": location.name if location else None, "quantity": quantity,
+                })
+        yield records
+
+
+def location_records() -> Iterator[List[Record]]:
+    """Locations depth-first, so every parent comes before its children."""
+    with store.lock:
+        records = []
+        for root in store.tree.children(None):
+            for location_id in store.tree.subtree(root):
+                loc = store.get_location(location_id)
+                parent = store.get_location(loc.parent_id) if loc.parent_id is not None else None
+                records.append({**loc.model_dump(), "parent": parent.name if parent else None})
+    yield records
+
+
+def category_records() -> Iterator[List[Record]]:
+    with store.lock:
+        records = [cat.model_dump() for cat in store.iter_categories()]
+    yield records
+
+
+def export(pages: Iterator[List[Record]], columns: Tuple[str, ...], format: str) -> Iterator[bytes]:
+    if format == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for records in pages:
+            writer.writerows(records)
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue().encode()
+        return
+    for records in pages:
+        if records:
+            yield "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode()
@@ -0,0 +1,202 @@
+# backend/app/changefeed.py
+
+"""
+Cross-worker change feed.
+
+Every write in ``app.crud`` appends ``(entity, key, op)`` to the
+``change_events`` table inside the same transaction, so the feed is totally
+ordered by ``seq`` and never mentions a change that didn't commit. Each
+worker process follows the feed: after its own commits, from a background
+poller that wakes when ``PRAGMA data_version`` says another connection
+committed, and at the start of every ``StockTransaction``. Applying an event
+re-reads the record from SQLite, so replays are idempotent and several
+events for the same record collapse into one read.
+
+That lets ``uvicorn --workers N`` serve reads from N in-memory stores while
+all writes stay serialized by SQLite. No broker is needed; the database file
+is the bus.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app import crud
+from app.database import get_connection, transaction
+from app.store import store, InventoryStore
+
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS", "0.2"))
+# Events kept for lagging workers and ?since= clients; older ones are trimmed
+CHANGE_FEED_RETAIN = int(os.getenv("CHANGE_FEED_RETAIN", "100000"))
+TRIM_EVERY_POLLS = 300
+# A batch touching at least this many records, and a sizeable share of the
+# store, rebuilds the sorted and search indexes once instead of per record
+BULK_APPLY = 1000
+ENTITIES = ("stock", "rows", "location", "category", "bom", "log")
+Event = Tuple[int, str, str, str]  # seq, entity, key, op
+
+
+class ChangeFeed:
+    def __init__(self, store: InventoryStore):
+        self.store = store
+        self.position = 0
+        # Last event applied per entity, so unrelated changes keep other ETags valid
+        self.versions: Dict[str, int] = dict.fromkeys(ENTITIES, 0)
+        self.listeners: List[Callable[[Optional[List[Event]]], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        crud.on_change(self.catch_up)
+
+    def subscribe(self, listener: Callable[[Optional[List[Event]]], None]):
+        """Call ``listener(events)`` with each batch applied, in order; None after a full reload."""
+        self.listeners.append(listener)
+
+    @staticmethod
+    def head(conn=None) -> int:
+        conn = conn or get_connection()
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_events").fetchone()[0]
+
+    def load(self):
+        """Rebuild the store from the tables and follow the feed from here on."""
+        conn = get_connection()
+        with self.store.lock:
+            position = self.head(conn)
+            crud.load_store()
+            self.position = position
+            self.versions = dict.fromkeys(ENTITIES, position)
+            for listener in self.listeners:
+                listener(None)
+
+    def catch_up(self) -> int:
+        """Apply every event past our position; returns how many there were."""
+        conn = get_connection()
+        with self.store.lock:
+            events = conn.execute(
+                "SELECT seq, entity, key, op FROM change_events WHERE seq > ? ORDER BY seq", (self.position,)
+            ).fetchall()
+            if not events:
+                return 0
+            if events[0][0] > self.position + 1:
+                # Sequence numbers have no holes, so this means the events we
+                # missed were trimmed away: start over from the tables
+                self.load()
+                return len(events)
+            changed = list(dict.fromkeys((entity, key) for _, entity, key, _ in events))
+            bulk = len(changed) >= max(BULK_APPLY, len(self.store.items) // 4)
+            with self.store.bulk_load() if bulk else nullcontext():
+                self._apply(conn, changed)
+            for seq, entity, _, _ in events:
+                self.versions[entity] = seq
+            self.position = events[-1][0]
+            for listener in self.listeners:
+                listener(events)
+        return len(events)
+
+    def _apply(self, conn, changed: List[Tuple[str, str]]):
+        """Reload the changed records from the tables, stock ones in a few batched reads."""
+        stock_ids = [int(key) for entity, key in changed if entity == "stock"]
+        row_ids = [int(key) for entity, key in changed if entity in ("stock", "rows")]
+        items = crud.read_items(conn, stock_ids) if stock_ids else {}
+        rows = crud.read_rows(conn, row_ids) if row_ids else {}
+
+        for entity, key in changed:
+            if entity == "stock":
+                stock_id = int(key)
+                item = items.get(stock_id)
+                if item is None:
+                    self.store.remove_item(stock_id)
+                    continue
+                if self.store.get_item(stock_id):
+                    self.store.update_item(stock_id, item.model_dump())
+                else:
+                    self.store.add_item(item)
+                self.store.replace_rows(stock_id, rows.get(stock_id, ()))
+            elif entity == "rows":
+                stock_id = int(key)
+                if self.store.get_item(stock_id):
+                    self.store.replace_rows(stock_id, rows.get(stock_id, ()))
+            elif entity == "location":
+                location = crud.read_location(conn, int(key))
+                if location is None:
+                    self.store.remove_location(int(key))
+                else:
+                    self.store.put_location(location)
+            elif entity == "category":
+                cat = crud.read_category(conn, int(key))
+                if cat is None:
+                    self.store.remove_category(int(key))
+                else:
+                    self.store.put_category(cat)
+            elif entity == "bom":
+                bom = crud.read_bom(conn, key)
+                if bom is None:
+                    self.store.remove_bom(key)
+                else:
+                    self.store.put_bom(bom)
+
+    def events_between(self, since: int, until: int) -> Optional[List[Event]]:
+        """Events in ``(since, until]``; None if some of them were already trimmed."""
+        conn = get_connection()
+        oldest = conn.execute("SELECT MIN(seq) FROM change_events").fetchone()[0]
+        if since < until and (oldest is None or oldest > since + 1):
+            return None
+        return conn.execute(
+            "SELECT seq, entity, key, op FROM change_events WHERE seq > ? AND seq <= ? ORDER BY seq", (since, until)
+        ).fetchall()
+
+    def changed_since(self, since: int, until: int, entities: Iterable[str]) -> Optional[List[Tuple[str, str]]]:
+        """Distinct ``(entity, key)`` pairs changed in ``(since, until]``; None if
+        some of those events were already trimmed."""
+        conn = get_connection()
+        entities = tuple(entities)
+        oldest = conn.execute("SELECT MIN(seq) FROM change_events").fetchone()[0]
+        if since < until and (oldest is None or oldest > since + 1):
+            return None
+        rows = conn.execute(
+            f"SELECT entity, key FROM change_events WHERE seq > ? AND seq <= ? "
+            f"AND entity IN ({', '.join('?' * len(entities))}) ORDER BY seq",
+            (since, until, *entities),
+        )
+        return list(dict.fromkeys(rows))
+
+    def trim(self) -> int:
+        if not CHANGE_FEED_RETAIN:
+            return 0
+        with transaction() as conn:
+            cur = conn.execute("DELETE FROM change_events WHERE seq <= ?", (self.head(conn) - CHANGE_FEED_RETAIN,))
+        return cur.rowcount
+
+    # ---------- POLLER ----------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        conn = get_connection()
+        version = None
+        polls = 0
+        while not self._stop.wait(CHANGE_POLL_SECONDS):
+            try:
+                # Changes whenever another connection (or process) commits
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current != version:
+                    version = current
+                    self.catch_up()
+                polls += 1
+                if polls % TRIM_EVERY_POLLS == 0:
+                    self.trim()
+            except sqlite3.OperationalError:
+                # Busy or locked; try again on the next tick
+                continue
+
+
+change_feed = ChangeFeed(store)
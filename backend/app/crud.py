@@ -0,0 +1,420 @@
+# backend/app/crud.py
+
+"""
+Persistence operations used by the routers.
+
+Every write goes to SQLite together with a row in the ``change_events``
+feed, in the same transaction. The in-memory store is never written
+directly: once the transaction commits, the change feed replays the new
+events by re-reading the touched records, which is the same path that
+picks up writes made by other worker processes (see app/changefeed.py).
+A write that is part of a transaction that rolls back never reaches it.
+``load_store`` rebuilds the cache at startup straight from the tables,
+using ``model_construct`` to skip re-validating rows we wrote.
+"""
+
+import json
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.database import get_connection, on_commit, transaction
+from app.models import Stock, Location, CategoryTag, BOM, StockLog, StockLot
+from app.store import store
+from app.logstore import log_store
+from app import uploads
+from app.timeutil import utcnow
+
+STOCK_COLUMNS = tuple(Stock.model_fields)
+LOCATION_COLUMNS = tuple(Location.model_fields)
+
+INSERT_STOCK = f"INSERT INTO stock ({', '.join(STOCK_COLUMNS)}) VALUES ({', '.join('?' * len(STOCK_COLUMNS))})"
+UPSERT_QUANTITY = (
+    "INSERT INTO stock_locations (stock_id, location_id, quantity) VALUES (?, ?, ?) "
+    "ON CONFLICT (stock_id, location_id) DO UPDATE SET quantity = excluded.quantity"
+)
+INSERT_LOT = (
+    "INSERT INTO stock_lots (stock_id, location_id, lot_number, received_at, expires_at, quantity) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+CLEAR_LOTS = "DELETE FROM stock_lots WHERE stock_id = ? AND location_id = ?"
+LotRow = Dict[str, list]  # lot_number -> [received_at, expires_at, quantity]
+LotDraws = Dict[Tuple[int, int], Dict[Optional[str], int]]  # (stock_id, location_id) -> lot_number (None: untracked) -> units
+
+
+# ---------- STARTUP ----------
+def load_store():
+    """Bulk-load every table into the in-memory store."""
+    store.clear()
+    with store.bulk_load():
+        _load_tables(get_connection())
+
+
+def _load_tables(conn):
+    cur = conn.execute(f"SELECT {', '.join(STOCK_COLUMNS)} FROM stock ORDER BY id")
+    for values in cur:
+        store.add_item(Stock.model_construct(**dict(zip(STOCK_COLUMNS, values))))
+
+    # Straight into arrays; the store builds its quantity matrix from them in one go
+    cur = conn.execute("SELECT stock_id, location_id, quantity FROM stock_locations")
+    chunks = [np.zeros((0, 3), np.int64)]
+    while True:
+        batch = cur.fetchmany(100000)
+        if not batch:
+            break
+        chunks.append(np.array(batch, np.int64))
+    rows = np.concatenate(chunks)
+    store.load_rows(rows[:, 0], rows[:, 1], rows[:, 2])
+
+    cur = conn.execute(f"SELECT {', '.join(LOCATION_COLUMNS)} FROM locations ORDER BY id")
+    for values in cur:
+        store.put_location(Location.model_construct(**dict(zip(LOCATION_COLUMNS, values))))
+
+    for cat_id, name, color in conn.execute("SELECT id, name, color FROM categories ORDER BY id"):
+        store.put_category(CategoryTag.model_construct(id=cat_id, name=name, color=color))
+
+    for barcode, description, components in conn.execute("SELECT product_barcode, description, components FROM boms"):
+        store.put_bom(BOM.model_construct(product_barcode=barcode, description=description, components=json.loads(components)))
+
+
+# ---------- CHANGE EVENTS ----------
+_change_hooks: List[Callable[[], None]] = []
+
+
+def on_change(hook: Callable[[], None]):
+    """Call ``hook()`` after every transaction that published events."""
+    _change_hooks.append(hook)
+
+
+def _changed():
+    for hook in _change_hooks:
+        hook()
+
+
+def publish(conn, entity: str, key, op: str = "put"):
+    """Record that ``entity``/``key`` changed; entity is stock, rows, location, category,
+    bom or log (key ``first-last`` log ids)."""
+    conn.execute("INSERT INTO change_events (entity, key, op) VALUES (?, ?, ?)", (entity, str(key), op))
+    on_commit(_changed)
+
+
+def read_items(conn, stock_ids: Iterable[int]) -> Dict[int, Stock]:
+    found = {}
+    for chunk in _chunks(list(stock_ids)):
+        sql = f"SELECT {', '.join(STOCK_COLUMNS)} FROM stock WHERE id IN ({', '.join('?' * len(chunk))})"
+        for values in conn.execute(sql, chunk):
+            item = Stock.model_construct(**dict(zip(STOCK_COLUMNS, values)))
+            found[item.id] = item
+    return found
+
+
+def read_rows(conn, stock_ids: Iterable[int]) -> Dict[int, List[Tuple[int, int]]]:
+    found: Dict[int, List[Tuple[int, int]]] = {}
+    for chunk in _chunks(list(stock_ids)):
+        sql = f"SELECT stock_id, location_id, quantity FROM stock_locations WHERE stock_id IN ({', '.join('?' * len(chunk))})"
+        for stock_id, location_id, quantity in conn.execute(sql, chunk):
+            found.setdefault(stock_id, []).append((location_id, quantity))
+    return found
+
+
+def _chunks(values: list, size: int = 500):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def read_location(conn, location_id: int) -> Optional[Location]:
+    values = conn.execute(f"SELECT {', '.join(LOCATION_COLUMNS)} FROM locations WHERE id = ?", (location_id,)).fetchone()
+    return Location.model_construct(**dict(zip(LOCATION_COLUMNS, values))) if values else None
+
+
+def read_category(conn, cat_id: int) -> Optional[CategoryTag]:
+    values = conn.execute("SELECT id, name, color FROM categories WHERE id = ?", (cat_id,)).fetchone()
+    return CategoryTag.model_construct(id=values[0], name=values[1], color=values[2]) if values else None
+
+
+def read_bom(conn, product_barcode: str) -> Optional[BOM]:
+    values = conn.execute("SELECT description, components FROM boms WHERE product_barcode = ?", (product_barcode,)).fetchone()
+    if not values:
+        return None
+    return BOM.model_construct(product_barcode=product_barcode, description=values[0], components=json.loads(values[1]))
+
+
+# ---------- STOCK ----------
+def create_item(item: Stock, quantities: Iterable[Tuple[int, int]]) -> Stock:
+    quantities = list(quantities)
+    values = item.model_dump()
+    values["id"] = None
+    with transaction() as conn:
+        cur = conn.execute(INSERT_STOCK, tuple(values[c] for c in STOCK_COLUMNS))
+        item.id = cur.lastrowid
+        merged = _merged(item.id, quantities)
+        conn.executemany(UPSERT_QUANTITY, merged)
+        _track_lots(conn, merged, {})
+        uploads.add_refs(conn, (item.image_url, item.file_url))
+        publish(conn, "stock", item.id)
+    return item
+
+
+def update_item(item_id: int, fields: dict, quantities: Optional[Iterable[Tuple[int, int]]] = None) -> Stock:
+    if quantities is not None:
+        quantities = list(quantities)
+    with transaction() as conn:
+        attached = [name for name in ("image_url", "file_url") if name in fields]
+        if attached:
+            old = conn.execute(f"SELECT {', '.join(attached)} FROM stock WHERE id = ?", (item_id,)).fetchone()
+            changed = [(before, fields[name]) for name, before in zip(attached, old or ()) if before != fields[name]]
+            uploads.release_refs(conn, (before for before, _ in changed))
+            uploads.add_refs(conn, (after for _, after in changed))
+        if fields:
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            conn.execute(f"UPDATE stock SET {assignments} WHERE id = ?", (*fields.values(), item_id))
+        if quantities is not None:
+            merged = _merged(item_id, quantities)
+            before = {(item_id, location_id): quantity for location_id, quantity in read_rows(conn, [item_id]).get(item_id, [])}
+            conn.execute("DELETE FROM stock_locations WHERE stock_id = ?", (item_id,))
+            conn.executemany(UPSERT_QUANTITY, merged)
+            # Rows left out of the replacement are emptied
+            kept = {location_id for _, location_id, _ in merged}
+            merged += [(item_id, location_id, 0) for _, location_id in before if location_id not in kept]
+            _track_lots(conn, merged, before)
+        publish(conn, "stock", item_id)
+    return store.get_item(item_id)
+
+
+def delete_item(item_id: int) -> Optional[Stock]:
+    """Delete an item and its rows; returns the item as it was, None if there was none."""
+    with transaction() as conn:
+        deleted = read_items(conn, [item_id]).get(item_id)
+        attached = conn.execute("SELECT image_url, file_url FROM stock WHERE id = ?", (item_id,)).fetchone()
+        uploads.release_refs(conn, attached or ())
+        conn.execute("DELETE FROM stock_locations WHERE stock_id = ?", (item_id,))
+        conn.execute("DELETE FROM stock_lots WHERE stock_id = ?", (item_id,))
+        conn.execute("DELETE FROM stock WHERE id = ?", (item_id,))
+        publish(conn, "stock", item_id, "delete")
+    return deleted
+
+
+def set_quantities(changes: Iterable[Tuple[int, int, int]], draws: Optional[LotDraws] = None,
+                   moves: Iterable[Tuple[int, int, int, int]] = ()):
+    """Upsert ``(stock_id, location_id, quantity)`` rows. ``draws`` names the
+    lots to take first where a row goes down; ``moves`` are ``(stock_id,
+    from_location, to_location, quantity)`` transfers, whose stock keeps its lots."""
+    changes = list(changes)
+    with transaction() as conn:
+        rows = read_rows(conn, dict.fromkeys(stock_id for stock_id, _, _ in changes))
+        before = {(stock_id, location_id): quantity for stock_id, held in rows.items() for location_id, quantity in held}
+        conn.executemany(UPSERT_QUANTITY, changes)
+        _track_lots(conn, changes, before, draws, moves)
+        for stock_id in dict.fromkeys(stock_id for stock_id, _, _ in changes):
+            publish(conn, "rows", stock_id)
+
+
+# ---------- LOTS ----------
+# Each location holds any number of lots, each with its own quantity. Stock
+# taken away comes out of the lots the caller names, then in FEFO order;
+# untracked stock (held from before lots were kept) has no dates and goes
+# first among the lots that don't expire. Stock added arrives as the item's
+# current lot_number, received now; topping up a lot keeps its dates. Lots
+# aren't cached in the store: allocation reads the few it needs straight
+# from the table, so lot writes publish no change events.
+
+
+def lot_order(received_at: Optional[str], expires_at: Optional[str]) -> tuple:
+    """FEFO: soonest expiry first, lots that never expire last, oldest receipt first within those."""
+    return (expires_at is None, expires_at or "", received_at or "")
+
+
+def read_lots(conn, stock_ids: Iterable[int]) -> Dict[Tuple[int, int], LotRow]:
+    """The lots of each ``(stock_id, location_id)``, dates as ISO text, in FEFO order."""
+    found: Dict[Tuple[int, int], LotRow] = {}
+    for chunk in _chunks(list(stock_ids)):
+        sql = (f"SELECT stock_id, location_id, lot_number, received_at, expires_at, quantity FROM stock_lots "
+               f"WHERE stock_id IN ({', '.join('?' * len(chunk))}) ORDER BY expires_at IS NULL, expires_at, received_at")
+        for stock_id, location_id, lot_number, received_at, expires_at, quantity in conn.execute(sql, chunk):
+            found.setdefault((stock_id, location_id), {})[lot_number] = [received_at, expires_at, quantity]
+    return found
+
+
+def _draw(lots: LotRow, held: int, amount: int, named: Dict[Optional[str], int]) -> List[tuple]:
+    """Take ``amount`` out of a location's lots; returns ``(lot_number, received_at, expires_at, quantity)``
+    parts, with lot_number None for untracked stock."""
+    lots[None] = [None, None, max(0, held - sum(lot[2] for lot in lots.values()))]
+    order = [(lot_number, units) for lot_number, units in named.items() if lot_number in lots]
+    order += [(lot_number, amount) for lot_number in sorted(lots, key=lambda lot_number: lot_order(*lots[lot_number][:2]))]
+    parts = []
+    for lot_number, units in order:
+        lot = lots[lot_number]
+        take = min(lot[2], units, amount)
+        if take > 0:
+            lot[2] -= take
+            amount -= take
+            parts.append((lot_number, lot[0], lot[1], take))
+    del lots[None]
+    return parts
+
+
+def _track_lots(conn, changes: List[Tuple[int, int, int]], before: Dict[Tuple[int, int], int],
+                draws: Optional[LotDraws] = None, moves: Iterable[Tuple[int, int, int, int]] = ()):
+    """Bring the lots of the changed rows in line with their new quantities."""
+    draws = draws or {}
+    lots = read_lots(conn, {stock_id for stock_id, _, _ in changes})
+    taken: Dict[Tuple[int, int], List[tuple]] = {}
+    for stock_id, location_id, quantity in changes:
+        held = before.get((stock_id, location_id), 0)
+        if quantity < held:
+            row = lots.setdefault((stock_id, location_id), {})
+            taken[(stock_id, location_id)] = _draw(row, held, held - quantity, draws.get((stock_id, location_id), {}))
+
+    # What a transfer takes out of one location arrives at the other as the same lots
+    carried: Dict[Tuple[int, int], List[tuple]] = {}
+    for stock_id, source, target, quantity in moves:
+        parts = taken.get((stock_id, source), [])
+        while quantity > 0 and parts:
+            lot_number, received_at, expires_at, units = parts[0]
+            take = min(units, quantity)
+            carried.setdefault((stock_id, target), []).append((lot_number, received_at, expires_at, take))
+            quantity -= take
+            if take == units:
+                parts.pop(0)
+            else:
+                parts[0] = (lot_number, received_at, expires_at, units - take)
+
+    receiving = [stock_id for stock_id, location_id, quantity in changes if quantity > before.get((stock_id, location_id), 0)]
+    lot_numbers = {}
+    for chunk in _chunks(list(dict.fromkeys(receiving))):
+        sql = f"SELECT id, COALESCE(lot_number, '') FROM stock WHERE id IN ({', '.join('?' * len(chunk))})"
+        lot_numbers.update(conn.execute(sql, chunk).fetchall())
+    now = utcnow().isoformat(timespec="seconds")
+    for stock_id, location_id, quantity in changes:
+        added = quantity - before.get((stock_id, location_id), 0)
+        if added <= 0:
+            continue
+        row = lots.setdefault((stock_id, location_id), {})
+        arrivals = carried.get((stock_id, location_id), []) + [(lot_numbers.get(stock_id, ""), now, None, added)]
+        for lot_number, received_at, expires_at, units in arrivals:
+            units = min(units, added)
+            added -= units
+            if lot_number is None or units <= 0:
+                continue  # Untracked stock stays untracked
+            if lot_number in row:
+                row[lot_number][2] += units
+            else:
+                row[lot_number] = [received_at, expires_at, units]
+
+    touched = list(dict.fromkeys((stock_id, location_id) for stock_id, location_id, _ in changes))
+    conn.executemany(CLEAR_LOTS, touched)
+    conn.executemany(INSERT_LOT, [
+        (stock_id, location_id, lot_number, received_at, expires_at, quantity)
+        for stock_id, location_id in touched
+        for lot_number, (received_at, expires_at, quantity) in lots.get((stock_id, location_id), {}).items() if quantity > 0
+    ])
+
+
+def save_lot(stock_id: int, location_id: int, lot: StockLot, untracked: int = 0):
+    """Date a lot, moving ``untracked`` units into it; without ``received_at`` a lot keeps its receipt time."""
+    received_at = lot.received_at.isoformat(timespec="seconds") if lot.received_at else None
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO stock_lots (stock_id, location_id, lot_number, received_at, expires_at, quantity) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (stock_id, location_id, lot_number) DO UPDATE SET expires_at = excluded.expires_at, "
+            "received_at = COALESCE(?, stock_lots.received_at), quantity = stock_lots.quantity + excluded.quantity",
+            (stock_id, location_id, lot.lot_number or "", received_at or utcnow().isoformat(timespec="seconds"),
+             lot.expires_at.isoformat() if lot.expires_at else None, untracked, received_at),
+        )
+
+
+def _merged(stock_id: int, quantities: List[Tuple[int, int]]) -> List[Tuple[int, int, int]]:
+    merged = {}
+    for location_id, quantity in quantities:
+        merged[location_id] = merged.get(location_id, 0) + quantity
+    return [(stock_id, location_id, quantity) for location_id, quantity in merged.items()]
+
+
+# ---------- LOCATIONS ----------
+def save_location(location: Location) -> Location:
+    values = location.model_dump()
+    with transaction() as conn:
+        if location.id is None:
+            cur = conn.execute(
+                "INSERT INTO locations (name, locationType, storageCategory, company, parent_id) VALUES (?, ?, ?, ?, ?)",
+                (values["name"], values["locationType"], values["storageCategory"], values["company"], values["parent_id"]),
+            )
+            location.id = cur.lastrowid
+        else:
+            conn.execute(
+                "UPDATE locations SET name = ?, locationType = ?, storageCategory = ?, company = ?, parent_id = ? WHERE id = ?",
+                (values["name"], values["locationType"], values["storageCategory"], values["company"], values["parent_id"], location.id),
+            )
+        publish(conn, "location", location.id)
+    return location
+
+
+def delete_location(location_id: int) -> Optional[Location]:
+    with transaction() as conn:
+        deleted = read_location(conn, location_id)
+        conn.execute("DELETE FROM locations WHERE id = ?", (location_id,))
+        publish(conn, "location", location_id, "delete")
+    return deleted
+
+
+def delete_locations(location_ids: List[int]):
+    """Delete several locations (e.g. a subtree) in one transaction."""
+    with transaction() as conn:
+        conn.executemany("DELETE FROM locations WHERE id = ?", [(location_id,) for location_id in location_ids])
+        for location_id in location_ids:
+            publish(conn, "location", location_id, "delete")
+
+
+# ---------- CATEGORIES ----------
+def save_category(cat: CategoryTag) -> CategoryTag:
+    with transaction() as conn:
+        if cat.id is None:
+            cur = conn.execute("INSERT INTO categories (name, color) VALUES (?, ?)", (cat.name, cat.color))
+            cat.id = cur.lastrowid
+        else:
+            conn.execute("UPDATE categories SET name = ?, color = ? WHERE id = ?", (cat.name, cat.color, cat.id))
+        publish(conn, "category", cat.id)
+    return cat
+
+
+def delete_category(cat_id: int) -> Optional[CategoryTag]:
+    with transaction() as conn:
+        deleted = read_category(conn, cat_id)
+        conn.execute("DELETE FROM categories WHERE id = ?", (cat_id,))
+        publish(conn, "category", cat_id, "delete")
+    return deleted
+
+
+# ---------- BOMS ----------
+def save_bom(bom: BOM, replaces: Optional[str] = None) -> BOM:
+    with transaction() as conn:
+        if replaces is not None:
+            conn.execute("DELETE FROM boms WHERE product_barcode = ?", (replaces,))
+        conn.execute(
+            "INSERT OR REPLACE INTO boms (product_barcode, description, components) VALUES (?, ?, ?)",
+            (bom.product_barcode, bom.description, json.dumps(bom.components)),
+        )
+        if replaces is not None and replaces != bom.product_barcode:
+            publish(conn, "bom", replaces, "delete")
+        publish(conn, "bom", bom.product_barcode)
+    return bom
+
+
+def delete_bom(product_barcode: str) -> Optional[BOM]:
+    with transaction() as conn:
+        deleted = read_bom(conn, product_barcode)
+        conn.execute("DELETE FROM boms WHERE product_barcode = ?", (product_barcode,))
+        publish(conn, "bom", product_barcode, "delete")
+    return deleted
+
+
+# ---------- LOGS ----------
+def add_logs(logs: Iterable[StockLog]):
+    with transaction() as conn:
+        ids = log_store.append(list(logs))
+        if ids:
+            publish(conn, "log", f"{ids[0]}-{ids[1]}")
+
+
+def add_log(log: StockLog):
+    add_logs([log])
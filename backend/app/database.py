@@ -0,0 +1,182 @@
+# backend/app/database.py
+
+"""
+SQLite persistence engine.
+
+Each thread gets its own long-lived connection (sqlite3 connections can't be
+shared across threads), opened in WAL mode so readers never block the writer.
+Queries are always issued with constant SQL text and bound parameters, which
+lets sqlite3's per-connection statement cache reuse the prepared statements.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+DB_PATH = Path(os.getenv("INVENTORY_DB", "app/inventory.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    partId TEXT NOT NULL,
+    category TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    scrap_count INTEGER NOT NULL DEFAULT 0,
+    lot_number TEXT,
+    bin_numbers TEXT,
+    supplier TEXT,
+    production_stage TEXT,
+    notes TEXT,
+    image_url TEXT,
+    file_url TEXT,
+    cost REAL,
+    low_stock_threshold INTEGER NOT NULL DEFAULT 10
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_stock_barcode ON stock (barcode);
+CREATE INDEX IF NOT EXISTS ix_stock_partId ON stock (partId);
+
+CREATE TABLE IF NOT EXISTS stock_locations (
+    stock_id INTEGER NOT NULL,
+    location_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (stock_id, location_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_stock_locations_location ON stock_locations (location_id);
+
+-- Units of each lot per stock location, see app/allocation.py; lot_number ''
+-- is a lot received without a number. What a location holds beyond its
+-- lots is untracked.
+CREATE TABLE IF NOT EXISTS stock_lots (
+    stock_id INTEGER NOT NULL,
+    location_id INTEGER NOT NULL,
+    lot_number TEXT NOT NULL DEFAULT '',
+    received_at TEXT NOT NULL,
+    expires_at TEXT,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (stock_id, location_id, lot_number)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS locations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL COLLATE NOCASE UNIQUE,
+    locationType TEXT NOT NULL,
+    storageCategory TEXT,
+    company TEXT NOT NULL,
+    parent_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL COLLATE NOCASE UNIQUE,
+    color TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS boms (
+    product_barcode TEXT PRIMARY KEY,
+    description TEXT,
+    components TEXT NOT NULL
+);
+
+-- Items referring to each content-addressed upload, see app/uploads.py
+CREATE TABLE IF NOT EXISTS upload_refs (
+    url TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Ordered change feed, see app/changefeed.py
+CREATE TABLE IF NOT EXISTS change_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity TEXT NOT NULL,
+    key TEXT NOT NULL,
+    op TEXT NOT NULL
+);
+"""
+# Stock logs live in their own segmented tables, see app/logstore.py
+
+# Columns added after the first release: (table, column, definition)
+MIGRATIONS = [
+    ("stock", "low_stock_threshold", "INTEGER NOT NULL DEFAULT 10"),
+    ("locations", "parent_id", "INTEGER"),
+]
+
+_pool: Dict[int, sqlite3.Connection] = {}
+_pool_lock = threading.Lock()
+
+
+def open_connection() -> sqlite3.Connection:
+    """A new, unpooled connection; the caller closes it."""
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's pooled connection, opening it on first use."""
+    ident = threading.get_ident()
+    conn = _pool.get(ident)
+    if conn is None:
+        conn = open_connection()
+        with _pool_lock:
+            _pool[ident] = conn
+    return conn
+
+
+_local = threading.local()
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Run a block of writes as one immediate transaction; nested blocks join the outer one."""
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    _local.after_commit = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        _local.after_commit = None
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    callbacks, _local.after_commit = _local.after_commit, None
+    for callback in callbacks:
+        callback()
+
+
+def on_commit(callback: Callable[[], None]):
+    """Run ``callback`` once the current transaction commits (now if there is none).
+
+    A callback registered several times in one transaction runs once."""
+    callbacks: List[Callable[[], None]] = getattr(_local, "after_commit", None)
+    if callbacks is None:
+        callback()
+    elif callback not in callbacks:
+        callbacks.append(callback)
+
+
+def init_db():
+    conn = get_connection()
+    conn.executescript(SCHEMA)
+    for table, column, definition in MIGRATIONS:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def close_all():
+    with _pool_lock:
+        for conn in _pool.values():
+            conn.close()
+        _pool.clear()
@@ -0,0 +1,178 @@
+# backend/app/events.py
+
+"""
+Live change events for Server-Sent Events clients.
+
+The hub listens to the change feed, so it sees every committed change in
+order, whichever worker made it. Each feed event becomes one typed message
+whose id is the feed sequence number: ``log`` messages carry the new stock
+log entries (scans, transfers, scraps, ...), and ``stock``, ``location``,
+``category`` and ``bom`` messages say which record changed and how.
+
+Messages are built once and then filtered per client. Every client has a
+bounded queue; a client that falls that far behind is sent ``overflow`` and
+disconnected instead of buffering without limit, and can reconnect with
+``Last-Event-ID`` to resume from the feed.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import List, Optional, Set
+
+from app.changefeed import change_feed, Event
+from app.logstore import log_store, row_to_dict
+from app.store import store
+
+CLIENT_BUFFER = int(os.getenv("SSE_CLIENT_BUFFER", "1000"))
+KEEPALIVE_SECONDS = 15
+
+# Log detail keys that name a location
+LOCATION_DETAILS = ("location_id", "from_location", "to_location")
+
+
+def build_message(event: Event) -> Optional[dict]:
+    seq, entity, key, op = event
+    if entity == "log":
+        first, last = (int(part) for part in key.split("-"))
+        rows = log_store.iter_rows(after=first - 1, limit=last - first + 1)
+        return {"id": seq, "event": "log", "data": {"logs": [row_to_dict(row) for row in rows]}}
+
+    data = {"entity": entity, "key": key, "op": op}
+    if entity in ("stock", "rows"):
+        stock_id = int(key)
+        item = store.get_item(stock_id)
+        data.update(
+            entity="stock", key=stock_id, op="quantity" if entity == "rows" else op,
+            barcode=item.barcode if item else None,
+            location_ids=[location_id for location_id, _ in store.rows_for_item(stock_id)],
+        )
+    elif entity in ("location", "category"):
+        data["key"] = int(key)
+    elif entity == "bom":
+        data["barcode"] = key
+    return {"id": seq, "event": data["entity"], "data": data}
+
+
+class EventFilter:
+    """Per-client filters; each given one must match, any value within it may."""
+
+    def __init__(self, barcodes: Optional[Set[str]] = None, locations: Optional[Set[int]] = None,
+                 actions: Optional[Set[str]] = None):
+        self.barcodes = barcodes
+        self.locations = locations
+        self.actions = actions
+
+    def _log_matches(self, entry: dict) -> bool:
+        if self.barcodes is not None and entry["barcode"] not in self.barcodes:
+            return False
+        if self.locations is not None:
+            details = entry["details"] or {}
+            if not any(details.get(k) in self.locations for k in LOCATION_DETAILS):
+                return False
+        return self.actions is None or entry["action"] in self.actions
+
+    def apply(self, message: dict) -> Optional[dict]:
+        """The message as this client should see it, or None to skip it."""
+        data = message["data"]
+        if message["event"] == "log":
+            logs = [entry for entry in data["logs"] if self._log_matches(entry)]
+            if not logs:
+                return None
+            return message if len(logs) == len(data["logs"]) else {**message, "data": {"logs": logs}}
+
+        if self.barcodes is not None and data.get("barcode") not in self.barcodes:
+            return None
+        if self.locations is not None:
+            touched = {data["key"]} if data["entity"] == "location" else set(data.get("location_ids", ()))
+            if not touched & self.locations:
+                return None
+        if self.actions is not None and not {data["entity"], f"{data['entity']}.{data['op']}"} & self.actions:
+            return None
+        return message
+
+
+class Client:
+    def __init__(self, loop: asyncio.AbstractEventLoop, filters: EventFilter, maxsize: int = CLIENT_BUFFER):
+        self.loop = loop
+        self.filters = filters
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+        self.after = 0  # live messages up to here were already replayed
+
+    def offer(self, message: dict):
+        """Queue a message; runs on the client's event loop."""
+        if self.overflowed or (message["id"] is not None and message["id"] <= self.after):
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventHub:
+    def __init__(self):
+        self.clients: Set[Client] = set()
+        self._lock = threading.Lock()
+        change_feed.subscribe(self._on_events)
+
+    def _on_events(self, events: Optional[List[Event]]):
+        with self._lock:
+            clients = list(self.clients)
+        if not clients:
+            return
+        if events is None:
+            messages = [{"id": None, "event": "reset", "data": {}}]
+        else:
+            messages = [m for m in (build_message(event) for event in events) if m is not None]
+        for client in clients:
+            for message in messages:
+                filtered = client.filters.apply(message) if message["event"] != "reset" else message
+                if filtered is not None:
+                    try:
+                        client.loop.call_soon_threadsafe(client.offer, filtered)
+                    except RuntimeError:
+                        # The client's loop is gone
+                        self.remove(client)
+                        break
+
+    def connect(self, client: Client, last_event_id: Optional[int]) -> Optional[List[dict]]:
+        """Register ``client``; returns the messages it missed after ``last_event_id``
+        (None if they were trimmed and it should start over)."""
+        # Under the store lock no batch is being applied, so the replay ends
+        # exactly where live delivery starts
+        with store.lock:
+            with self._lock:
+                self.clients.add(client)
+            position = change_feed.position
+        client.after = max(position, last_event_id or 0)
+        if last_event_id is None or last_event_id >= position:
+            return []
+        events = change_feed.events_between(last_event_id, position)
+        if events is None:
+            return None
+        messages = (build_message(event) for event in events)
+        return [m for m in (client.filters.apply(m) for m in messages if m) if m is not None]
+
+    def remove(self, client: Client):
+        with self._lock:
+            self.clients.discard(client)
+
+
+def format_sse(message: dict) -> str:
+    lines = []
+    if message["id"] is not None:
+        lines.append(f"id: {message['id']}")
+    lines.append(f"event: {message['event']}")
+    lines.append(f"data: {json.dumps(message['data'], separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_set(value: Optional[str], cast=str) -> Optional[Set]:
+    if not value:
+        return None
+    return {cast(part.strip()) for part in value.split(",") if part.strip()}
+
+
+event_hub = EventHub()
@@ -0,0 +1,128 @@
+# backend/app/images.py
+
+"""
+Resized image derivatives.
+
+Thumbnails and previews are rendered with Pillow in a process pool, so
+resizing a large photo never holds the GIL of the worker serving requests.
+New uploads are rendered right away; images stored before this existed are
+rendered on their first request. Concurrent requests for the same missing
+derivative share one render.
+
+Stored image names never change content (new ones are content hashes, old
+ones carry a uuid), so derivatives are served as immutable with an ETag.
+Without Pillow installed the original image is served instead.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.staticfiles import StaticFiles
+
+from app.cache import LRUCache
+from app.uploads import UPLOAD_DIR, DERIVED_DIR, MANAGED_URL
+
+try:
+    import PIL  # noqa: F401  (only used in the worker processes)
+    HAVE_PIL = True
+except ImportError:
+    HAVE_PIL = False
+
+# Longest side in pixels
+SIZES = {"thumb": 160, "preview": 640}
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_inflight: Dict[Path, asyncio.Future] = {}
+# Sources Pillow couldn't read, so we don't retry them on every request
+_failed = LRUCache(maxsize=1024)
+
+
+def render(source: str, target: str, box: int):
+    """Write a WebP of ``source`` fitting in ``box`` x ``box``; runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((box, box))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        tmp = f"{target}.part"
+        img.save(tmp, "WEBP", quality=80, method=4)
+    os.replace(tmp, target)
+
+
+def pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def source_path(name: str) -> Optional[Path]:
+    path = UPLOAD_DIR / "images" / name
+    return path if "/" not in name and not name.startswith(".") and path.is_file() else None
+
+
+def derived_path(size: str, name: str) -> Path:
+    return DERIVED_DIR / size / f"{name}.webp"
+
+
+def _start(size: str, name: str) -> Optional[asyncio.Future]:
+    target = derived_path(size, name)
+    future = _inflight.get(target)
+    if future is None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(pool(), render, str(UPLOAD_DIR / "images" / name), str(target), SIZES[size])
+        _inflight[target] = future
+        future.add_done_callback(lambda _: _inflight.pop(target, None))
+    return future
+
+
+def warm(url: Optional[str]):
+    """Start rendering every size of a just-uploaded image, without waiting."""
+    match = MANAGED_URL.match(url or "")
+    if HAVE_PIL and match and match.group(1) == "images":
+        name = url.rsplit("/", 1)[1]
+        for size in SIZES:
+            if not derived_path(size, name).exists():
+                _start(size, name)
+
+
+async def derivative(size: str, name: str) -> Optional[Path]:
+    """Path of the ``size`` rendering of ``name``, rendering it first if needed."""
+    target = derived_path(size, name)
+    if target.exists():
+        return target
+    if not HAVE_PIL or _failed.get(name):
+        return None
+    try:
+        await asyncio.shield(_start(size, name))
+    except Exception:
+        # Not an image Pillow can read (or a broken file)
+        _failed.put(name, True)
+        return None
+    return target
+
+
+class CachedStaticFiles(StaticFiles):
+    """Static files that are served as immutable when their name is a content hash."""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        kind = Path(full_path).parent.name
+        if MANAGED_URL.match(f"/static/{kind}/{Path(full_path).name}"):
+            response.headers["Cache-Control"] = IMMUTABLE
+        return response
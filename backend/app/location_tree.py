@@ -0,0 +1,145 @@
+# backend/app/location_tree.py
+
+"""
+Subtree index for nested locations (site > area > rack > bin, or any depth).
+
+Locations point at their parent with ``parent_id``. The index lays them out
+in depth-first order (an Euler tour), so each location's subtree is the
+contiguous run ``order[start:end]``. "Is A under B" is then two integer
+comparisons, and "everything under B" is one slice. A per-subtree total of
+any per-location value is a difference of two prefix sums.
+
+Like nested-set numbering, an insert or move renumbers the tour. Locations
+number in the hundreds or thousands, so the index is simply laid out again
+on the first read after a change rather than patched in place. Dangling
+parents and cycles, which the API refuses but a bulk import could still
+produce, turn the affected location into a root instead of breaking the
+layout.
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+class LocationTree:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.parents: Dict[int, Optional[int]] = {}
+        self._layout: Optional[tuple] = None  # (order, start, end, depth, children), built on demand
+
+    def put(self, location_id: int, parent_id: Optional[int]):
+        if location_id not in self.parents or self.parents[location_id] != parent_id:
+            self.parents[location_id] = parent_id
+            self._layout = None
+
+    def remove(self, location_id: int):
+        if location_id in self.parents:
+            del self.parents[location_id]
+            self._layout = None
+
+    # ---------- LAYOUT ----------
+    def _get(self):
+        layout = self._layout
+        if layout is None:
+            with self._lock:
+                layout = self._layout
+                if layout is None:
+                    layout = self._layout = self._build()
+        return layout
+
+    def _build(self):
+        """Depth-first order with each location's [start, end) run and depth."""
+        children: Dict[int, List[int]] = {}
+        roots = []
+        for location_id, parent_id in sorted(self.parents.items()):
+            if parent_id is None or parent_id not in self.parents or parent_id == location_id:
+                roots.append(location_id)
+            else:
+                children.setdefault(parent_id, []).append(location_id)
+
+        order: List[int] = []
+        start: Dict[int, int] = {}
+        end: Dict[int, int] = {}
+        depth: Dict[int, int] = {}
+
+        def walk(root: int):
+            stack = [(root, 0, False)]
+            while stack:
+                location_id, level, done = stack.pop()
+                if done:
+                    end[location_id] = len(order)
+                    continue
+                start[location_id] = len(order)
+                depth[location_id] = level
+                order.append(location_id)
+                stack.append((location_id, level, True))
+                for child in reversed(children.get(location_id, ())):
+                    if child not in start:
+                        stack.append((child, level + 1, False))
+
+        for root in roots:
+            walk(root)
+        # Whatever wasn't reached hangs off a cycle; cut it at its lowest id
+        for location_id in sorted(self.parents):
+            if location_id not in start:
+                children.get(self.parents[location_id], []).remove(location_id)
+                roots.append(location_id)
+                walk(location_id)
+        children[None] = roots
+        return order, start, end, depth, children
+
+    # ---------- QUERIES ----------
+    def subtree(self, location_id: int) -> List[int]:
+        """The location and everything under it, in depth-first order."""
+        order, start, end, _, _ = self._get()
+        if location_id not in start:
+            return []
+        return order[start[location_id]:end[location_id]]
+
+    def contains(self, ancestor_id: int, location_id: int) -> bool:
+        """Whether ``location_id`` is ``ancestor_id`` or somewhere under it."""
+        _, start, end, _, _ = self._get()
+        if ancestor_id not in start or location_id not in start:
+            return False
+        return start[ancestor_id] <= start[location_id] < end[ancestor_id]
+
+    def children(self, location_id: Optional[int]) -> List[int]:
+        """Direct children; the roots for None."""
+        return list(self._get()[4].get(location_id, ()))
+
+    def position(self, location_id: int) -> int:
+        """Place in the depth-first order: sorting by it walks the tree path by path."""
+        order, start, _, _, _ = self._get()
+        return start.get(location_id, len(order))
+
+    def positions(self) -> Dict[int, int]:
+        """``position`` of every location, for callers that look up many."""
+        return self._get()[1]
+
+    def depth(self, location_id: int) -> int:
+        return self._get()[3].get(location_id, 0)
+
+    def path(self, location_id: int) -> List[int]:
+        """Ids from the root down to the location."""
+        _, start, end, _, _ = self._get()
+        path = [location_id]
+        seen = {location_id}
+        parent_id = self.parents.get(location_id)
+        while parent_id is not None and parent_id in start and parent_id not in seen and \
+                start[parent_id] <= start[location_id] < end[parent_id]:
+            path.append(parent_id)
+            seen.add(parent_id)
+            parent_id = self.parents.get(parent_id)
+        return path[::-1]
+
+    def subtree_sums(self, value: Callable[[int], int]) -> Dict[int, int]:
+        """``value`` summed over every location's subtree, for all locations
+        at once: prefix sums over the depth-first order."""
+        order, start, end, _, _ = self._get()
+        sums = np.concatenate(([0], np.cumsum([value(location_id) for location_id in order], dtype=np.int64)))
+        return {location_id: int(sums[end[location_id]] - sums[start[location_id]]) for location_id in order}
@@ -0,0 +1,352 @@
+# backend/app/logstore.py
+
+"""
+Segmented stock log store.
+
+Logs are appended to a chain of SQLite tables (``log_seg_<n>``), each
+holding up to ``LOG_SEGMENT_ROWS`` entries or ``LOG_SEGMENT_DAYS`` days. The ``log_segments`` catalog
+records every segment's id and time range, so a query only opens the
+segments that can contain matching rows. Inside a segment rows are indexed
+by timestamp, barcode and action. Entry ids are global and increasing, which
+makes them usable as pagination cursors across segments.
+
+Old segments can be dropped wholesale (``LOG_RETENTION_DAYS``) and runs of
+small sealed segments merged (``compact``), without rewriting the rest.
+"""
+
+import csv
+import io
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from app.database import get_connection, open_connection, transaction
+from app.models import StockLog
+from app.timeutil import utcnow
+
+LOG_SEGMENT_ROWS = int(os.getenv("LOG_SEGMENT_ROWS", "100000"))
+LOG_SEGMENT_DAYS = int(os.getenv("LOG_SEGMENT_DAYS", "7"))
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "0"))  # 0 keeps everything
+
+LOG_COLUMNS = ("id", "timestamp", "barcode", "action", "amount", "resulting_qty", "details")
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_sequence (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    next_id INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO log_sequence (id, next_id) VALUES (0, 1);
+
+CREATE TABLE IF NOT EXISTS log_segments (
+    id INTEGER PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    first_id INTEGER,
+    last_id INTEGER,
+    start_ts TEXT,
+    end_ts TEXT,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    sealed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+SEGMENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    action TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    resulting_qty INTEGER NOT NULL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_{table}_timestamp ON {table} (timestamp);
+CREATE INDEX IF NOT EXISTS ix_{table}_barcode ON {table} (barcode, id);
+CREATE INDEX IF NOT EXISTS ix_{table}_action ON {table} (action, id);
+"""
+
+LogRow = Tuple[int, str, str, str, int, int, Optional[str]]
+
+
+def row_to_log(row: LogRow) -> StockLog:
+    _, ts, barcode, action, amount, resulting_qty, details = row
+    return StockLog.model_construct(
+        timestamp=datetime.fromisoformat(ts), barcode=barcode, action=action, amount=amount,
+        resulting_qty=resulting_qty, details=json.loads(details) if details else None,
+    )
+
+
+def row_to_dict(row: LogRow) -> dict:
+    _, ts, barcode, action, amount, resulting_qty, details = row
+    return {
+        "id": row[0], "timestamp": ts, "barcode": barcode, "action": action, "amount": amount,
+        "resulting_qty": resulting_qty, "details": json.loads(details) if details else None,
+    }
+
+
+class LogStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    # ---------- SETUP ----------
+    def init(self):
+        conn = get_connection()
+        conn.executescript(CATALOG_SCHEMA)
+        if not conn.execute("SELECT 1 FROM log_segments LIMIT 1").fetchone():
+            self._new_segment(conn)
+        self._migrate_flat_table(conn)
+        if LOG_RETENTION_DAYS:
+            self.apply_retention(LOG_RETENTION_DAYS)
+
+    def _new_segment(self, conn) -> Tuple[int, str]:
+        cur = conn.execute("INSERT INTO log_segments (table_name) VALUES ('')")
+        seg_id = cur.lastrowid
+        table = f"log_seg_{seg_id}"
+        # Statement by statement: executescript would commit the caller's transaction
+        for statement in SEGMENT_SCHEMA.format(table=table).split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        conn.execute("UPDATE log_segments SET table_name = ? WHERE id = ?", (table, seg_id))
+        return seg_id, table
+
+    def _migrate_flat_table(self, conn):
+        """Move rows from the single pre-segment ``stock_logs`` table, if present.
+
+        Copy and drop are one transaction (the batches' appends join it): a
+        crash part way leaves the flat table as it was, nothing copied twice."""
+        with transaction():
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stock_logs'").fetchone()
+            if not exists:
+                return
+            last = 0
+            while True:
+                batch = conn.execute(
+                    "SELECT id, timestamp, barcode, action, amount, resulting_qty, details FROM stock_logs "
+                    "WHERE id > ? ORDER BY id LIMIT 5000", (last,)
+                ).fetchall()
+                if not batch:
+                    break
+                self.append_rows([row[1:] for row in batch])
+                last = batch[-1][0]
+            conn.execute("DROP TABLE stock_logs")
+
+    # ---------- WRITES ----------
+    def _active(self, conn) -> Tuple[int, str, int, Optional[str]]:
+        return conn.execute(
+            "SELECT id, table_name, row_count, start_ts FROM log_segments WHERE sealed = 0 ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+
+    @staticmethod
+    def _too_long(start_ts: str, ts: str) -> bool:
+        return datetime.fromisoformat(ts) - datetime.fromisoformat(start_ts) > timedelta(days=LOG_SEGMENT_DAYS)
+
+    def append_rows(self, rows: Sequence[Tuple[str, str, str, int, int, Optional[str]]]) -> Optional[Tuple[int, int]]:
+        """Append ``(timestamp, barcode, action, amount, resulting_qty, details)`` rows;
+        returns the first and last id given out."""
+        if not rows:
+            return None
+        with transaction() as conn, self._lock:
+            next_id = conn.execute("SELECT next_id FROM log_sequence").fetchone()[0]
+            first_id = next_id
+            conn.execute("UPDATE log_sequence SET next_id = ?", (next_id + len(rows),))
+            pos = 0
+            while pos < len(rows):
+                seg_id, table, count, start_ts = self._active(conn)
+                if count >= LOG_SEGMENT_ROWS or (start_ts and self._too_long(start_ts, rows[pos][0])):
+                    conn.execute("UPDATE log_segments SET sealed = 1 WHERE id = ?", (seg_id,))
+                    seg_id, table = self._new_segment(conn)
+                    count, start_ts = 0, None
+                # Take rows until the segment is full by count or by time span
+                first_ts = start_ts or rows[pos][0]
+                stop = min(len(rows), pos + LOG_SEGMENT_ROWS - count)
+                end = pos + 1
+                while end < stop and not self._too_long(first_ts, rows[end][0]):
+                    end += 1
+                chunk = rows[pos:end]
+                ids = range(next_id, next_id + len(chunk))
+                conn.executemany(
+                    f"INSERT INTO {table} (id, timestamp, barcode, action, amount, resulting_qty, details) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(log_id, *row) for log_id, row in zip(ids, chunk)],
+                )
+                timestamps = [row[0] for row in chunk]
+                conn.execute(
+                    "UPDATE log_segments SET row_count = row_count + ?, first_id = COALESCE(first_id, ?), last_id = ?, "
+                    "start_ts = MIN(COALESCE(start_ts, ?), ?), end_ts = MAX(COALESCE(end_ts, ?), ?) WHERE id = ?",
+                    (len(chunk), ids[0], ids[-1], min(timestamps), min(timestamps), max(timestamps), max(timestamps), seg_id),
+                )
+                next_id += len(chunk)
+                pos += len(chunk)
+        return first_id, next_id - 1
+
+    def append(self, logs: Sequence[StockLog]) -> Optional[Tuple[int, int]]:
+        return self.append_rows([
+            (log.timestamp.isoformat(), log.barcode, log.action, log.amount, log.resulting_qty,
+             json.dumps(log.details) if log.details is not None else None)
+            for log in logs
+        ])
+
+    # ---------- READS ----------
+    def _segments(self, conn, since: Optional[str], until: Optional[str], after: Optional[int],
+                  descending: bool) -> List[str]:
+        sql = "SELECT table_name FROM log_segments WHERE row_count > 0"
+        params = []
+        if after is not None:
+            sql += " AND first_id < ?" if descending else " AND last_id > ?"
+            params.append(after)
+        if since:
+            sql += " AND end_ts >= ?"
+            params.append(since)
+        if until:
+            sql += " AND start_ts < ?"
+            params.append(until)
+        sql += " ORDER BY first_id" + (" DESC" if descending else "")
+        return [name for (name,) in conn.execute(sql, params)]
+
+    def iter_rows(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        barcode: Optional[str] = None,
+        action: Optional[str] = None,
+        after: Optional[int] = None,
+        descending: bool = False,
+        limit: Optional[int] = None,
+        chunk_size: int = 1000,
+        conn=None,
+    ) -> Iterator[LogRow]:
+        """Matching rows in id order, fetched a chunk at a time."""
+        conn = conn or get_connection()
+        since_s = since.isoformat() if since else None
+        until_s = until.isoformat() if until else None
+        where, params = [], []
+        if since_s:
+            where.append("timestamp >= ?")
+            params.append(since_s)
+        if until_s:
+            where.append("timestamp < ?")
+            params.append(until_s)
+        if barcode:
+            where.append("barcode = ?")
+            params.append(barcode)
+        if action:
+            where.append("action = ?")
+            params.append(action)
+        if after is not None:
+            where.append("id < ?" if descending else "id > ?")
+            params.append(after)
+        clause = (" WHERE " + " AND ".join(where)) if where else ""
+        order = " ORDER BY id DESC" if descending else " ORDER BY id"
+
+        remaining = limit
+        for table in self._segments(conn, since_s, until_s, after, descending):
+            sql = f"SELECT {', '.join(LOG_COLUMNS)} FROM {table}{clause}{order}"
+            if remaining is not None:
+                sql += f" LIMIT {int(remaining)}"
+            cur = conn.execute(sql, params)
+            while True:
+                batch = cur.fetchmany(chunk_size)
+                if not batch:
+                    break
+                yield from batch
+                if remaining is not None:
+                    remaining -= len(batch)
+            if remaining is not None and remaining <= 0:
+                return
+
+    def first_id(self) -> Optional[int]:
+        """Id of the oldest entry still kept (None if there are none)."""
+        return get_connection().execute("SELECT MIN(first_id) FROM log_segments WHERE row_count > 0").fetchone()[0]
+
+    def query(self, limit: int, **filters) -> Tuple[List[LogRow], Optional[int]]:
+        """One page of rows plus the cursor for the next page (None at the end)."""
+        rows = list(self.iter_rows(limit=limit + 1, **filters))
+        if len(rows) > limit:
+            return rows[:limit], rows[limit - 1][0]
+        return rows, None
+
+    def _export_rows(self, **filters) -> Iterator[LogRow]:
+        # A private connection: the response is streamed across threadpool
+        # threads and must not hold a read open on a pooled connection
+        conn = open_connection()
+        try:
+            yield from self.iter_rows(conn=conn, **filters)
+        finally:
+            conn.close()
+
+    def export_ndjson(self, **filters) -> Iterator[bytes]:
+        lines = []
+        for row in self._export_rows(**filters):
+            lines.append(json.dumps(row_to_dict(row)))
+            if len(lines) == 1000:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+
+    def export_csv(self, **filters) -> Iterator[bytes]:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(LOG_COLUMNS)
+        for i, row in enumerate(self._export_rows(**filters), 1):
+            writer.writerow(row)
+            if i % 1000 == 0:
+                yield buf.getvalue().encode()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue().encode()
+
+    # ---------- MAINTENANCE ----------
+    def segment_stats(self) -> List[dict]:
+        cur = get_connection().execute(
+            "SELECT id, table_name, first_id, last_id, start_ts, end_ts, row_count, sealed FROM log_segments ORDER BY id"
+        )
+        keys = ("id", "table_name", "first_id", "last_id", "start_ts", "end_ts", "row_count", "sealed")
+        return [dict(zip(keys, row)) for row in cur]
+
+    def apply_retention(self, days: int) -> int:
+        """Drop sealed segments whose newest entry is older than ``days``."""
+        cutoff = (utcnow() - timedelta(days=days)).isoformat()
+        with transaction() as conn, self._lock:
+            old = conn.execute(
+                "SELECT id, table_name FROM log_segments WHERE sealed = 1 AND end_ts < ?", (cutoff,)
+            ).fetchall()
+            for seg_id, table in old:
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute("DELETE FROM log_segments WHERE id = ?", (seg_id,))
+        return len(old)
+
+    def compact(self) -> int:
+        """Merge runs of adjacent sealed segments that together fit in one
+        segment, by row count and by time span."""
+        merged = 0
+        with transaction() as conn, self._lock:
+            sealed = conn.execute(
+                "SELECT id, table_name, row_count, start_ts, end_ts FROM log_segments "
+                "WHERE sealed = 1 AND row_count > 0 ORDER BY first_id"
+            ).fetchall()
+            run: List[Tuple[int, str, int, str, str]] = []
+            for seg in sealed + [None]:
+                if (seg is not None and run and sum(s[2] for s in run) + seg[2] <= LOG_SEGMENT_ROWS
+                        and not self._too_long(min(s[3] for s in run + [seg]), max(s[4] for s in run + [seg]))):
+                    run.append(seg)
+                    continue
+                if len(run) > 1:
+                    target_id, target = run[0][:2]
+                    for seg_id, table, *_ in run[1:]:
+                        conn.execute(f"INSERT INTO {target} SELECT * FROM {table}")
+                        conn.execute(f"DROP TABLE {table}")
+                        conn.execute("DELETE FROM log_segments WHERE id = ?", (seg_id,))
+                    conn.execute(
+                        f"UPDATE log_segments SET row_count = (SELECT COUNT(*) FROM {target}), "
+                        f"first_id = (SELECT MIN(id) FROM {target}), last_id = (SELECT MAX(id) FROM {target}), "
+                        f"start_ts = (SELECT MIN(timestamp) FROM {target}), end_ts = (SELECT MAX(timestamp) FROM {target}) "
+                        "WHERE id = ?",
+                        (target_id,),
+                    )
+                    merged += len(run) - 1
+                run = [seg] if seg is not None else []
+        return merged
+
+
+log_store = LogStore()
@@ -1,32 +1,74 @@
 # backend/app/main.py
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from app.routers.stock import router as stock_router
 from app.routers.locations import router as locations_router
 from app.routers.logs import router as logs_router
 from app.routers.bom import router as bom_router
+from app.routers.images import router as images_router
+from app.routers.events import router as events_router
+from app.routers.bulk import router as bulk_router
+from app.routers.stats import router as stats_router
+from app.routers.analytics import router as analytics_router
+from app.routers.metrics import router as metrics_router
+from app.routers.allocations import router as allocations_router
 from app.routers import category 
+from app.database import init_db, close_all, get_connection
+from app.changefeed import change_feed
+from app.logstore import log_store
+from app.metrics import MetricsMiddleware
+from app.uploads import UPLOAD_DIR, UploadLimitMiddleware, sweep
+from app import images
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables if needed, warm the in-memory store from disk and
+    # follow changes made by other workers
+    init_db()
+    log_store.init()
+    change_feed.load()
+    change_feed.start()
+    sweep(get_connection())
+    yield
+    images.shutdown()
+    change_feed.stop()
+    close_all()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Serve uploaded images and files
-app.mount("/static", StaticFiles(directory="app/uploads"), name="static")
+app.mount("/static", images.CachedStaticFiles(directory=UPLOAD_DIR), name="static")
 
+# Caps multipart bodies while they stream in, see app/uploads.py
+app.add_middleware(UploadLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Update with frontend domain in production
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Inventory-Version"],
 )
+# Outermost, so it times everything else; see /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(stock_router)
 app.include_router(locations_router)
 app.include_router(logs_router)
 app.include_router(bom_router)
+app.include_router(images_router)
+app.include_router(events_router)
+app.include_router(bulk_router)
+app.include_router(stats_router)
+app.include_router(analytics_router)
+app.include_router(metrics_router)
+app.include_router(allocations_router)
 app.include_router(category.router)
    
\ No newline at end of file
@@ -0,0 +1,197 @@
+# backend/app/metrics.py
+
+"""
+Request metrics in Prometheus text format.
+
+``MetricsMiddleware`` wraps the whole app at the ASGI level, so streaming
+responses (exports, the event stream) pass through untouched and are
+timed to their last byte. Each request is recorded under its route
+template (``/stock/{item_id}``, not the concrete path, to keep the number
+of series bounded): a latency histogram, request and response body sizes,
+and a count per status code.
+
+Gauges for the in-memory store and the log store are read when ``/metrics``
+is scraped. Every worker process keeps its own numbers; with several
+workers each scrape sees the worker that answered it.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from app import profiler
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds in bytes
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+UNMATCHED = "unmatched"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {running}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:g}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.statuses: Dict[int, int] = {}
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+        self.in_flight = 0
+        self.started = time.time()
+
+    def record(self, method: str, route: str, status: int, seconds: float, received: int, sent: int):
+        with self._lock:
+            stats = self.routes.get((method, route))
+            if stats is None:
+                stats = self.routes[(method, route)] = RouteStats()
+            stats.latency.observe(seconds)
+            stats.request_size.observe(received)
+            stats.response_size.observe(sent)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds Time from request start to the last response byte.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            routes = sorted(self.routes.items())
+            for (method, route), stats in routes:
+                lines += stats.latency.render("http_request_duration_seconds", _labels(method=method, route=route))
+            lines += ["# HELP http_request_size_bytes Request body size.", "# TYPE http_request_size_bytes histogram"]
+            for (method, route), stats in routes:
+                lines += stats.request_size.render("http_request_size_bytes", _labels(method=method, route=route))
+            lines += ["# HELP http_response_size_bytes Response body size.", "# TYPE http_response_size_bytes histogram"]
+            for (method, route), stats in routes:
+                lines += stats.response_size.render("http_response_size_bytes", _labels(method=method, route=route))
+            lines += ["# HELP http_requests_total Requests by status code.", "# TYPE http_requests_total counter"]
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+            lines += ["# HELP http_request_errors_total Requests answered with a 5xx status or failing outright.",
+                      "# TYPE http_request_errors_total counter"]
+            for (method, route), stats in routes:
+                errors = sum(count for status, count in stats.statuses.items() if status >= 500)
+                if errors:
+                    lines.append(f"http_request_errors_total{{{_labels(method=method, route=route)}}} {errors}")
+            lines += ["# TYPE http_requests_in_flight gauge", f"http_requests_in_flight {self.in_flight}"]
+        lines += ["# TYPE process_uptime_seconds gauge", f"process_uptime_seconds {time.time() - self.started:.0f}"]
+        for name, help_text, value in gauges():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def gauges() -> List[Tuple[str, str, float]]:
+    """Sizes of the in-memory collections and caches, read at scrape time."""
+    from app.changefeed import change_feed
+    from app.logstore import log_store
+    from app.serialization import bom_fragments, log_fragments, stock_fragments
+    from app.store import store
+
+    segments = log_store.segment_stats()
+    return [
+        ("inventory_items", "Stock items in the store.", len(store.items)),
+        ("inventory_stock_location_rows", "Per-location quantity rows in the store.", store.row_count()),
+        ("inventory_quantity_matrix_bytes", "Memory held by the stock x location quantity arrays.", store.quantities.nbytes),
+        ("inventory_locations", "Locations in the store.", len(store.locations)),
+        ("inventory_categories", "Categories in the store.", len(store.categories)),
+        ("inventory_boms", "BOMs in the store.", len(store.boms)),
+        ("inventory_log_entries", "Stock log entries on disk.", sum(seg["row_count"] for seg in segments)),
+        ("inventory_log_segments", "Stock log segment tables.", len(segments)),
+        ("inventory_change_feed_position", "Last change event applied by this worker.", change_feed.position),
+        ("inventory_cached_fragments", "Encoded stock, BOM and log entries held for responses.",
+         len(stock_fragments) + len(bom_fragments) + len(log_fragments)),
+    ]
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """Records every HTTP request in ``metrics`` and, when profiling is on,
+    samples the ones that turn out slow."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        root_path = scope.get("root_path", "")
+        received = sent = 0
+        status = 500
+        started = time.perf_counter()
+        token = profiler.sampler.begin()
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            metrics.in_flight -= 1
+            elapsed = time.perf_counter() - started
+            route = _route_of(scope, root_path)
+            metrics.record(scope["method"], route, status, elapsed, received, sent)
+            profiler.sampler.end(token, scope["method"], scope["path"], route, status, elapsed)
+
+
+def _route_of(scope, root_path: str) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("root_path", "") != root_path:
+        # Matched a mount such as /static; its inner paths would be unbounded
+        return scope["root_path"][len(root_path):] + "/{path}"
+    return UNMATCHED
@@ -1,7 +1,8 @@
 # models.py
 
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, constr
+from typing import Optional, List, Dict, Union
+from datetime import date, datetime
 
 # Core stock model
 class Stock(BaseModel):
@@ -19,18 +20,48 @@ class Stock(BaseModel):
     notes: Optional[str] = None
     image_url: Optional[str] = None
     file_url: Optional[str] = None
-    cost: Optional[float] = 0.0  
+    cost: Optional[float] = 0.0
+    low_stock_threshold: int = 10  # Below this total the item counts as "Low Stock"
 
 # Location model
 class Location(BaseModel):
     id: Optional[int] = None
-    name: str
+    name: constr(strip_whitespace=True, min_length=2)  # Name validation
     locationType: str = "Internal Location"
     storageCategory: Optional[str] = ""
     company: str = "My Company"
+    parent_id: Optional[int] = None  # Enclosing location: site > area > rack > bin
 
 # Stock quantity in a specific location
 class StockLocation(BaseModel):
     stock_id: int
     location_id: int
     quantity: int
+
+# A lot at one stock location; a location can hold several
+class StockLot(BaseModel):
+    lot_number: Optional[str] = None
+    received_at: Optional[datetime] = None  # Defaults to when the lot arrived
+    expires_at: Optional[date] = None
+    quantity: Optional[int] = Field(None, ge=0)  # Untracked units to put in the lot; a new lot takes them all
+
+# Category tag
+class CategoryTag(BaseModel):
+    id: Optional[int] = None
+    name: str
+    color: str  # Hex or tailwind-friendly color
+
+# Bill of materials
+class BOM(BaseModel):
+    product_barcode: str
+    description: Optional[str] = ""
+    components: Dict[str, int]  # {component_barcode: quantity}
+
+# Stock log entry
+class StockLog(BaseModel):
+    timestamp: datetime
+    barcode: str
+    action: str
+    amount: int
+    resulting_qty: int
+    details: Optional[Dict[str, Union[str, int, Dict, List[Union[str, int]]]]] = None
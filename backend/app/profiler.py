@@ -0,0 +1,129 @@
+# backend/app/profiler.py
+
+"""
+Opt-in sampling profiler for slow requests.
+
+Set ``PROFILE_SLOW_MS`` to turn it on. While any request is in flight, a
+background thread wakes every ``PROFILE_INTERVAL_MS`` and records the stack
+of every busy thread (threads parked in a wait, select or queue get are
+skipped). Each in-flight request is credited with the samples taken during
+its lifetime. When a request finishes over the threshold its samples are
+kept as a profile; the last ``PROFILE_KEEP`` are available from
+``/debug/profiles`` as collapsed stacks (one ``frame;frame;frame count``
+line per stack) that flamegraph.pl or speedscope can open.
+
+Samples aren't tied to a particular request: under concurrency a slow
+request's profile also shows whatever else was running at the time, which
+is often the reason it was slow.
+"""
+
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0")) or None
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+MAX_DEPTH = 100
+# Innermost frames in these modules mean the thread is parked
+IDLE_MODULES = ("threading.py", "selectors.py", "queue.py")
+
+
+class Profile:
+    def __init__(self, profile_id: int, method: str, path: str, route: str, status: int, seconds: float, stacks: Counter):
+        self.id = profile_id
+        self.method, self.path, self.route, self.status = method, path, route, status
+        self.duration_ms = round(seconds * 1000, 1)
+        self.finished = time.time()
+        self.stacks = stacks
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id, "method": self.method, "path": self.path, "route": self.route, "status": self.status,
+            "duration_ms": self.duration_ms, "samples": sum(self.stacks.values()),
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.finished)),
+        }
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Sampler:
+    def __init__(self, threshold_ms: Optional[float], interval_ms: float, keep: int):
+        self.threshold = threshold_ms / 1000 if threshold_ms else None
+        self.interval = interval_ms / 1000
+        self.profiles: "deque[Profile]" = deque(maxlen=keep)
+        self._active: Dict[int, Counter] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold is not None
+
+    def begin(self) -> Optional[int]:
+        """Start crediting samples to a new request; None when profiling is off."""
+        if not self.enabled:
+            return None
+        token = next(self._ids)
+        with self._lock:
+            self._active[token] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return token
+
+    def end(self, token: Optional[int], method: str, path: str, route: str, status: int, seconds: float):
+        if token is None:
+            return
+        with self._lock:
+            stacks = self._active.pop(token, None)
+        if stacks and seconds >= self.threshold:
+            self.profiles.append(Profile(token, method, path, route, status, seconds, stacks))
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        return next((p for p in self.profiles if p.id == profile_id), None)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [
+                stack for ident, frame in sys._current_frames().items()
+                if ident != me and (stack := self._stack(frame, names.get(ident, str(ident)))) is not None
+            ]
+            if stacks:
+                with self._lock:
+                    for counter in self._active.values():
+                        counter.update(stacks)
+
+    @staticmethod
+    def _stack(frame, thread_name: str) -> Optional[str]:
+        if frame.f_code.co_filename.endswith(IDLE_MODULES):
+            return None
+        frames: List[str] = []
+        while frame is not None and len(frames) < MAX_DEPTH:
+            code = frame.f_code
+            filename = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+            frames.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(f"thread {thread_name}")
+        return ";".join(reversed(frames))
+
+
+sampler = Sampler(PROFILE_SLOW_MS, PROFILE_INTERVAL_MS, PROFILE_KEEP)
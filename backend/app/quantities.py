@@ -0,0 +1,260 @@
+# backend/app/quantities.py
+
+"""
+Sparse stock x location quantity matrix.
+
+Quantities are kept as COO-style NumPy columns: one slot per (item,
+location) row, holding the item's dense code, the location's dense code and
+the quantity. That is 16 bytes per row instead of a model object plus three
+dict entries. Codes are handed out as ids first appear; ``item_ids`` and
+``location_ids`` map them back.
+
+Each item also keeps two small ``array('i')`` of its location ids and their
+slots. A point lookup is then a dict get plus a C-level ``index()`` over an
+item's handful of locations. Column-wise questions (what is at this
+location) are vectorized scans of the code column. Row and column totals are
+maintained on every change, and a full load computes them with one
+reduction each.
+
+Deleted rows leave their slot free for reuse. Deleted items free their code
+the same way.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+FREE = -1
+
+
+def _grown(arr: np.ndarray, need: int, fill=0) -> np.ndarray:
+    """``arr`` with room for at least ``need`` entries, doubling as it grows."""
+    if need <= len(arr):
+        return arr
+    grown = np.full(max(need, 2 * len(arr), 64), fill, arr.dtype)
+    grown[:len(arr)] = arr
+    return grown
+
+
+class QuantityMatrix:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.item_codes: Dict[int, int] = {}
+        self.item_ids = np.zeros(0, np.int64)  # code -> stock id
+        self.location_codes: Dict[int, int] = {}
+        self.location_ids = np.zeros(0, np.int64)
+        # Slot columns; free slots have item and location code FREE
+        self.item = np.zeros(0, np.int32)
+        self.location = np.zeros(0, np.int32)
+        self.qty = np.zeros(0, np.int64)
+        self.size = 0  # slots handed out, live or free
+        self.count = 0  # live rows
+        self.free_slots: List[int] = []
+        self.free_codes: List[int] = []
+        # By item code: location ids of the item's rows, and their slots
+        self.item_locations: List[array] = []
+        self.item_slots: List[array] = []
+        self.item_totals = np.zeros(0, np.int64)
+        self.location_totals = np.zeros(0, np.int64)
+        self.location_rows = np.zeros(0, np.int64)  # live rows per location code
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        columns = (self.item, self.location, self.qty, self.item_ids, self.location_ids,
+                   self.item_totals, self.location_totals, self.location_rows)
+        per_item = sum(a.itemsize * len(a) for a in self.item_locations) * 2
+        return sum(a.nbytes for a in columns) + per_item
+
+    # ---------- CODES ----------
+    def _item_code(self, stock_id: int) -> int:
+        code = self.item_codes.get(stock_id)
+        if code is not None:
+            return code
+        if self.free_codes:
+            code = self.free_codes.pop()
+        else:
+            code = len(self.item_locations)
+            self.item_locations.append(array("i"))
+            self.item_slots.append(array("i"))
+            self.item_ids = _grown(self.item_ids, code + 1)
+            self.item_totals = _grown(self.item_totals, code + 1)
+        self.item_ids[code] = stock_id
+        self.item_codes[stock_id] = code
+        return code
+
+    def _location_code(self, location_id: int) -> int:
+        code = self.location_codes.get(location_id)
+        if code is None:
+            code = len(self.location_codes)
+            self.location_ids = _grown(self.location_ids, code + 1)
+            self.location_totals = _grown(self.location_totals, code + 1)
+            self.location_rows = _grown(self.location_rows, code + 1)
+            self.location_ids[code] = location_id
+            self.location_codes[location_id] = code
+        return code
+
+    def _new_slot(self, item_code: int, location_code: int) -> int:
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = self.size
+            self.item = _grown(self.item, slot + 1, FREE)
+            self.location = _grown(self.location, slot + 1, FREE)
+            self.qty = _grown(self.qty, slot + 1)
+            self.size += 1
+        self.item[slot] = item_code
+        self.location[slot] = location_code
+        self.qty[slot] = 0
+        return slot
+
+    # ---------- READS ----------
+    def get(self, stock_id: int, location_id: int) -> Optional[int]:
+        """Quantity of a row; None if the item has no row at that location."""
+        code = self.item_codes.get(stock_id)
+        if code is None:
+            return None
+        try:
+            i = self.item_locations[code].index(location_id)
+        except ValueError:
+            return None
+        return self.qty.item(self.item_slots[code][i])
+
+    def item_rows(self, stock_id: int) -> List[Tuple[int, int]]:
+        """``(location_id, quantity)`` of every row of an item."""
+        code = self.item_codes.get(stock_id)
+        if code is None:
+            return []
+        qty = self.qty  # items have a handful of rows: cheaper than a fancy index
+        return [(location_id, qty.item(slot)) for location_id, slot in zip(self.item_locations[code], self.item_slots[code])]
+
+    def location_rows_of(self, location_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Stock ids, location ids and quantities of every row at any of the locations."""
+        codes = [self.location_codes[lid] for lid in location_ids if lid in self.location_codes]
+        if not codes:
+            empty = np.zeros(0, np.int64)
+            return empty, empty, empty
+        live = self.location[:self.size]
+        mask = live == codes[0] if len(codes) == 1 else np.isin(live, codes)
+        slots = np.flatnonzero(mask)
+        return self.item_ids[self.item[slots]], self.location_ids[self.location[slots]], self.qty[slots]
+
+    def ids_at(self, location_ids: Iterable[int]) -> np.ndarray:
+        """Distinct stock ids with a row at any of the locations."""
+        location_ids = list(location_ids)
+        stock_ids, _, _ = self.location_rows_of(location_ids)
+        return np.unique(stock_ids) if len(location_ids) > 1 else stock_ids
+
+    def totals_at(self, location_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Distinct stock ids with rows at any of the locations, and each one's
+        quantity summed over those locations."""
+        stock_ids, _, quantities = self.location_rows_of(location_ids)
+        keys, inverse = np.unique(stock_ids, return_inverse=True)
+        return keys, np.bincount(inverse, weights=quantities, minlength=len(keys)).astype(np.int64)
+
+    def item_total(self, stock_id: int) -> int:
+        code = self.item_codes.get(stock_id)
+        return self.item_totals.item(code) if code is not None else 0
+
+    def location_total(self, location_id: int) -> int:
+        code = self.location_codes.get(location_id)
+        return self.location_totals.item(code) if code is not None else 0
+
+    def location_count(self, location_id: int) -> int:
+        """Rows (items) at a location."""
+        code = self.location_codes.get(location_id)
+        return self.location_rows.item(code) if code is not None else 0
+
+    def live_slots(self) -> np.ndarray:
+        return np.flatnonzero(self.item[:self.size] != FREE)
+
+    # ---------- WRITES ----------
+    def set(self, stock_id: int, location_id: int, quantity: int) -> int:
+        """Set a row's quantity, creating the row if needed; returns the change."""
+        code = self._item_code(stock_id)
+        try:
+            slot = self.item_slots[code][self.item_locations[code].index(location_id)]
+            old = self.qty.item(slot)
+        except ValueError:
+            location_code = self._location_code(location_id)
+            slot = self._new_slot(code, location_code)
+            self.item_locations[code].append(location_id)
+            self.item_slots[code].append(slot)
+            self.location_rows[location_code] += 1
+            self.count += 1
+            old = 0
+        delta = quantity - old
+        self.qty[slot] = quantity
+        self.item_totals[code] += delta
+        self.location_totals[self.location[slot]] += delta
+        return delta
+
+    def drop(self, stock_id: int, location_id: int) -> Optional[int]:
+        """Delete a row; returns the quantity it held, or None if there was none."""
+        code = self.item_codes.get(stock_id)
+        if code is None:
+            return None
+        locations = self.item_locations[code]
+        try:
+            i = locations.index(location_id)
+        except ValueError:
+            return None
+        slot = self.item_slots[code][i]
+        del locations[i]
+        del self.item_slots[code][i]
+        quantity = self.qty.item(slot)
+        location_code = self.location[slot]
+        self.item_totals[code] -= quantity
+        self.location_totals[location_code] -= quantity
+        self.location_rows[location_code] -= 1
+        self.item[slot] = self.location[slot] = FREE
+        self.qty[slot] = 0
+        self.free_slots.append(slot)
+        self.count -= 1
+        return quantity
+
+    def forget_item(self, stock_id: int):
+        """Free the code of an item whose rows are all dropped."""
+        code = self.item_codes.get(stock_id)
+        if code is None or self.item_slots[code]:
+            return
+        del self.item_codes[stock_id]
+        self.item_ids[code] = 0
+        self.item_totals[code] = 0
+        self.free_codes.append(code)
+
+    def load(self, stock_ids: np.ndarray, location_ids: np.ndarray, quantities: np.ndarray):
+        """Replace everything with these rows (one per (stock, location) pair),
+        building the columns, per-item lists and totals in a few array passes."""
+        self.clear()
+        n = len(stock_ids)
+        if not n:
+            return
+        item_keys, item_codes = np.unique(np.asarray(stock_ids, np.int64), return_inverse=True)
+        location_keys, location_codes = np.unique(np.asarray(location_ids, np.int64), return_inverse=True)
+        order = np.argsort(item_codes, kind="stable")
+        self.item = item_codes[order].astype(np.int32)
+        self.location = location_codes[order].astype(np.int32)
+        self.qty = np.asarray(quantities, np.int64)[order]
+        sorted_locations = np.asarray(location_ids, np.int64)[order]
+        self.size = self.count = n
+
+        self.item_ids = item_keys.copy()
+        self.item_codes = dict(zip(item_keys.tolist(), range(len(item_keys))))
+        self.location_ids = location_keys.copy()
+        self.location_codes = dict(zip(location_keys.tolist(), range(len(location_keys))))
+
+        # Rows are grouped by item code, so each item's slots are one run
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(self.item, minlength=len(item_keys))))).tolist()
+        location_list = sorted_locations.tolist()
+        self.item_locations = [array("i", location_list[a:b]) for a, b in zip(bounds, bounds[1:])]
+        self.item_slots = [array("i", range(a, b)) for a, b in zip(bounds, bounds[1:])]
+
+        self.item_totals = np.add.reduceat(self.qty, bounds[:-1])
+        self.location_totals = np.bincount(self.location, weights=self.qty, minlength=len(location_keys)).astype(np.int64)
+        self.location_rows = np.bincount(self.location, minlength=len(location_keys)).astype(np.int64)
@@ -0,0 +1,129 @@
+# backend/app/routers/allocations.py
+
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+from app.database import get_connection
+from app.models import StockLot
+from app.store import store
+from app.transactions import StockTransaction
+from app.timeutil import to_utc
+from app.serialization import encode
+from app import allocation, crud
+
+router = APIRouter()
+
+
+# ---------- ALLOCATION ----------
+class RequisitionLine(BaseModel):
+    barcode: str
+    quantity: int
+
+
+class AllocationRequest(BaseModel):
+    lines: List[RequisitionLine] = []  # A requisition: components asked for directly
+    product_barcode: Optional[str] = None  # Or a build: this product's BOM components...
+    quantity: int = 1  # ...for this many units
+    policy: str = "fefo"  # fefo: soonest expiry, then oldest receipt; fifo: oldest receipt
+    prefer_locations: List[int] = []  # Draw from these locations (and what's under them) first, in order
+    reference: Optional[str] = None  # Work order or requisition number, kept in the logs
+    plan_id: Optional[str] = None  # From a preview: refuse to commit if the plan has changed since
+
+
+def requirements_of(request: AllocationRequest) -> Dict[int, int]:
+    """Stock id -> units to allocate, with repeated lines merged."""
+    if request.policy not in allocation.POLICIES:
+        raise HTTPException(status_code=400, detail=f"policy must be one of {', '.join(allocation.POLICIES)}")
+    for location_id in request.prefer_locations:
+        if not store.get_location(location_id):
+            raise HTTPException(status_code=400, detail=f"Location {location_id} not found")
+    needs = [(line.barcode, line.quantity) for line in request.lines]
+    if request.product_barcode:
+        bom = store.get_bom(request.product_barcode)
+        if not bom:
+            raise HTTPException(status_code=404, detail="BOM not found")
+        # One level, as POST /stock consumes when it builds the product
+        needs += [(component, qty * request.quantity) for component, qty in bom.components.items()]
+    requirements: Dict[int, int] = {}
+    for barcode, quantity in needs:
+        if quantity <= 0:
+            raise HTTPException(status_code=400, detail=f"Quantity for {barcode} must be positive")
+        item = store.get_by_barcode(barcode)
+        if not item:
+            raise HTTPException(status_code=400, detail=f"Item {barcode} not found")
+        requirements[item.id] = requirements.get(item.id, 0) + quantity
+    if not requirements:
+        raise HTTPException(status_code=400, detail="Nothing to allocate")
+    return requirements
+
+
+@router.post("/allocations/preview")
+def preview_allocation(request: AllocationRequest):
+    """Plan which lots and locations a build or requisition would draw from,
+    with a pick list in walk order; nothing is reserved or changed"""
+    requirements = requirements_of(request)
+    plan = allocation.preview(requirements, request.policy, request.prefer_locations)
+    # Plans for big builds run to thousands of fields: skip the generic encoder
+    return Response(encode(plan.as_dict()), media_type="application/json")
+
+
+@router.post("/allocations/commit")
+def commit_allocation(request: AllocationRequest):
+    """Plan again against current stock and take the picked quantities away"""
+    requirements = requirements_of(request)
+    with StockTransaction(requirements) as tx:
+        plan = allocation.plan_in(tx, requirements, request.policy, request.prefer_locations)
+        if request.plan_id and plan.plan_id != request.plan_id:
+            raise HTTPException(status_code=409, detail={"message": "Stock changed since the preview", "plan": plan.as_dict()})
+        if not plan.complete:
+            raise HTTPException(status_code=400, detail={"message": "Not enough stock", "shortages": plan.shortages})
+        details = {"used_for": request.product_barcode} if request.product_barcode else {}
+        if request.reference:
+            details["reference"] = request.reference
+        plan.stage(tx, "consume", details)
+    return Response(encode({**plan.as_dict(), "committed": True}), media_type="application/json")
+
+
+# ---------- LOTS ----------
+@router.get("/stock/{item_id}/lots")
+def get_lots(item_id: int):
+    """Every lot at each of an item's locations, soonest expiry first; stock
+    from before lots were tracked is listed without a receipt time"""
+    if not store.get_item(item_id):
+        raise HTTPException(status_code=404, detail="Item not found")
+    lots = crud.read_lots(get_connection(), [item_id])
+    results = []
+    with store.lock:
+        for location_id, quantity in store.rows_for_item(item_id):
+            path = " / ".join(loc.name for loc in store.location_path(location_id))
+            for lot_number, (received_at, expires_at, units) in lots.get((item_id, location_id), {}).items():
+                results.append({"location_id": location_id, "path": path, "quantity": units,
+                                "lot_number": lot_number or None, "received_at": received_at, "expires_at": expires_at})
+                quantity -= units
+            if quantity > 0:
+                results.append({"location_id": location_id, "path": path, "quantity": quantity, **allocation.NO_LOT})
+    return results
+
+
+@router.put("/stock/{item_id}/lots/{location_id}")
+def set_lot(item_id: int, location_id: int, lot: StockLot):
+    """Record the receipt time or expiry of a lot at a location. A lot number
+    the location doesn't hold yet is made from its untracked stock"""
+    if not store.get_item(item_id):
+        raise HTTPException(status_code=404, detail="Item not found")
+    with StockTransaction([item_id]):
+        held = store.quantity_at(item_id, location_id)
+        if held is None:
+            raise HTTPException(status_code=404, detail="Item has no stock at this location")
+        lots = crud.read_lots(get_connection(), [item_id]).get((item_id, location_id), {})
+        untracked = max(0, held - sum(units for _, _, units in lots.values()))
+        exists = (lot.lot_number or "") in lots
+        moving = lot.quantity if lot.quantity is not None else (0 if exists else untracked)
+        if moving > untracked:
+            raise HTTPException(status_code=400, detail=f"Only {untracked} units at this location aren't in a lot")
+        if not exists and moving == 0:
+            raise HTTPException(status_code=400, detail="No lot with this number here, and no untracked stock to make one from")
+        lot.received_at = to_utc(lot.received_at)
+        crud.save_lot(item_id, location_id, lot, moving)
+    return get_lots(item_id)
@@ -0,0 +1,49 @@
+# backend/app/routers/analytics.py
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Query
+
+from app.analytics import analytics, reorder_report
+from app.timeutil import to_utc
+
+router = APIRouter()
+
+WINDOW = Query(30, ge=1, le=365, description="Days of history the rates are computed over")
+LEAD_TIME = Query(7, ge=0, le=365, description="Days between ordering and receiving")
+SERVICE_Z = Query(1.65, ge=0, le=5, description="Safety stock in standard deviations of daily demand (1.65 ~ 95%)")
+
+
+@router.get("/analytics/rollup")
+def get_rollup(
+    bucket: str = Query("day", pattern="^(day|week)$"),
+    since: Optional[datetime] = None, until: Optional[datetime] = None,
+    barcode: Optional[str] = None, action: Optional[str] = None,
+):
+    """Log entry count and summed amount per bucket, barcode and action"""
+    return analytics.rollup(bucket, to_utc(since), to_utc(until), barcode, action)
+
+
+@router.get("/analytics/consumption")
+def get_consumption(window: int = WINDOW, lead_time: int = LEAD_TIME, z: float = SERVICE_Z):
+    """Consumption rate and reorder point of every barcode consumed within the window"""
+    return analytics.consumption(window, lead_time, z)
+
+
+@router.get("/analytics/consumption/{barcode}")
+def get_consumption_series(
+    barcode: str, days: int = Query(90, ge=1, le=730), window: int = Query(7, ge=1, le=90),
+):
+    """Daily consumption of one item with a rolling average"""
+    return analytics.series(barcode, days, window)
+
+
+@router.get("/analytics/reorder")
+def get_reorder(
+    window: int = WINDOW, lead_time: int = LEAD_TIME, z: float = SERVICE_Z,
+    due_only: bool = Query(True, description="Only items at or below their reorder point"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+):
+    """Items by days of cover left, with suggested order quantities"""
+    return reorder_report(window, lead_time, z, due_only, limit)
@@ -1,49 +1,117 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, List, Optional
-from datetime import datetime
-from app.routers.logs import stock_logs, StockLog
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from typing import List, Optional
+
+from app.models import BOM, StockLog
+from app.store import store
+from app.bom_engine import bom_engine
+from app import crud, versioning
+from app.changefeed import change_feed
+from app.database import transaction
+from app.serialization import bom_fragment, json_array
+from app.timeutil import utcnow
 
 router = APIRouter()
 
-class BOM(BaseModel):
-    product_barcode: str
-    description: Optional[str] = ""
-    components: Dict[str, int]  # {component_barcode: quantity}
 
-boms: List[BOM] = []
+def check_cycle(bom: BOM):
+    cycle = bom_engine.find_cycle(bom.product_barcode, bom.components)
+    if cycle:
+        raise HTTPException(status_code=400, detail=f"BOM would create a cycle: {' -> '.join(cycle)}")
 
 @router.get("/boms", response_model=List[BOM])
-def list_boms():
-    return boms
+def list_boms(
+    request: Request, response: Response,
+    since: Optional[int] = Query(None, ge=0, description="Only BOMs changed or deleted after this inventory version"),
+):
+    if since is not None:
+        version, changes = versioning.changes_since("boms", since)
+        with store.lock:
+            if changes is None:
+                return versioning.delta(version, list(store.iter_boms()), (), reset=True)
+            found = [(key, store.get_bom(key)) for _, key in changes]
+        return versioning.delta(version, [bom for _, bom in found if bom], [key for key, bom in found if not bom])
+    not_modified = versioning.conditional("boms", request, response)
+    if not_modified:
+        return not_modified
+    with store.lock:
+        fragments = [bom_fragment(bom.product_barcode) for bom in store.iter_boms()]
+    return json_array(fragments, response)
 
 @router.post("/boms", response_model=BOM)
 def add_bom(bom: BOM):
-    if any(b.product_barcode == bom.product_barcode for b in boms):
-        raise HTTPException(status_code=400, detail="BOM for this product already exists")
-    boms.append(bom)
-    stock_logs.append(StockLog(
-        timestamp=datetime.utcnow(),
-        action="bom_create",
-        barcode=bom.product_barcode,
-        amount=0,
-        resulting_qty=0,
-        details={"description": bom.description, "components": bom.components}
-    ))
+    # Check under the write lock, against every BOM committed so far (other
+    # workers' too); the BOM and its log entry commit together, as one
+    # change-feed batch
+    with transaction():
+        change_feed.catch_up()
+        if store.get_bom(bom.product_barcode):
+            raise HTTPException(status_code=400, detail="BOM for this product already exists")
+        check_cycle(bom)
+        crud.save_bom(bom)
+        crud.add_log(StockLog(
+            timestamp=utcnow(),
+            action="bom_create",
+            barcode=bom.product_barcode,
+            amount=0,
+            resulting_qty=0,
+            details={"description": bom.description, "components": bom.components}
+        ))
     return bom
 
 @router.put("/boms/{barcode}", response_model=BOM)
 def update_bom(barcode: str, updated: BOM):
-    for i, b in enumerate(boms):
-        if b.product_barcode == barcode:
-            boms[i] = updated
-            stock_logs.append(StockLog(
-                timestamp=datetime.utcnow(),
-                action="bom_update",
-                barcode=barcode,
-                amount=0,
-                resulting_qty=0,
-                details={"description": updated.description, "components": updated.components}
-            ))
-            return updated
-    raise HTTPException(status_code=404, detail="BOM not found")
+    with transaction():
+        change_feed.catch_up()
+        if not store.get_bom(barcode):
+            raise HTTPException(status_code=404, detail="BOM not found")
+        if updated.product_barcode != barcode and store.get_bom(updated.product_barcode):
+            raise HTTPException(status_code=400, detail="BOM for this product already exists")
+        check_cycle(updated)
+        crud.save_bom(updated, replaces=barcode)
+        crud.add_log(StockLog(
+            timestamp=utcnow(),
+            action="bom_update",
+            barcode=barcode,
+            amount=0,
+            resulting_qty=0,
+            details={"description": updated.description, "components": updated.components}
+        ))
+    return updated
+
+@router.delete("/boms/{barcode}")
+def delete_bom(barcode: str):
+    with transaction():
+        change_feed.catch_up()
+        if not store.get_bom(barcode):
+            raise HTTPException(status_code=404, detail="BOM not found")
+        crud.delete_bom(barcode)
+        crud.add_log(StockLog(
+            timestamp=utcnow(),
+            action="bom_delete",
+            barcode=barcode,
+            amount=0,
+            resulting_qty=0
+        ))
+    return {"message": "BOM deleted"}
+
+@router.get("/boms/{barcode}/requirements")
+def get_bom_requirements(barcode: str, quantity: int = Query(1, ge=1)):
+    """Raw parts for `quantity` units, fully exploded through sub-assemblies"""
+    with store.lock:
+        if not store.get_bom(barcode):
+            raise HTTPException(status_code=404, detail="BOM not found")
+        per_unit = bom_engine.leaf_requirements(barcode)
+        return {
+            "product_barcode": barcode,
+            "quantity": quantity,
+            "parts": {part: qty * quantity for part, qty in per_unit.items()},
+            "net_parts": bom_engine.net_requirements(barcode, quantity),
+        }
+
+@router.get("/boms/{barcode}/buildable")
+def get_bom_buildable(barcode: str):
+    """Maximum buildable quantity from current stock and the components that limit it"""
+    with store.lock:
+        if not store.get_bom(barcode):
+            raise HTTPException(status_code=404, detail="BOM not found")
+        return bom_engine.buildable(barcode)
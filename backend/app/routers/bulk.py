@@ -0,0 +1,73 @@
+# backend/app/routers/bulk.py
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app import bulk
+
+router = APIRouter()
+
+FORMAT = Query("csv", pattern="^(csv|ndjson)$", description="csv (with a header row) or ndjson")
+UPSERT = Query(False, description="Update records that already exist instead of reporting them")
+
+
+async def run_import(request: Request, importer: bulk.Importer, format: str) -> dict:
+    # Parsed in a worker thread while the body is still streaming in
+    return await run_in_threadpool(bulk.run_import, bulk.BodyStream(request.stream()), importer, format)
+
+
+def export_response(pages, columns, format: str, name: str) -> StreamingResponse:
+    if format == "csv":
+        return StreamingResponse(
+            bulk.export(pages, columns, format), media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{name}.csv"'},
+        )
+    return StreamingResponse(bulk.export(pages, columns, format), media_type="application/x-ndjson")
+
+
+# ---------- IMPORT ----------
+@router.post("/stock/import")
+async def import_stock(request: Request, format: str = FORMAT, upsert: bool = UPSERT):
+    """Create items from a CSV/NDJSON body keyed by barcode; optional location and quantity columns"""
+    return await run_import(request, bulk.StockImporter(upsert), format)
+
+
+@router.post("/stock_locations/import")
+async def import_stock_locations(
+    request: Request, format: str = FORMAT,
+    mode: str = Query("set", pattern="^(set|add)$", description="Replace quantities or add to them"),
+):
+    """Set per-location quantities: barcode or stock_id, location or location_id, quantity"""
+    return await run_import(request, bulk.StockLocationImporter(mode), format)
+
+
+@router.post("/locations/import")
+async def import_locations(request: Request, format: str = FORMAT, upsert: bool = UPSERT):
+    return await run_import(request, bulk.LocationImporter(upsert), format)
+
+
+@router.post("/categories/import")
+async def import_categories(request: Request, format: str = FORMAT, upsert: bool = UPSERT):
+    return await run_import(request, bulk.CategoryImporter(upsert), format)
+
+
+# ---------- EXPORT ----------
+@router.get("/stock/export")
+def export_stock(format: str = FORMAT):
+    return export_response(bulk.stock_records(), bulk.STOCK_COLUMNS, format, "stock")
+
+
+@router.get("/stock_locations/export")
+def export_stock_locations(format: str = FORMAT):
+    return export_response(bulk.stock_location_records(), bulk.STOCK_LOCATION_COLUMNS, format, "stock_locations")
+
+
+@router.get("/locations/export")
+def export_locations(format: str = FORMAT):
+    return export_response(bulk.location_records(), bulk.LOCATION_COLUMNS, format, "locations")
+
+
+@router.get("/categories/export")
+def export_categories(format: str = FORMAT):
+    return export_response(bulk.category_records(), bulk.CATEGORY_COLUMNS, format, "categories")
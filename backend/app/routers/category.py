@@ -1,34 +1,40 @@
 # category.py
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import List, Optional
 
-router = APIRouter()
-
-class CategoryTag(BaseModel):
-    id: Optional[int] = None
-    name: str
-    color: str  # Hex or tailwind-friendly color
+from app.models import CategoryTag
+from app.store import store
+from app import crud, versioning
 
-fake_categories: List[CategoryTag] = []
+router = APIRouter()
 
 @router.get("/categories", response_model=List[CategoryTag])
-def get_categories():
-    return fake_categories
+def get_categories(
+    request: Request, response: Response,
+    since: Optional[int] = Query(None, ge=0, description="Only categories changed or deleted after this inventory version"),
+):
+    if since is not None:
+        version, changes = versioning.changes_since("categories", since)
+        with store.lock:
+            if changes is None:
+                return versioning.delta(version, list(store.iter_categories()), (), reset=True)
+            found = [(int(key), store.get_category(int(key))) for _, key in changes]
+        return versioning.delta(version, [cat for _, cat in found if cat], [key for key, cat in found if not cat])
+    not_modified = versioning.conditional("categories", request, response)
+    if not_modified:
+        return not_modified
+    with store.lock:
+        return list(store.iter_categories())
 
 @router.post("/categories", response_model=CategoryTag)
 def create_category(cat: CategoryTag):
-    existing = next((c for c in fake_categories if c.name.lower() == cat.name.lower()), None)
-    if existing:
+    if store.get_category_by_name(cat.name):
         raise HTTPException(status_code=400, detail="Category already exists")
 
-    new_id = max([c.id or 0 for c in fake_categories], default=0) + 1
-    cat.id = new_id
-    fake_categories.append(cat)
-    return cat
+    cat.id = None
+    return crud.save_category(cat)
 
 @router.delete("/categories/{cat_id}")
 def delete_category(cat_id: int):
-    global fake_categories
-    fake_categories = [c for c in fake_categories if c.id != cat_id]
+    crud.delete_category(cat_id)
     return {"message": "Category deleted"}
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.events import event_hub, Client, EventFilter, format_sse, parse_set, KEEPALIVE_SECONDS
+from app.store import store
+
+router = APIRouter()
+
+
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    barcode: Optional[str] = Query(None, description="Comma-separated barcodes"),
+    location: Optional[str] = Query(None, description="Comma-separated location ids or names"),
+    action: Optional[str] = Query(None, description="Comma-separated log actions (scan_add, transfer_to, ...) or change types (stock, location.delete, ...)"),
+    last_event_id: Optional[int] = Query(None, description="Resume after this event; the Last-Event-ID header works too"),
+):
+    """Server-Sent Events stream of inventory changes."""
+    header = request.headers.get("last-event-id")
+    if last_event_id is None and header and header.isdigit():
+        last_event_id = int(header)
+
+    locations = None
+    if location:
+        locations = set()
+        for key in parse_set(location):
+            matches = store.match_locations(key)
+            if not matches:
+                raise HTTPException(status_code=400, detail="Location not found")
+            locations.update(matches)
+    client = Client(asyncio.get_running_loop(), EventFilter(parse_set(barcode), locations, parse_set(action)))
+    replay = await run_in_threadpool(event_hub.connect, client, last_event_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if replay is None:
+                # Too far behind to replay: the client should refetch, then follow
+                yield format_sse({"id": None, "event": "reset", "data": {}})
+            else:
+                for message in replay:
+                    yield format_sse(message)
+            while not client.overflowed:
+                try:
+                    message = await asyncio.wait_for(client.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if client.overflowed:
+                    break
+                yield format_sse(message)
+            yield format_sse({"id": None, "event": "overflow", "data": {"buffer": client.queue.maxsize}})
+        finally:
+            event_hub.remove(client)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from app import images
+
+router = APIRouter()
+
+
+@router.get("/images/{size}/{name}")
+async def get_image(size: str, name: str, request: Request):
+    """A thumbnail or preview of an uploaded image (``/static/images/<name>``)."""
+    if size not in images.SIZES:
+        raise HTTPException(status_code=404, detail="Unknown image size")
+    source = images.source_path(name)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # Names never change content, so the name is a strong validator
+    etag = f'"{size}-{name}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": images.IMMUTABLE})
+
+    target = await images.derivative(size, name)
+    if target is None:
+        # No Pillow or not a readable image: fall back to the original, briefly cached
+        return FileResponse(source, headers={"Cache-Control": "public, max-age=300"})
+    return FileResponse(target, media_type="image/webp", headers={"ETag": etag, "Cache-Control": images.IMMUTABLE})
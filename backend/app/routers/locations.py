@@ -1,77 +1,207 @@
 # backend/app/routers/locations.py
 
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel, constr
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel
 from typing import List, Optional
 
-router = APIRouter()
-
-class Location(BaseModel):
-    id: Optional[int] = None
-    name: constr(strip_whitespace=True, min_length=2)  # Name validation
-    locationType: str = "Internal Location"
-    storageCategory: Optional[str] = ""
-    company: str = "My Company"
+from app.models import Location
+from app.store import store
+from app import crud, versioning
+from app.changefeed import change_feed
+from app.database import transaction
 
-# In-memory location store
-fake_locations: List[Location] = []
+router = APIRouter()
 
 
 @router.get("/locations", response_model=List[Location])
 def get_locations(
+    request: Request, response: Response,
     search: Optional[str] = Query(None, description="Search by location name"),
     locationType: Optional[str] = Query(None, description="Filter by location type"),
+    since: Optional[int] = Query(None, ge=0, description="Only locations changed or deleted after this inventory version"),
 ):
     """Return all locations, optionally filtered by search or type"""
-    results = fake_locations
+    if since is not None:
+        if search or locationType:
+            raise HTTPException(status_code=400, detail="since can't be combined with filters")
+        version, changes = versioning.changes_since("locations", since)
+        with store.lock:
+            if changes is None:
+                return versioning.delta(version, list(store.iter_locations()), (), reset=True)
+            found = [(int(key), store.get_location(int(key))) for _, key in changes]
+        return versioning.delta(version, [loc for _, loc in found if loc], [key for key, loc in found if not loc])
+    not_modified = versioning.conditional("locations", request, response)
+    if not_modified:
+        return not_modified
+
+    with store.lock:
+        results = list(store.iter_locations())
     if search:
         results = [loc for loc in results if search.lower() in loc.name.lower()]
     if locationType:
         results = [loc for loc in results if loc.locationType.lower() == locationType.lower()]
-    return results
-
-
+    return list(results)
+
+
+# ---------- HIERARCHY ----------
+def check_parent(location_id: Optional[int], parent_id: Optional[int]):
+    """A parent must exist and must not sit inside the location being placed under it."""
+    if parent_id is None:
+        return
+    if not store.get_location(parent_id):
+        raise HTTPException(status_code=400, detail="Parent location not found")
+    if location_id is not None and store.tree.contains(location_id, parent_id):
+        raise HTTPException(status_code=400, detail="A location can't be placed inside itself or its own sub-locations")
+
+
+def subtree_summary(location_id: int) -> dict:
+    """What is stored anywhere under a location, from one scan of the quantity matrix."""
+    subtree = store.subtree_ids(location_id)
+    stock_ids, quantities = store.quantities.totals_at(subtree)
+    return {
+        "location_id": location_id,
+        "path": [loc.name for loc in store.location_path(location_id)],
+        "locations": len(subtree),
+        "items": len(stock_ids),
+        "units": int(quantities.sum()),
+    }
+
+
+def in_use(subtree: List[int]) -> List[dict]:
+    """Locations of a subtree that still have stock assigned."""
+    return [
+        {"id": lid, "name": store.get_location(lid).name, "items": store.quantities.location_count(lid),
+         "units": store.location_total(lid)}
+        for lid in subtree if store.location_in_use(lid)
+    ]
+
+
+@router.get("/locations/tree")
+def get_location_tree(request: Request, response: Response):
+    """Locations nested under their parents, each with the units and item
+    assignments stored anywhere beneath it"""
+    not_modified = versioning.conditional("location_tree", request, response)
+    if not_modified:
+        return not_modified
+    with store.lock:
+        totals = store.subtree_totals()
+
+        def node(location_id: int) -> dict:
+            loc = store.get_location(location_id)
+            units, rows = totals.get(location_id, (0, 0))
+            return {
+                "id": loc.id, "name": loc.name, "locationType": loc.locationType, "parent_id": loc.parent_id,
+                "units": units, "rows": rows, "children": [node(child) for child in store.tree.children(location_id)],
+            }
+
+        return [node(root) for root in store.tree.children(None)]
+
+
+@router.get("/locations/{location_id}/stock")
+def get_location_stock(location_id: int, limit: Optional[int] = Query(None, ge=1, description="Largest holdings first")):
+    """Every item stored anywhere under a location, with its quantity summed over the subtree"""
+    if not store.get_location(location_id):
+        raise HTTPException(status_code=404, detail="Location not found")
+    with store.lock:
+        summary = subtree_summary(location_id)
+        stock_ids, quantities = store.quantities.totals_at(store.subtree_ids(location_id))
+        order = quantities.argsort(kind="stable")[::-1]
+        if limit:
+            order = order[:limit]
+        stock = []
+        for stock_id, quantity in zip(stock_ids[order].tolist(), quantities[order].tolist()):
+            s = store.get_item(stock_id)
+            stock.append({"id": s.id, "name": s.name, "partId": s.partId, "barcode": s.barcode, "quantity": quantity})
+    return {**summary, "stock": stock}
+
+
+class MoveRequest(BaseModel):
+    parent_id: Optional[int] = None  # None moves the subtree to the top level
+    require_empty: bool = False  # Refuse if any stock is stored in the subtree
+    dry_run: bool = False  # Only report what would move
+
+
+@router.post("/locations/{location_id}/move")
+def move_location(location_id: int, request: MoveRequest):
+    """Re-parent a location with everything under it; reports the stock that moves along"""
+    # Check under the write lock, caught up with every worker's commits, so
+    # no stock write or tree change can land between the checks and the move
+    with transaction():
+        change_feed.catch_up()
+        with store.lock:
+            location = store.get_location(location_id)
+            if not location:
+                raise HTTPException(status_code=404, detail="Location not found")
+            check_parent(location_id, request.parent_id)
+            summary = subtree_summary(location_id)
+            if request.require_empty:
+                used = in_use(store.subtree_ids(location_id))
+                if used:
+                    raise HTTPException(status_code=409, detail={"message": "Stock is assigned in this subtree", **summary, "in_use": used})
+        if not request.dry_run and location.parent_id != request.parent_id:
+            crud.save_location(location.model_copy(update={"parent_id": request.parent_id}))
+    if not request.dry_run:
+        with store.lock:
+            summary["path"] = [loc.name for loc in store.location_path(location_id)]
+    return {**summary, "parent_id": request.parent_id, "moved": not request.dry_run}
+
+
+# ---------- CRUD ----------
 @router.post("/locations", response_model=Location)
 def add_location(location: Location):
     """Add a new location, ensuring no duplicate names"""
-    if any(l.name.lower() == location.name.lower() for l in fake_locations):
+    if store.get_location_by_name(location.name):
         raise HTTPException(status_code=400, detail="Location with this name already exists")
+    check_parent(None, location.parent_id)
 
-    location.id = (max([l.id or 0 for l in fake_locations]) + 1) if fake_locations else 1
-    fake_locations.append(location)
-    return location
+    location.id = None
+    return crud.save_location(location)
 
 
 @router.put("/locations/{location_id}", response_model=Location)
 def update_location(location_id: int, updated_location: Location):
     """Update an existing location"""
-    for idx, loc in enumerate(fake_locations):
-        if loc.id == location_id:
-            if any(
-                l.name.lower() == updated_location.name.lower() and l.id != location_id
-                for l in fake_locations
-            ):
-                raise HTTPException(status_code=400, detail="Another location with this name already exists")
-            
-            updated_location.id = location_id
-            fake_locations[idx] = updated_location
-            return updated_location
+    current = store.get_location(location_id)
+    if not current:
+        raise HTTPException(status_code=404, detail="Location not found")
 
-    raise HTTPException(status_code=404, detail="Location not found")
+    existing = store.get_location_by_name(updated_location.name)
+    if existing and existing.id != location_id:
+        raise HTTPException(status_code=400, detail="Another location with this name already exists")
+    # Editing the other fields leaves the location where it is
+    if "parent_id" not in updated_location.model_fields_set:
+        updated_location.parent_id = current.parent_id
+    check_parent(location_id, updated_location.parent_id)
 
+    updated_location.id = location_id
+    return crud.save_location(updated_location)
 
-@router.delete("/locations/{location_id}", response_model=dict)
-def delete_location(location_id: int):
-    """Delete a location only if it's not assigned to stock"""
-    from app.routers.stock import fake_stock_locations  # Avoid circular import at top
-
-    if any(loc.location_id == location_id for loc in fake_stock_locations):
-        raise HTTPException(status_code=400, detail="Cannot delete a location assigned to stock items")
-
-    global fake_locations
-    for loc in fake_locations:
-        if loc.id == location_id:
-            fake_locations = [l for l in fake_locations if l.id != location_id]
-            return {"message": "Location deleted"}
 
-    raise HTTPException(status_code=404, detail="Location not found")
+@router.delete("/locations/{location_id}", response_model=dict)
+def delete_location(
+    location_id: int,
+    recursive: bool = Query(False, description="Also delete every location nested under it"),
+):
+    """Delete a location (with recursive, its whole subtree) only if no stock is assigned anywhere in it"""
+    # As in move_location: check and delete in one write transaction
+    with transaction():
+        change_feed.catch_up()
+        with store.lock:
+            if not store.get_location(location_id):
+                raise HTTPException(status_code=404, detail="Location not found")
+
+            subtree = store.subtree_ids(location_id)
+            if len(subtree) > 1 and not recursive:
+                raise HTTPException(status_code=400, detail="Location has sub-locations; delete them first or pass recursive=true")
+            # One pass over the subtree's row counts instead of a lookup per location and item
+            used = in_use(subtree)
+            if used:
+                if len(subtree) == 1:
+                    raise HTTPException(status_code=400, detail="Cannot delete a location assigned to stock items")
+                raise HTTPException(status_code=400, detail={"message": "Cannot delete locations assigned to stock items", "in_use": used})
+
+        if len(subtree) == 1:
+            crud.delete_location(location_id)
+        else:
+            crud.delete_locations(subtree)
+    return {"message": "Location deleted", "deleted": subtree}
@@ -1,21 +1,62 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-from typing import List, Optional, Dict, Union
-from pydantic import BaseModel
+from typing import List, Optional
+
+from app.models import StockLog
+from app.logstore import log_store
+from app.serialization import json_array, log_fragment
+from app.timeutil import to_utc
 
 router = APIRouter()
-stock_logs = []
 
-class StockLog(BaseModel):
-    timestamp: datetime
-    barcode: str
-    action: str
-    amount: int
-    resulting_qty: int
-    details: Optional[Dict[str, Union[str, int, Dict, List[Union[str, int]]]]] = None
 
 @router.get("/stock_logs", response_model=List[StockLog])
-def get_stock_logs():
-    return stock_logs
+def get_stock_logs(
+    response: Response,
+    since: Optional[datetime] = Query(None, description="Only entries at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only entries before this time"),
+    barcode: Optional[str] = None,
+    action: Optional[str] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(500, ge=1, le=5000),
+    after: Optional[int] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+):
+    """One page of stock logs, newest first by default"""
+    rows, next_cursor = log_store.query(
+        limit, since=to_utc(since), until=to_utc(until), barcode=barcode, action=action,
+        after=after, descending=order == "desc",
+    )
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return json_array((log_fragment(row) for row in rows), response)
+
+
+@router.get("/stock_logs/export")
+def export_stock_logs(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    barcode: Optional[str] = None,
+    action: Optional[str] = None,
+):
+    """Stream the matching history without loading it into memory"""
+    filters = dict(since=to_utc(since), until=to_utc(until), barcode=barcode, action=action)
+    if format == "csv":
+        return StreamingResponse(
+            log_store.export_csv(**filters), media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="stock_logs.csv"'},
+        )
+    return StreamingResponse(log_store.export_ndjson(**filters), media_type="application/x-ndjson")
+
+
+@router.get("/stock_logs/segments")
+def get_log_segments():
+    return log_store.segment_stats()
 
 
+@router.post("/stock_logs/compact")
+def compact_stock_logs(retention_days: Optional[int] = Query(None, ge=1)):
+    """Drop segments past retention (if given) and merge small sealed segments"""
+    dropped = log_store.apply_retention(retention_days) if retention_days else 0
+    return {"dropped_segments": dropped, "merged_segments": log_store.compact()}
@@ -0,0 +1,39 @@
+# backend/app/routers/metrics.py
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import metrics
+from app.profiler import sampler
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Per-route latency, sizes and status counts plus store gauges, in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def require_profiler():
+    if not sampler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is off; set PROFILE_SLOW_MS to enable it")
+
+
+@router.get("/debug/profiles")
+def list_profiles():
+    """Slow requests profiled so far, newest first"""
+    require_profiler()
+    return [profile.summary() for profile in reversed(sampler.profiles)]
+
+
+@router.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+def download_profile(profile_id: int):
+    """Collapsed stacks of one slow request, for flamegraph.pl or speedscope"""
+    require_profiler()
+    profile = sampler.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        profile.collapsed(), headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+    )
@@ -0,0 +1,20 @@
+# backend/app/routers/stats.py
+
+from fastapi import APIRouter, Request, Response
+
+from app.store import store
+from app import versioning
+
+router = APIRouter()
+
+
+@router.get("/stats")
+def get_stats(request: Request, response: Response):
+    """Dashboard totals: units, value (cost x quantity), counts per status,
+    category and location, scrap and low-stock counts. Served from running
+    aggregates, so the cost doesn't grow with the inventory."""
+    not_modified = versioning.conditional("stats", request, response)
+    if not_modified:
+        return not_modified
+    with store.lock:
+        return store.stats()
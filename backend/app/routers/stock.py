@@ -1,64 +1,219 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
-from typing import List, Optional
-from pathlib import Path
-import shutil, uuid
-from datetime import datetime
-
-from app.models import Stock, StockLocation
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import JSONResponse
+from typing import Annotated, List, Literal, Optional, Tuple, Union
+from pydantic import AliasChoices, BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+import base64, json
+
+from app.models import Stock
 from app.schemas import StockCreate, StockResponse, StockLocationCreate, TransferRequest
-from app.routers.logs import stock_logs, StockLog
-from app.routers.bom import boms
+from app.store import store, iter_from
+from app.transactions import StockTransaction
+from app.uploads import discard_uploads, save_upload
+from app import allocation, images
+from app.serialization import stock_fragments, encode, json_array, PASSED_HEADERS
+from app import versioning
 
 router = APIRouter()
 
-# In-memory DB
-fake_stock: List[Stock] = []
-fake_stock_locations: List[StockLocation] = []
 
-UPLOAD_DIR = Path("app/uploads")
-(UPLOAD_DIR / "images").mkdir(parents=True, exist_ok=True)
-(UPLOAD_DIR / "files").mkdir(parents=True, exist_ok=True)
+def enrich_locations(stock_id: int) -> List[dict]:
+    """Per-location breakdown of an item, with location names resolved."""
+    enriched = []
+    for location_id, quantity in store.rows_for_item(stock_id):
+        loc = store.get_location(location_id)
+        enriched.append({
+            "location_id": location_id,
+            "location_name": loc.name if loc else None,
+            "quantity": quantity
+        })
+    return enriched
+
 
 # ---------- GET STOCK ----------
-@router.get("/stock", response_model=List[StockResponse])
-def get_stock(status: Optional[str] = None, location: Optional[str] = None, category: Optional[str] = Query(None), search: Optional[str] = Query(None)):
-    from app.routers.locations import fake_locations
-    stock_with_locations = []
-    for s in fake_stock:
-        enriched_locations = []
-        for loc in fake_stock_locations:
-            if loc.stock_id == s.id:
-                loc_name = next((l.name for l in fake_locations if l.id == loc.location_id), None)
-                enriched_locations.append({
-                    "location_id": loc.location_id,
-                    "location_name": loc_name,
-                    "quantity": loc.quantity
-                })
-
-        total_qty = sum(loc["quantity"] for loc in enriched_locations)
-
-        if location:
-            matched = [loc for loc in enriched_locations if str(loc["location_id"]) == str(location) or (loc["location_name"] and loc["location_name"].lower() == location.lower())]
-            if not matched:
-                continue
+STOCK_FIELDS = tuple(StockResponse.model_fields)
+
+
+def encode_cursor(sort: str, key, stock_id: int) -> str:
+    raw = json.dumps([sort, key, stock_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key, stock_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return (tuple(key) if isinstance(key, list) else key, stock_id)
+
+
+def serialize_item(s: Stock, fields: Optional[set] = None) -> dict:
+    if fields is None:
+        return {**s.dict(), "locations": enrich_locations(s.id)}
+    data = {name: getattr(s, name) for name in fields if name != "locations"}
+    if "locations" in fields:
+        data["locations"] = enrich_locations(s.id)
+    return data
+
+
+def stock_fragment(s: Stock) -> bytes:
+    """The full item as encoded JSON, cached until it changes."""
+    return stock_fragments.get(s.id, lambda: encode(serialize_item(s)))
+
+
+def stock_delta(since: int):
+    version, changes = versioning.changes_since("stock", since)
+    with store.lock:
+        if changes is None:
+            return versioning.delta(version, [serialize_item(s) for s in store.iter_sorted("id")], (), reset=True)
+        ids = set()
+        for entity, key in changes:
+            if entity == "location":
+                # Renaming a location changes the name embedded in its items
+                ids.update(store.ids_at_location(int(key)))
+            else:
+                ids.add(int(key))
+        changed, deleted = [], []
+        for stock_id in sorted(ids):
+            s = store.get_item(stock_id)
+            if s:
+                changed.append(serialize_item(s))
+            else:
+                deleted.append(stock_id)
+    return versioning.delta(version, changed, deleted)
 
+
+@router.get("/stock", response_model=List[StockResponse])
+def get_stock(
+    request: Request, response: Response,
+    status: Optional[str] = None, location: Optional[str] = None, category: Optional[str] = Query(None), search: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None, description="id, name, partId, cost or quantity; searches default to best match"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit for the full list"),
+    after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,barcode"),
+    since: Optional[int] = Query(None, ge=0, description="Only items changed or deleted after this inventory version"),
+    sublocations: bool = Query(True, description="Let the location filter match everything stored under the location too"),
+):
+    if since is not None:
+        if any((status, location, category, search, sort, limit, after, fields)):
+            raise HTTPException(status_code=400, detail="since can't be combined with filters, sorting or paging")
+        return stock_delta(since)
+    not_modified = versioning.conditional("stock", request, response)
+    if not_modified:
+        return not_modified
+
+    if sort is not None and sort not in store.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort}")
+    projection = None
+    if fields:
+        projection = {f.strip() for f in fields.split(",") if f.strip()} | {"id"}
+        unknown = projection - set(STOCK_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    # Hold the store lock for the whole walk so the change-feed poller
+    # can't apply a batch between picking the ids and reading them
+    with store.lock:
+        location_ids = store.match_locations(location) if location else None
+        if location and not location_ids:
+            return []
+        if location_ids and sublocations:
+            location_ids = list(dict.fromkeys(sub for lid in location_ids for sub in store.subtree_ids(lid)))
+        categories = set(category.split(",")) if category else None
+        descending = order == "desc"
+
+        # Indexed filters narrow the candidates to a set of ids, which is then
+        # ordered on its own; with none of them we walk the sort index directly
+        id_sets = []
+        if search:
+            matches = store.search.search(search)
+            id_sets.append(matches.keys())
         if status:
-            def get_status(qty):
-                if qty == 0: return "Out of Stock"
-                elif qty < 10: return "Low Stock"
-                return "In Stock"
-            if get_status(total_qty) != status:
+            id_sets.append(store.ids_with_status(status))
+        if location_ids:
+            id_sets.append(set(store.ids_at_locations(location_ids).tolist()))
+
+        if id_sets:
+            id_sets.sort(key=len)
+            ids = set(id_sets[0]).intersection(*id_sets[1:])
+            if search and sort is None:
+                # Best match first unless a sort was asked for
+                sort = "rank"
+                entries = sorted((store.search.rank_key(i, matches[i]), i) for i in ids)
+            else:
+                sort = sort or "id"
+                entries = sorted((store.sort_key(sort, i), i) for i in ids)
+            keys = {stock_id: key for key, stock_id in entries}
+            ordered = iter_from(entries, decode_cursor(after, sort) if after else None, descending)
+            candidates = (store.get_item(stock_id) for stock_id in ordered)
+        else:
+            sort = sort or "id"
+            keys = None
+            candidates = store.iter_sorted(sort, decode_cursor(after, sort) if after else None, descending)
+
+        stock_with_locations = []
+        last = None
+        for s in candidates:
+            if categories and s.category not in categories:
                 continue
 
-        if category and s.category not in category.split(","):
-            continue
-
-        if search and not (search.lower() in s.name.lower() or search.lower() in s.partId.lower() or search.lower() in s.barcode.lower()):
-            continue
-
-        stock_with_locations.append({**s.dict(), "locations": enriched_locations})
-
-    return stock_with_locations
+            if limit is not None and len(stock_with_locations) == limit:
+                key = keys[last.id] if keys is not None else store.sort_key(sort, last.id)
+                response.headers["X-Next-Cursor"] = encode_cursor(sort, key, last.id)
+                break
+
+            stock_with_locations.append(stock_fragment(s) if projection is None else serialize_item(s, projection))
+            last = s
+
+    if projection is not None:
+        # Partial rows don't fit StockResponse, so skip response-model validation
+        headers = {name: response.headers[name] for name in PASSED_HEADERS if name in response.headers}
+        return JSONResponse(stock_with_locations, headers=headers)
+    return json_array(stock_with_locations, response)
+
+@router.get("/stock/suggest")
+def suggest_stock(
+    q: str = Query(..., min_length=1),
+    field: str = Query("barcode", pattern="^(barcode|partId)$"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Items whose barcode or partId starts with ``q``, for scanner and part-number autocomplete."""
+    results = []
+    with store.lock:
+        for stock_id in store.search.prefix(q, field, limit):
+            s = store.get_item(stock_id)
+            results.append({"id": s.id, "name": s.name, "partId": s.partId, "barcode": s.barcode})
+    return results
+
+# ---------- BARCODE LOOKUP ----------
+@router.get("/stock/barcode/{barcode}", response_model=StockResponse)
+def get_stock_by_barcode(barcode: str):
+    """Single item by barcode; the encoded body is cached until the item changes."""
+    with store.lock:
+        s = store.get_by_barcode(barcode)
+        if not s:
+            raise HTTPException(status_code=404, detail="Item not found")
+        body = stock_fragment(s)
+    return Response(content=body, media_type="application/json")
+
+@router.get("/stock/low_stock")
+def get_low_stock():
+    """Items below their low-stock threshold, emptiest first."""
+    results = []
+    with store.lock:
+        ids = store.ids_with_status("Out of Stock") | store.ids_with_status("Low Stock")
+        for stock_id in sorted(ids, key=lambda i: (store.total_quantity(i), i)):
+            s = store.get_item(stock_id)
+            results.append({
+                "id": s.id, "name": s.name, "partId": s.partId, "barcode": s.barcode,
+                "quantity": store.total_quantity(s.id), "low_stock_threshold": s.low_stock_threshold,
+                "stock_status": store.status_of(s.id),
+            })
+    return results
 
 # ---------- CREATE STOCK ----------
 @router.post("/stock", response_model=StockResponse)
@@ -68,65 +223,76 @@ async def create_stock(
     locations: List[int] = Form(...), quantities: List[int] = Form(...),
     lot_number: Optional[str] = Form(None), bin_numbers: Optional[str] = Form(None),
     supplier: Optional[str] = Form(None), production_stage: Optional[str] = Form(None),
-    notes: Optional[str] = Form(None), image: Optional[UploadFile] = File(None), file: Optional[UploadFile] = File(None)
+    notes: Optional[str] = Form(None), low_stock_threshold: Optional[int] = Form(None),
+    image: Optional[UploadFile] = File(None), file: Optional[UploadFile] = File(None)
 ):
-    from app.routers.locations import fake_locations
-
     if not locations or not quantities or len(locations) != len(quantities):
         raise HTTPException(status_code=400, detail="Locations and quantities are required and must match.")
 
     for loc_id in locations:
-        if not any(l.id == loc_id for l in fake_locations):
+        if not store.get_location(loc_id):
             raise HTTPException(status_code=400, detail=f"Location {loc_id} not found.")
 
-    new_id = (max([i.id or 0 for i in fake_stock]) + 1) if fake_stock else 1
+    if store.get_by_barcode(barcode):
+        raise HTTPException(status_code=400, detail="Item with this barcode already exists")
+
     stock_item = Stock(
-        id=new_id, name=name, partId=partId, category=category, barcode=barcode, status=status,
+        name=name, partId=partId, category=category, barcode=barcode, status=status,
         cost=cost, lot_number=lot_number, bin_numbers=bin_numbers,
         supplier=supplier, production_stage=production_stage, notes=notes
     )
-
-    if image:
-        path = UPLOAD_DIR / "images" / f"{uuid.uuid4()}_{image.filename}"
-        with path.open("wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-        stock_item.image_url = f"/static/images/{path.name}"
-
-    if file:
-        pathf = UPLOAD_DIR / "files" / f"{uuid.uuid4()}_{file.filename}"
-        with pathf.open("wb") as buf:
-            shutil.copyfileobj(file.file, buf)
-        stock_item.file_url = f"/static/files/{pathf.name}"
-
-    fake_stock.append(stock_item)
-
-    for loc_id, qty in zip(locations, quantities):
-        fake_stock_locations.append(StockLocation(stock_id=new_id, location_id=loc_id, quantity=qty))
-
-    bom = next((b for b in boms if b.product_barcode == barcode), None)
+    if low_stock_threshold is not None:
+        stock_item.low_stock_threshold = low_stock_threshold
+
+    # Streamed off the event loop and stored once per distinct content
+    created = {}
+    try:
+        if image:
+            stock_item.image_url = await save_upload(image, "images", created)
+            images.warm(stock_item.image_url)
+
+        if file:
+            stock_item.file_url = await save_upload(file, "files", created)
+
+        # The transaction blocks on item locks and SQLite's write lock: keep it off the event loop
+        return await run_in_threadpool(write_new_stock, stock_item, list(zip(locations, quantities)))
+    except BaseException:
+        # No item refers to what this request stored: remove it now, not at the next startup sweep
+        await run_in_threadpool(discard_uploads, created)
+        raise
+
+
+def write_new_stock(stock_item: Stock, placements: List[Tuple[int, int]]) -> dict:
+    # Building an assembly consumes its components; lock them all and check
+    # every one before anything is written
+    bom = store.get_bom(stock_item.barcode)
+    total = sum(quantity for _, quantity in placements)
+    components = []
     if bom:
         for comp_barcode, qty_each in bom.components.items():
-            required = qty_each * sum(quantities)
-            comp = next((i for i in fake_stock if i.barcode == comp_barcode), None)
-            if not comp or sum(l.quantity for l in fake_stock_locations if l.stock_id == comp.id) < required:
-                raise HTTPException(status_code=400, detail=f"Not enough {comp.name if comp else comp_barcode} in stock")
-            for l in fake_stock_locations:
-                if l.stock_id == comp.id and required > 0:
-                    take = min(l.quantity, required)
-                    l.quantity -= take
-                    required -= take
-            stock_logs.append(StockLog(timestamp=datetime.utcnow(), action="consume", barcode=comp.barcode, amount=qty_each * sum(quantities), resulting_qty=sum(l.quantity for l in fake_stock_locations if l.stock_id == comp.id), details={"used_for": barcode}))
+            comp = store.get_by_barcode(comp_barcode)
+            if not comp:
+                raise HTTPException(status_code=400, detail=f"Not enough {comp_barcode} in stock")
+            components.append((comp, qty_each * total))
 
-    stock_logs.append(StockLog(timestamp=datetime.utcnow(), action="create", barcode=stock_item.barcode, amount=sum(quantities), resulting_qty=sum(quantities)))
+    with StockTransaction(comp.id for comp, _ in components) as tx:
+        if store.get_by_barcode(stock_item.barcode):
+            # Created by another worker since the check above
+            raise HTTPException(status_code=400, detail="Item with this barcode already exists")
+        # Oldest / soonest-expiring lots first, see app/allocation.py
+        plan = allocation.plan_in(tx, {comp.id: required for comp, required in components})
+        allocation.require_complete(plan)
+        plan.stage(tx, "consume", {"used_for": stock_item.barcode})
+        tx.create(stock_item, placements)
+        tx.log("create", stock_item.barcode, total, total)
 
-    return {**stock_item.dict(), "locations": [StockLocationCreate(location_id=loc_id, quantity=qty) for loc_id, qty in zip(locations, quantities)]}
+    return {**stock_item.dict(), "locations": enrich_locations(stock_item.id)}
 
 
 # ---------- UPDATE STOCK ----------
 @router.put("/stock/{item_id}", response_model=StockResponse)
-async def update_stock(item_id: int, stock_data: StockCreate):
-    from app.routers.locations import fake_locations #added (migh not work)
-    stock_item = next((s for s in fake_stock if s.id == item_id), None)
+def update_stock(item_id: int, stock_data: StockCreate):
+    stock_item = store.get_item(item_id)
     if not stock_item:
         raise HTTPException(status_code=404, detail="Item not found")
 
@@ -134,51 +300,42 @@ async def update_stock(item_id: int, stock_data: StockCreate):
         raise HTTPException(status_code=400, detail="At least one location is required.")
 
     for loc in stock_data.locations:
-        if not any(l.id == loc.location_id for l in fake_locations):
+        if not store.get_location(loc.location_id):
             raise HTTPException(status_code=400, detail=f"Location {loc.location_id} not found")
 
-    for field, value in stock_data.dict(exclude={"locations"}).items():
-        setattr(stock_item, field, value)
-
-    global fake_stock_locations
-    fake_stock_locations = [loc for loc in fake_stock_locations if loc.stock_id != item_id]
-    for loc in stock_data.locations:
-        fake_stock_locations.append(StockLocation(
-            stock_id=item_id,
-            location_id=loc.location_id,
-            quantity=loc.quantity
-        ))
-
-    stock_logs.append(StockLog(
-        timestamp=datetime.utcnow(),
-        action="update",
-        barcode=stock_item.barcode,
-        amount=sum(loc.quantity for loc in stock_data.locations),
-        resulting_qty=sum(loc.quantity for loc in stock_data.locations),
-        details={"updated_item": stock_item.id}
-    ))
-
-    return {**stock_item.dict(), "locations": stock_data.locations}
+    fields = stock_data.dict(exclude={"locations"})
+    if fields["low_stock_threshold"] is None:
+        del fields["low_stock_threshold"]
+    total = sum(loc.quantity for loc in stock_data.locations)
+
+    with StockTransaction([item_id]) as tx:
+        other = store.get_by_barcode(stock_data.barcode)
+        if other and other.id != item_id:
+            raise HTTPException(status_code=400, detail="Another item with this barcode already exists")
+        tx.update(item_id, **fields)
+        tx.replace_rows(item_id, ((loc.location_id, loc.quantity) for loc in stock_data.locations))
+        # Logged under the barcode the item has from now on; a change keeps the old one in details
+        details = {"updated_item": stock_item.id}
+        if stock_data.barcode != stock_item.barcode:
+            details["previous_barcode"] = stock_item.barcode
+        tx.log("update", stock_data.barcode, total, total, details)
+
+    return {**store.get_item(item_id).dict(), "locations": enrich_locations(item_id)}
 
 # ---------- DELETE STOCK ----------
 @router.delete("/stock/{item_id}")
-async def delete_stock(item_id: int):
-    global fake_stock, fake_stock_locations
-    item = next((i for i in fake_stock if i.id == item_id), None)
+def delete_stock(item_id: int):
+    item = store.get_item(item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
 
-    fake_stock = [i for i in fake_stock if i.id != item_id]
-    fake_stock_locations = [loc for loc in fake_stock_locations if loc.stock_id != item_id]
-
-    stock_logs.append(StockLog(
-        timestamp=datetime.utcnow(),
-        action="delete",
-        barcode=item.barcode,
-        amount=0,
-        resulting_qty=0,
-        details={"deleted_item": item.id}
-    ))
+    with StockTransaction([item_id]) as tx:
+        item = store.get_item(item_id)
+        if not item:
+            # Deleted by another request or worker since the check above
+            raise HTTPException(status_code=404, detail="Item not found")
+        tx.delete(item_id)
+        tx.log("delete", item.barcode, 0, 0, {"deleted_item": item.id})
 
     return {"message": "Item deleted"}
 
@@ -187,120 +344,317 @@ class ScrapRequest(StockLocationCreate):
     stock_id: int
     reason: Optional[str] = "No reason provided"
 
-@router.post("/stock/scrap")
-def scrap_item(data: ScrapRequest):
-    loc_entry = next((l for l in fake_stock_locations if l.location_id == data.location_id and l.stock_id == data.stock_id), None)
-    if not loc_entry:
+def plan_scrap(data: ScrapRequest, tx: StockTransaction) -> Tuple[Stock, int]:
+    """Validate and stage a scrap; returns the item and what's left at the location."""
+    current = tx.quantity(data.stock_id, data.location_id)
+    if current is None:
         raise HTTPException(status_code=404, detail="Stock item in this location not found")
 
-    if data.quantity <= 0 or loc_entry.quantity < data.quantity:
+    if data.quantity <= 0 or current < data.quantity:
         raise HTTPException(status_code=400, detail="Invalid scrap amount")
 
-    loc_entry.quantity -= data.quantity
+    stock_item = store.get_item(data.stock_id)
+    remaining = tx.adjust(data.stock_id, data.location_id, -data.quantity)
+    tx.update(stock_item.id, scrap_count=tx.field(stock_item.id, "scrap_count") + data.quantity)
+    tx.log("scrap", stock_item.barcode, data.quantity, remaining, {"reason": data.reason, "location_id": data.location_id})
+    return stock_item, remaining
 
-    stock_item = next(s for s in fake_stock if s.id == loc_entry.stock_id)
-    stock_item.scrap_count += data.quantity
 
-    stock_logs.append(StockLog(
-        timestamp=datetime.utcnow(),
-        action="scrap",
-        barcode=stock_item.barcode,
-        amount=data.quantity,
-        resulting_qty=loc_entry.quantity,
-        details={"reason": data.reason}
-    ))
+@router.post("/stock/scrap")
+def scrap_item(data: ScrapRequest):
+    with StockTransaction([data.stock_id]) as tx:
+        plan_scrap(data, tx)
 
-    return {"message": "Item scrapped successfully", "item": stock_item}
+    return {"message": "Item scrapped successfully", "item": store.get_item(data.stock_id)}
 
 # ---------- SCAN UPDATE ----------
-class ScanUpdateRequest(StockLocationCreate):
+class ScanUpdateRequest(BaseModel):
+    stock_id: Optional[int] = None
+    barcode: Optional[str] = None  # Alternative to stock_id for hardware scanners
+    location_id: Optional[int] = None  # Defaults to the item's first location
+    quantity: int = Field(validation_alias=AliasChoices("quantity", "amount"))  # The scanner page sends amount
     action: Optional[str] = "add"
 
-@router.post("/scan")
-def scan_update(request: ScanUpdateRequest):
-    loc_entry = next((l for l in fake_stock_locations if l.location_id == request.location_id and l.stock_id == request.stock_id), None)
-    if not loc_entry:
-        raise HTTPException(status_code=404, detail="Stock item in this location not found")
 
-    stock_item = next(s for s in fake_stock if s.id == loc_entry.stock_id)
+def resolve_scan_item(request: ScanUpdateRequest) -> Optional[Stock]:
+    if request.stock_id is not None:
+        return store.get_item(request.stock_id)
+    elif request.barcode:
+        return store.get_by_barcode(request.barcode)
+    raise HTTPException(status_code=400, detail="stock_id or barcode is required")
+
+
+def plan_scan(request: ScanUpdateRequest, tx: StockTransaction) -> Tuple[Stock, int, str]:
+    """Validate one scan against the transaction's quantities (including
+    scans already staged in it) and stage it; returns the item, new quantity
+    and log action."""
+    stock_item = resolve_scan_item(request)
+    if stock_item and request.location_id is None:
+        locations = tx.locations(stock_item.id)
+        if not locations:
+            raise HTTPException(status_code=400, detail="location_id is required: the item has no locations")
+        # Filled in so callers report where the scan went
+        request.location_id = locations[0]
+    current = tx.quantity(stock_item.id, request.location_id) if stock_item else None
+    if current is None:
+        raise HTTPException(status_code=404, detail="Stock item in this location not found")
 
     if request.action == "add":
-        loc_entry.quantity += request.quantity
-        log_action = "scan_add"
+        new_qty, log_action = current + request.quantity, "scan_add"
 
     elif request.action == "remove":
-        if loc_entry.quantity < request.quantity:
+        if current < request.quantity:
             raise HTTPException(status_code=400, detail="Not enough stock to remove")
-        loc_entry.quantity -= request.quantity
-        log_action = "scan_remove"
+        new_qty, log_action = current - request.quantity, "scan_remove"
 
     else:
         raise HTTPException(status_code=400, detail="Invalid action")
 
-    stock_logs.append(StockLog(
-        timestamp=datetime.utcnow(),
-        action=log_action,
-        barcode=stock_item.barcode,
-        amount=request.quantity,
-        resulting_qty=loc_entry.quantity
-    ))
+    tx.set_quantity(stock_item.id, request.location_id, new_qty)
+    tx.log(log_action, stock_item.barcode, request.quantity, new_qty, {"location_id": request.location_id})
+    return stock_item, new_qty, log_action
+
+
+@router.post("/scan")
+def scan_update(request: ScanUpdateRequest):
+    stock_item = resolve_scan_item(request)
+    with StockTransaction([stock_item.id] if stock_item else []) as tx:
+        stock_item, new_qty, log_action = plan_scan(request, tx)
 
     return {"message": "Stock updated", "item": stock_item}
 
 
-@router.post("/stock/transfer")
-def transfer_item(data: TransferRequest):
+@router.post("/scan/batch")
+def scan_batch(events: List[ScanUpdateRequest]):
+    """Apply a burst of scanner events in one request.
+
+    Events are validated in order, each seeing the quantities left by the
+    ones before it; failing events are reported and skipped. Everything that
+    passed is written in a single transaction with one bulk log append.
+    """
+    stock_ids = set()
+    for event in events:
+        try:
+            stock_item = resolve_scan_item(event)
+        except HTTPException:
+            continue
+        if stock_item:
+            stock_ids.add(stock_item.id)
+
+    results = []
+    with StockTransaction(stock_ids) as tx:
+        for index, event in enumerate(events):
+            try:
+                stock_item, new_qty, log_action = plan_scan(event, tx)
+            except HTTPException as exc:
+                results.append({"index": index, "ok": False, "status_code": exc.status_code, "error": exc.detail})
+                continue
+            results.append({
+                "index": index, "ok": True, "stock_id": stock_item.id, "barcode": stock_item.barcode,
+                "location_id": event.location_id, "resulting_qty": new_qty,
+            })
+        applied = len(tx.logs)
+
+    return {"applied": applied, "failed": len(events) - applied, "results": results}
+
+
+def plan_transfer(data: TransferRequest, tx: StockTransaction) -> Tuple[Stock, int, int]:
+    """Validate and stage a transfer; returns the item and both resulting quantities."""
     if data.location_id == data.to_location_id:
         raise HTTPException(status_code=400, detail="Source and destination locations must be different")
 
     # Find source entry
-    from_entry = next((l for l in fake_stock_locations if l.location_id == data.location_id and l.stock_id == data.stock_id), None)
-    if not from_entry:
+    available = tx.quantity(data.stock_id, data.location_id)
+    if available is None:
         raise HTTPException(status_code=404, detail="Stock item not found in source location")
 
-    if data.quantity <= 0 or from_entry.quantity < data.quantity:
+    if data.quantity <= 0 or available < data.quantity:
         raise HTTPException(status_code=400, detail="Invalid transfer quantity")
 
-    # Deduct from source
-    from_entry.quantity -= data.quantity
+    if not store.get_location(data.to_location_id):
+        raise HTTPException(status_code=404, detail="Destination location not found")
 
-    # Add to destination (or create if missing)
-    to_entry = next((l for l in fake_stock_locations if l.location_id == data.to_location_id and l.stock_id == data.stock_id), None)
-    if to_entry:
-        to_entry.quantity += data.quantity
-    else:
-        to_entry = StockLocation(stock_id=data.stock_id, location_id=data.to_location_id, quantity=data.quantity)
-        fake_stock_locations.append(to_entry)
-
-    stock_item = next(s for s in fake_stock if s.id == data.stock_id)
-
-    # Log transfer - FROM
-    stock_logs.append(StockLog(
-        timestamp=datetime.utcnow(),
-        action="transfer_from",
-        barcode=stock_item.barcode,
-        amount=-data.quantity,
-        resulting_qty=from_entry.quantity,
-        details={
-            "from_location": data.location_id,
-            "to_location": data.to_location_id,
-            "reason": data.reason
-        }
-    ))
-
-    # Log transfer - TO
-    stock_logs.append(StockLog(
-        timestamp=datetime.utcnow(),
-        action="transfer_to",
-        barcode=stock_item.barcode,
-        amount=data.quantity,
-        resulting_qty=to_entry.quantity,
-        details={
-            "from_location": data.location_id,
-            "to_location": data.to_location_id,
-            "reason": data.reason
-        }
-    ))
+    # Deduct from source, add to destination (or create if missing)
+    stock_item = store.get_item(data.stock_id)
+    from_qty, to_qty = tx.transfer(data.stock_id, data.location_id, data.to_location_id, data.quantity)
+
+    details = {"from_location": data.location_id, "to_location": data.to_location_id, "reason": data.reason}
+    tx.log("transfer_from", stock_item.barcode, -data.quantity, from_qty, details)
+    tx.log("transfer_to", stock_item.barcode, data.quantity, to_qty, details)
+    return stock_item, from_qty, to_qty
+
+
+@router.post("/stock/transfer")
+def transfer_item(data: TransferRequest):
+    with StockTransaction([data.stock_id]) as tx:
+        stock_item, _, _ = plan_transfer(data, tx)
 
     return {"message": "Transfer completed", "item": stock_item}
 
+
+# ---------- ADJUST ----------
+class AdjustRequest(BaseModel):
+    stock_id: Optional[int] = None
+    barcode: Optional[str] = None
+    partId: Optional[str] = None  # Must match exactly one item
+    location_id: Optional[int] = None  # Without it, add goes to the first location and remove takes from each in turn
+    amount: int
+    mode: str = "add"  # add, remove or set (set needs location_id)
+    reason: Optional[str] = None
+
+
+def resolve_adjust_item(request: AdjustRequest) -> Stock:
+    if request.stock_id is not None:
+        stock_item = store.get_item(request.stock_id)
+    elif request.barcode:
+        stock_item = store.get_by_barcode(request.barcode)
+    elif request.partId:
+        wanted = request.partId.strip().lower()
+        matches = [sid for sid in store.search.prefix(wanted, field="partId") if store.get_item(sid).partId.lower() == wanted]
+        if len(matches) > 1:
+            raise HTTPException(status_code=400, detail="Several items have this partId; use stock_id or barcode")
+        stock_item = store.get_item(matches[0]) if matches else None
+    else:
+        raise HTTPException(status_code=400, detail="stock_id, barcode or partId is required")
+    if not stock_item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return stock_item
+
+
+def plan_adjust(request: AdjustRequest, tx: StockTransaction) -> Tuple[Stock, int]:
+    """Validate and stage an adjustment; returns the item and its new total."""
+    stock_item = resolve_adjust_item(request)
+    sid = stock_item.id
+    if request.mode not in ("add", "remove", "set"):
+        raise HTTPException(status_code=400, detail="Invalid mode")
+    if request.amount < 0 or (request.amount == 0 and request.mode != "set"):
+        raise HTTPException(status_code=400, detail="Invalid adjustment amount")
+
+    if request.location_id is not None:
+        if not store.get_location(request.location_id):
+            raise HTTPException(status_code=404, detail="Location not found")
+        current = tx.quantity(sid, request.location_id) or 0
+        if request.mode == "set":
+            new_qty = request.amount
+        elif request.mode == "add":
+            new_qty = current + request.amount
+        elif current < request.amount:
+            raise HTTPException(status_code=400, detail="Not enough stock to remove")
+        else:
+            new_qty = current - request.amount
+        changes = [(request.location_id, current, new_qty)]
+    elif request.mode == "set":
+        raise HTTPException(status_code=400, detail="location_id is required to set a quantity")
+    elif request.mode == "add":
+        locations = tx.locations(sid)
+        if not locations:
+            raise HTTPException(status_code=400, detail="Item has no location to add to; give location_id")
+        current = tx.quantity(sid, locations[0]) or 0
+        changes = [(locations[0], current, current + request.amount)]
+    else:
+        if tx.total(sid) < request.amount:
+            raise HTTPException(status_code=400, detail="Not enough stock to remove")
+        changes, left = [], request.amount
+        for location_id in tx.locations(sid):
+            current = tx.quantity(sid, location_id) or 0
+            take = min(current, left)
+            if take:
+                changes.append((location_id, current, current - take))
+                left -= take
+            if not left:
+                break
+
+    for location_id, before, after in changes:
+        if after == before:
+            continue
+        tx.set_quantity(sid, location_id, after)
+        details = {"location_id": location_id, "mode": request.mode}
+        if request.reason:
+            details["reason"] = request.reason
+        tx.log("adjust", stock_item.barcode, after - before, after, details)
+    return stock_item, tx.total(sid)
+
+
+@router.post("/stock/adjust")
+def adjust_stock(request: AdjustRequest):
+    stock_item = resolve_adjust_item(request)
+    with StockTransaction([stock_item.id]) as tx:
+        stock_item, total = plan_adjust(request, tx)
+
+    return {"message": "Stock adjusted", "item": stock_item, "quantity": total}
+
+
+# ---------- BATCH OPERATIONS ----------
+class AdjustOp(AdjustRequest):
+    op: Literal["adjust"]
+
+class ScanOp(ScanUpdateRequest):
+    op: Literal["scan"]
+
+class TransferOp(TransferRequest):
+    op: Literal["transfer"]
+
+class ScrapOp(ScrapRequest):
+    op: Literal["scrap"]
+
+StockOp = Annotated[Union[AdjustOp, ScanOp, TransferOp, ScrapOp], Field(discriminator="op")]
+
+class StockOpsRequest(BaseModel):
+    ops: List[StockOp]
+    atomic: bool = True  # All or nothing; false applies the ops that pass and reports the rest
+
+
+def op_stock_id(op) -> Optional[int]:
+    try:
+        if isinstance(op, AdjustOp):
+            return resolve_adjust_item(op).id
+        if isinstance(op, ScanOp):
+            stock_item = resolve_scan_item(op)
+            return stock_item.id if stock_item else None
+    except HTTPException:
+        return None
+    return op.stock_id
+
+
+def plan_op(op, tx: StockTransaction) -> dict:
+    """Stage one operation; returns its result fields."""
+    if isinstance(op, AdjustOp):
+        stock_item, total = plan_adjust(op, tx)
+        return {"stock_id": stock_item.id, "barcode": stock_item.barcode, "quantity": total}
+    if isinstance(op, ScanOp):
+        stock_item, new_qty, _ = plan_scan(op, tx)
+        return {"stock_id": stock_item.id, "barcode": stock_item.barcode, "location_id": op.location_id, "resulting_qty": new_qty}
+    if isinstance(op, TransferOp):
+        stock_item, from_qty, to_qty = plan_transfer(op, tx)
+        return {"stock_id": stock_item.id, "barcode": stock_item.barcode, "from_qty": from_qty, "to_qty": to_qty}
+    stock_item, remaining = plan_scrap(op, tx)
+    return {"stock_id": stock_item.id, "barcode": stock_item.barcode, "location_id": op.location_id, "resulting_qty": remaining}
+
+
+@router.post("/stock/ops")
+def stock_ops(request: StockOpsRequest):
+    """Apply a list of adjust / scan / transfer / scrap operations in one transaction.
+
+    Ops run in order, each seeing the quantities left by the ones before it,
+    and all logs are appended together. With ``atomic`` (the default) any
+    failing op rejects the whole batch with a 409 listing the results;
+    otherwise failing ops are reported and skipped.
+    """
+    stock_ids = {sid for sid in map(op_stock_id, request.ops) if sid is not None}
+
+    results = []
+    failed = 0
+    with StockTransaction(stock_ids) as tx:
+        for index, op in enumerate(request.ops):
+            try:
+                result = plan_op(op, tx)
+            except HTTPException as exc:
+                failed += 1
+                results.append({"index": index, "op": op.op, "ok": False, "status_code": exc.status_code, "error": exc.detail})
+                continue
+            results.append({"index": index, "op": op.op, "ok": True, **result})
+        if failed and request.atomic:
+            # Leaving the block with an exception discards everything staged
+            raise HTTPException(status_code=409, detail={"applied": 0, "failed": failed, "results": results})
+
+    return {"applied": len(request.ops) - failed, "failed": failed, "results": results}
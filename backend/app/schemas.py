@@ -27,6 +27,7 @@ class StockCreate(BaseModel):
     production_stage: Optional[str] = None
     notes: Optional[str] = None
     cost: Optional[float] = 0.0  # Added cost field
+    low_stock_threshold: Optional[int] = None  # Keeps the current threshold when omitted
     locations: List[StockLocationCreate]
 
 # ---------- RESPONSE ----------
@@ -46,6 +47,7 @@ class StockResponse(BaseModel):
     image_url: Optional[str]
     file_url: Optional[str]
     cost: Optional[float] = 0.0 
+    low_stock_threshold: int = 10
     locations: List[StockLocationResponse]
 
 # ---------- TRANSFER ----------
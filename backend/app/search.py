@@ -0,0 +1,166 @@
+# backend/app/search.py
+
+"""
+Incremental search index for stock items.
+
+Every searchable field is lowercased once, when the item is indexed, and
+broken into 1-, 2- and 3-grams. A query of up to three characters is then a
+single posting lookup; longer queries intersect the postings of their
+trigrams (rarest first) and verify the few surviving candidates. Barcodes and
+part ids are also kept in sorted lists so prefix matches, the usual case for
+scanner input and part numbers, come from a bisect range.
+"""
+
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models import Stock
+
+SEARCH_FIELDS = ("name", "partId", "barcode", "supplier", "lot_number")
+
+# Higher scores rank first
+SCORE_EXACT_CODE = 100
+SCORE_PREFIX_CODE = 80
+SCORE_PREFIX_NAME = 60
+SCORE_NAME = 40
+SCORE_CODE = 30
+SCORE_OTHER = 10
+
+
+def grams(text: str) -> Set[str]:
+    out = set()
+    for size in (1, 2, 3):
+        for i in range(len(text) - size + 1):
+            out.add(text[i:i + size])
+    return out
+
+
+class SortedPrefixes:
+    """Sorted ``(value, id)`` pairs supporting prefix range lookups."""
+
+    def __init__(self):
+        self.entries: List[Tuple[str, int]] = []
+
+    def add(self, value: str, stock_id: int):
+        insort(self.entries, (value, stock_id))
+
+    def discard(self, value: str, stock_id: int):
+        pos = bisect_left(self.entries, (value, stock_id))
+        if pos < len(self.entries) and self.entries[pos] == (value, stock_id):
+            del self.entries[pos]
+
+    def rebuild(self, pairs: Iterable[Tuple[str, int]]):
+        self.entries = sorted(pairs)
+
+    def with_prefix(self, prefix: str) -> Iterable[int]:
+        pos = bisect_left(self.entries, (prefix, -1))
+        while pos < len(self.entries) and self.entries[pos][0].startswith(prefix):
+            yield self.entries[pos][1]
+            pos += 1
+
+
+class SearchIndex:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.docs: Dict[int, Tuple[str, ...]] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        self.barcodes = SortedPrefixes()
+        self.part_ids = SortedPrefixes()
+
+    @staticmethod
+    def _doc(item: Stock) -> Tuple[str, ...]:
+        return tuple((getattr(item, field) or "").lower() for field in SEARCH_FIELDS)
+
+    def add(self, item: Stock, sorted_too: bool = True):
+        doc = self._doc(item)
+        self.docs[item.id] = doc
+        for gram in set().union(*(grams(text) for text in doc)):
+            self.postings.setdefault(gram, set()).add(item.id)
+        if sorted_too:
+            self.barcodes.add(doc[2], item.id)
+            self.part_ids.add(doc[1], item.id)
+
+    def discard(self, stock_id: int):
+        doc = self.docs.pop(stock_id, None)
+        if doc is None:
+            return
+        for gram in set().union(*(grams(text) for text in doc)):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(stock_id)
+                if not ids:
+                    del self.postings[gram]
+        self.barcodes.discard(doc[2], stock_id)
+        self.part_ids.discard(doc[1], stock_id)
+
+    def update(self, item: Stock):
+        if self.docs.get(item.id) == self._doc(item):
+            return
+        self.discard(item.id)
+        self.add(item)
+
+    def rebuild(self, items: Iterable[Stock]):
+        self.clear()
+        for item in items:
+            self.add(item, sorted_too=False)
+        self.barcodes.rebuild((doc[2], stock_id) for stock_id, doc in self.docs.items())
+        self.part_ids.rebuild((doc[1], stock_id) for stock_id, doc in self.docs.items())
+
+    # ---------- QUERIES ----------
+    def candidates(self, needle: str) -> Set[int]:
+        if len(needle) <= 3:
+            return set(self.postings.get(needle, ()))
+        trigrams = {needle[i:i + 3] for i in range(len(needle) - 2)}
+        postings = sorted((self.postings.get(g, set()) for g in trigrams), key=len)
+        if not postings[0]:
+            return set()
+        result = set(postings[0])
+        for ids in postings[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    def score(self, stock_id: int, needle: str) -> int:
+        name, part_id, barcode, supplier, lot_number = self.docs[stock_id]
+        if needle == barcode or needle == part_id:
+            return SCORE_EXACT_CODE
+        if barcode.startswith(needle) or part_id.startswith(needle):
+            return SCORE_PREFIX_CODE
+        if name.startswith(needle):
+            return SCORE_PREFIX_NAME
+        if needle in name:
+            return SCORE_NAME
+        if needle in barcode or needle in part_id:
+            return SCORE_CODE
+        if needle in supplier or needle in lot_number:
+            return SCORE_OTHER
+        return 0
+
+    def search(self, query: str) -> Dict[int, int]:
+        """Matching ids mapped to their score."""
+        needle = query.strip().lower()
+        if not needle:
+            return {}
+        matches = {}
+        for stock_id in self.candidates(needle):
+            score = self.score(stock_id, needle)
+            if score:
+                matches[stock_id] = score
+        return matches
+
+    def rank_key(self, stock_id: int, score: int) -> Tuple[int, str]:
+        """Sort key putting the best match first, then by name."""
+        return (-score, self.docs[stock_id][0])
+
+    def prefix(self, query: str, field: str = "barcode", limit: Optional[int] = None) -> List[int]:
+        """Ids whose barcode (or partId) starts with ``query``."""
+        index = self.barcodes if field == "barcode" else self.part_ids
+        out = []
+        for stock_id in index.with_prefix(query.strip().lower()):
+            out.append(stock_id)
+            if limit is not None and len(out) >= limit:
+                break
+        return out
@@ -0,0 +1,120 @@
+# backend/app/serialization.py
+
+"""
+Cached JSON encoding for the collection endpoints.
+
+Each item, BOM and log entry is encoded once into a JSON fragment and kept
+until its record changes; store notifications drop the fragment of the
+record they name (and, for a location change, those of the items stored
+there). A collection response is the fragments joined into an array and
+sent as-is, skipping response-model validation and re-encoding; the
+fragments are built from data the API already validated on the way in.
+
+A fragment built while its record was being changed is not kept: every
+invalidation bumps the record's version and a fragment is only stored if
+the version it was built under is still current.
+"""
+
+import json
+import threading
+from typing import Callable, Dict, Hashable, Iterable, Optional
+
+from fastapi import Response
+
+from app.cache import LRUCache
+from app.logstore import LogRow
+from app.store import store
+
+# Headers set by the endpoint on its injected response, carried over
+PASSED_HEADERS = ("X-Next-Cursor", "ETag", "X-Inventory-Version")
+
+
+def encode(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+class FragmentCache:
+    """Encoded JSON per key, dropped when the keyed record changes."""
+
+    def __init__(self):
+        self._fragments: Dict[Hashable, bytes] = {}
+        self._versions: Dict[Hashable, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            return fragment
+        with self._lock:
+            version = (self._epoch, self._versions.get(key, 0))
+        fragment = build()
+        with self._lock:
+            if (self._epoch, self._versions.get(key, 0)) == version:
+                self._fragments[key] = fragment
+        return fragment
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._fragments.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._versions.clear()
+            self._epoch += 1
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+
+stock_fragments = FragmentCache()
+bom_fragments = FragmentCache()
+# Log entries never change, so their fragments only need bounding
+log_fragments = LRUCache(maxsize=20000)
+
+
+def _on_change(kind: str, key):
+    if kind == "item":
+        stock_fragments.invalidate(key)
+    elif kind == "location":
+        # Items embed the names of their locations
+        for stock_id in list(store.ids_at_location(key)):
+            stock_fragments.invalidate(stock_id)
+    elif kind == "bom":
+        bom_fragments.invalidate(key)
+    elif kind == "reset":
+        stock_fragments.clear()
+        bom_fragments.clear()
+        # A reload may be of another database, where the same log ids are other entries
+        log_fragments.clear()
+
+
+store.subscribe(_on_change)
+
+
+def json_array(fragments: Iterable[bytes], response: Optional[Response] = None) -> Response:
+    """A JSON array response made of already-encoded elements."""
+    headers = {}
+    if response is not None:
+        headers = {name: response.headers[name] for name in PASSED_HEADERS if name in response.headers}
+    return Response(b"[" + b",".join(fragments) + b"]", media_type="application/json", headers=headers)
+
+
+def bom_fragment(barcode: str) -> bytes:
+    return bom_fragments.get(barcode, lambda: encode(store.get_bom(barcode).model_dump()))
+
+
+def log_fragment(row: LogRow) -> bytes:
+    """A ``StockLog`` as JSON, straight from its row; details are stored as JSON already."""
+    fragment = log_fragments.get(row[0])
+    if fragment is None:
+        _, ts, barcode, action, amount, resulting_qty, details = row
+        head = json.dumps(
+            {"timestamp": ts, "barcode": barcode, "action": action, "amount": amount, "resulting_qty": resulting_qty},
+            separators=(",", ":"), ensure_ascii=False,
+        )
+        fragment = f'{head[:-1]},"details":{details or "null"}}}'.encode()
+        log_fragments.put(row[0], fragment)
+    return fragment
@@ -0,0 +1,455 @@
+# backend/app/store.py
+
+"""
+In-memory inventory store.
+
+Every collection is kept in dicts keyed the way the routers look things up,
+so finding an item, a barcode, a (stock, location) row or a location name is
+a hash lookup instead of a scan over a list. The store is a cache of the
+SQLite tables: routers read from the shared ``store`` instance at the bottom
+of this module and write through ``app.crud``, which keeps both in step.
+
+Per-location quantities are the bulk of the data; they live in the compact
+``QuantityMatrix`` (see app/quantities.py) and come out as plain
+``(location_id, quantity)`` tuples, not models.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.models import Stock, Location, CategoryTag, BOM
+from app.location_tree import LocationTree
+from app.quantities import QuantityMatrix
+from app.search import SearchIndex
+
+STATUSES = ("Out of Stock", "Low Stock", "In Stock")
+
+
+def stock_status(qty: int, threshold: int = 10) -> str:
+    if qty <= 0: return "Out of Stock"
+    elif qty < threshold: return "Low Stock"
+    return "In Stock"
+
+
+def iter_from(entries: List[Tuple[Any, int]], after: Optional[Tuple[Any, int]] = None,
+              descending: bool = False) -> Iterator[int]:
+    """Ids of sorted ``(key, id)`` entries, starting just past the ``after`` cursor."""
+    if descending:
+        pos = bisect_left(entries, tuple(after)) if after is not None else len(entries)
+        for i in range(pos - 1, -1, -1):
+            yield entries[i][1]
+    else:
+        pos = bisect_right(entries, tuple(after)) if after is not None else 0
+        for i in range(pos, len(entries)):
+            yield entries[i][1]
+
+
+class SortedIndex:
+    """Stock ids ordered by ``(key, id)``, kept sorted with bisect so a page
+    can start at any cursor without sorting the whole inventory."""
+
+    def __init__(self, key_func: Callable[[Stock], Any]):
+        self.key_func = key_func
+        self.entries: List[Tuple[Any, int]] = []
+        self.keys: Dict[int, Any] = {}
+
+    def clear(self):
+        self.entries = []
+        self.keys = {}
+
+    def add(self, item: Stock):
+        key = self.key_func(item)
+        self.keys[item.id] = key
+        insort(self.entries, (key, item.id))
+
+    def discard(self, stock_id: int):
+        if stock_id not in self.keys:
+            return
+        key = self.keys.pop(stock_id)
+        pos = bisect_left(self.entries, (key, stock_id))
+        if pos < len(self.entries) and self.entries[pos] == (key, stock_id):
+            del self.entries[pos]
+
+    def update(self, item: Stock):
+        if item.id in self.keys and self.keys[item.id] == self.key_func(item):
+            return
+        self.discard(item.id)
+        self.add(item)
+
+    def rebuild(self, items: Iterable[Stock]):
+        self.keys = {item.id: self.key_func(item) for item in items}
+        self.entries = sorted((key, stock_id) for stock_id, key in self.keys.items())
+
+    def iter_ids(self, after: Optional[Tuple[Any, int]] = None, descending: bool = False) -> Iterator[int]:
+        return iter_from(self.entries, after, descending)
+
+
+class InventoryStore:
+    SORT_KEYS = ("id", "name", "partId", "cost", "quantity")
+
+    def __init__(self):
+        self.sorted: Dict[str, SortedIndex] = {
+            "id": SortedIndex(lambda item: item.id),
+            "name": SortedIndex(lambda item: item.name.lower()),
+            "partId": SortedIndex(lambda item: item.partId.lower()),
+            "cost": SortedIndex(lambda item: item.cost or 0.0),
+            "quantity": SortedIndex(lambda item: self.total_quantity(item.id)),
+        }
+        self.search = SearchIndex()
+        self.listeners: List[Callable[[str, Any], None]] = []
+        self._bulk = False
+        # Held while a committed change is applied, so writers don't interleave;
+        # readers that walk more than one structure hold it for the whole read
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.items: Dict[int, Stock] = {}
+        self.barcodes: Dict[str, int] = {}
+        self.quantities = QuantityMatrix()
+        self.locations: Dict[int, Location] = {}
+        self.location_names: Dict[str, int] = {}
+        self.tree = LocationTree()
+        self.categories: Dict[int, CategoryTag] = {}
+        self.category_names: Dict[str, int] = {}
+        self.boms: Dict[str, BOM] = {}
+        self.statuses: Dict[int, str] = {}
+        self.status_buckets: Dict[str, set] = {status: set() for status in STATUSES}
+        # Dashboard aggregates (see stats()), also kept in step with every change
+        self.units = 0
+        self.value = 0.0
+        self.scrapped = 0
+        self.category_counts: Dict[str, int] = {}
+        self._next_ids = {"stock": 1, "location": 1, "category": 1}
+        for index in self.sorted.values():
+            index.clear()
+        self.search.clear()
+        self._notify("reset", None)
+
+    def subscribe(self, listener: Callable[[str, Any], None]):
+        """Call ``listener(kind, key)`` after every change; kind is item, location, category, bom or reset."""
+        self.listeners.append(listener)
+
+    def _notify(self, kind: str, key: Any):
+        if self._bulk:
+            return
+        for listener in self.listeners:
+            listener(kind, key)
+
+    @contextmanager
+    def bulk_load(self):
+        """Skip per-row index maintenance while loading, then rebuild once."""
+        self._bulk = True
+        try:
+            yield self
+        finally:
+            self._bulk = False
+            for index in self.sorted.values():
+                index.rebuild(self.items.values())
+            self.search.rebuild(self.items.values())
+            self._notify("reset", None)
+
+    def next_id(self, kind: str) -> int:
+        new_id = self._next_ids[kind]
+        self._next_ids[kind] = new_id + 1
+        return new_id
+
+    def _seen_id(self, kind: str, used_id: int):
+        if used_id >= self._next_ids[kind]:
+            self._next_ids[kind] = used_id + 1
+
+    # ---------- STOCK ----------
+    def get_item(self, stock_id: int) -> Optional[Stock]:
+        return self.items.get(stock_id)
+
+    def get_by_barcode(self, barcode: str) -> Optional[Stock]:
+        stock_id = self.barcodes.get(barcode)
+        return self.items.get(stock_id) if stock_id is not None else None
+
+    def iter_items(self) -> Iterator[Stock]:
+        return iter(self.items.values())
+
+    def add_item(self, item: Stock) -> Stock:
+        if item.id is None:
+            item.id = self.next_id("stock")
+        else:
+            self._seen_id("stock", item.id)
+        self.items[item.id] = item
+        self.barcodes[item.barcode] = item.id
+        self._count(item, 1)
+        self._refresh_status(item.id)
+        if not self._bulk:
+            for index in self.sorted.values():
+                index.add(item)
+            self.search.add(item)
+        self._notify("item", item.id)
+        return item
+
+    def update_item(self, stock_id: int, fields: dict) -> Stock:
+        item = self.items[stock_id]
+        old_barcode = item.barcode
+        self._count(item, -1)
+        for field, value in fields.items():
+            setattr(item, field, value)
+        self._count(item, 1)
+        if item.barcode != old_barcode:
+            if self.barcodes.get(old_barcode) == stock_id:
+                del self.barcodes[old_barcode]
+            self.barcodes[item.barcode] = stock_id
+        self._refresh_status(stock_id)
+        if not self._bulk:
+            for index in self.sorted.values():
+                index.update(item)
+            self.search.update(item)
+        self._notify("item", stock_id)
+        return item
+
+    def remove_item(self, stock_id: int) -> Optional[Stock]:
+        item = self.items.pop(stock_id, None)
+        if item is None:
+            return None
+        if self.barcodes.get(item.barcode) == stock_id:
+            del self.barcodes[item.barcode]
+        self._count(item, -1)
+        for location_id, _ in self.quantities.item_rows(stock_id):
+            self._drop_row(stock_id, location_id)
+        self.quantities.forget_item(stock_id)
+        self.status_buckets[self.statuses.pop(stock_id)].discard(stock_id)
+        for index in self.sorted.values():
+            index.discard(stock_id)
+        self.search.discard(stock_id)
+        self._notify("item", stock_id)
+        return item
+
+    def iter_sorted(self, sort: str = "id", after: Optional[Tuple[Any, int]] = None,
+                    descending: bool = False) -> Iterator[Stock]:
+        for stock_id in self.sorted[sort].iter_ids(after, descending):
+            yield self.items[stock_id]
+
+    def sort_key(self, sort: str, stock_id: int) -> Any:
+        return self.sorted[sort].keys[stock_id]
+
+    # ---------- STOCK LOCATIONS ----------
+    def quantity_at(self, stock_id: int, location_id: int) -> Optional[int]:
+        """Quantity of an item at a location; None if it has no row there."""
+        return self.quantities.get(stock_id, location_id)
+
+    def rows_for_item(self, stock_id: int) -> List[Tuple[int, int]]:
+        """``(location_id, quantity)`` of each location holding the item."""
+        return self.quantities.item_rows(stock_id)
+
+    def ids_at_location(self, location_id: int) -> List[int]:
+        return self.quantities.ids_at((location_id,)).tolist()
+
+    def ids_at_locations(self, location_ids: Iterable[int]) -> np.ndarray:
+        return self.quantities.ids_at(location_ids)
+
+    def location_in_use(self, location_id: int) -> bool:
+        return self.quantities.location_count(location_id) > 0
+
+    def row_count(self) -> int:
+        return len(self.quantities)
+
+    def total_quantity(self, stock_id: int) -> int:
+        return self.quantities.item_total(stock_id)
+
+    def location_total(self, location_id: int) -> int:
+        return self.quantities.location_total(location_id)
+
+    def status_of(self, stock_id: int) -> str:
+        return self.statuses[stock_id]
+
+    def ids_with_status(self, status: str) -> set:
+        return self.status_buckets.get(status, set())
+
+    def set_row(self, stock_id: int, location_id: int, quantity: int):
+        delta = self.quantities.set(stock_id, location_id, quantity)
+        self._quantity_changed(stock_id, delta)
+
+    def replace_rows(self, stock_id: int, quantities: Iterable[Tuple[int, int]]):
+        """Replace all rows of an item; repeated locations are summed."""
+        for location_id, _ in self.quantities.item_rows(stock_id):
+            self._drop_row(stock_id, location_id)
+        merged: Dict[int, int] = {}
+        for location_id, quantity in quantities:
+            merged[location_id] = merged.get(location_id, 0) + quantity
+        for location_id, quantity in merged.items():
+            self.set_row(stock_id, location_id, quantity)
+
+    def load_rows(self, stock_ids: np.ndarray, location_ids: np.ndarray, quantities: np.ndarray):
+        """Replace every row at once (during ``bulk_load``, after the items),
+        then recompute the aggregates that depend on quantities."""
+        self.quantities.load(stock_ids, location_ids, quantities)
+        self.units = int(self.quantities.item_totals.sum())
+        self.value = 0.0
+        for item in self.items.values():
+            total = self.quantities.item_total(item.id)
+            self.value += total * (item.cost or 0.0)
+            self._refresh_status(item.id)
+
+    def _drop_row(self, stock_id: int, location_id: int):
+        quantity = self.quantities.drop(stock_id, location_id)
+        if quantity is not None:
+            self._quantity_changed(stock_id, -quantity)
+
+    def _quantity_changed(self, stock_id: int, delta: int):
+        if delta:
+            self.units += delta
+            if stock_id in self.items:
+                self.value += delta * (self.items[stock_id].cost or 0.0)
+        if stock_id in self.items:
+            self._refresh_status(stock_id)
+            if not self._bulk:
+                self.sorted["quantity"].update(self.items[stock_id])
+            self._notify("item", stock_id)
+
+    def _count(self, item: Stock, sign: int):
+        """Add (sign 1) or take out (sign -1) an item's share of the aggregates."""
+        self.value += sign * self.quantities.item_total(item.id) * (item.cost or 0.0)
+        self.scrapped += sign * (item.scrap_count or 0)
+        count = self.category_counts.get(item.category, 0) + sign
+        if count:
+            self.category_counts[item.category] = count
+        else:
+            self.category_counts.pop(item.category, None)
+
+    def stats(self) -> dict:
+        """Dashboard totals, read from the running aggregates."""
+        return {
+            "items": len(self.items),
+            "units": self.units,
+            "value": round(self.value, 2),
+            "scrapped": self.scrapped,
+            "low_stock": len(self.status_buckets["Low Stock"]),
+            "out_of_stock": len(self.status_buckets["Out of Stock"]),
+            "by_status": {status: len(ids) for status, ids in self.status_buckets.items()},
+            "by_category": dict(self.category_counts),
+            "by_location": [
+                {"id": loc.id, "name": loc.name, "items": self.quantities.location_count(loc.id),
+                 "units": self.quantities.location_total(loc.id)}
+                for loc in self.locations.values()
+            ],
+        }
+
+    def _refresh_status(self, stock_id: int):
+        item = self.items[stock_id]
+        status = stock_status(self.quantities.item_total(stock_id), item.low_stock_threshold)
+        old = self.statuses.get(stock_id)
+        if old != status:
+            if old is not None:
+                self.status_buckets[old].discard(stock_id)
+            self.status_buckets[status].add(stock_id)
+            self.statuses[stock_id] = status
+
+    # ---------- LOCATIONS ----------
+    def get_location(self, location_id: int) -> Optional[Location]:
+        return self.locations.get(location_id)
+
+    def get_location_by_name(self, name: str) -> Optional[Location]:
+        location_id = self.location_names.get(name.lower())
+        return self.locations.get(location_id) if location_id is not None else None
+
+    def match_locations(self, key: str) -> List[int]:
+        """Ids of locations whose id or (case-insensitive) name equals ``key``."""
+        matches = []
+        if key.isdigit() and int(key) in self.locations:
+            matches.append(int(key))
+        by_name = self.location_names.get(key.lower())
+        if by_name is not None and by_name not in matches:
+            matches.append(by_name)
+        return matches
+
+    def iter_locations(self) -> Iterator[Location]:
+        return iter(self.locations.values())
+
+    def put_location(self, location: Location) -> Location:
+        if location.id is None:
+            location.id = self.next_id("location")
+        else:
+            self._seen_id("location", location.id)
+        old = self.locations.get(location.id)
+        if old and self.location_names.get(old.name.lower()) == old.id:
+            del self.location_names[old.name.lower()]
+        self.locations[location.id] = location
+        self.location_names[location.name.lower()] = location.id
+        self.tree.put(location.id, location.parent_id)
+        self._notify("location", location.id)
+        return location
+
+    def remove_location(self, location_id: int) -> Optional[Location]:
+        location = self.locations.pop(location_id, None)
+        if location and self.location_names.get(location.name.lower()) == location_id:
+            del self.location_names[location.name.lower()]
+        self.tree.remove(location_id)
+        self._notify("location", location_id)
+        return location
+
+    def subtree_ids(self, location_id: int) -> List[int]:
+        """The location and every location nested under it."""
+        return self.tree.subtree(location_id)
+
+    def location_path(self, location_id: int) -> List[Location]:
+        """Enclosing locations from the top down, ending with the location itself."""
+        return [self.locations[lid] for lid in self.tree.path(location_id) if lid in self.locations]
+
+    def subtree_totals(self) -> Dict[int, Tuple[int, int]]:
+        """``(units, rows)`` stored anywhere under each location, all computed in one pass."""
+        units = self.tree.subtree_sums(self.quantities.location_total)
+        rows = self.tree.subtree_sums(self.quantities.location_count)
+        return {location_id: (units[location_id], rows[location_id]) for location_id in units}
+
+    # ---------- CATEGORIES ----------
+    def get_category(self, cat_id: int) -> Optional[CategoryTag]:
+        return self.categories.get(cat_id)
+
+    def get_category_by_name(self, name: str) -> Optional[CategoryTag]:
+        cat_id = self.category_names.get(name.lower())
+        return self.categories.get(cat_id) if cat_id is not None else None
+
+    def iter_categories(self) -> Iterator[CategoryTag]:
+        return iter(self.categories.values())
+
+    def put_category(self, cat: CategoryTag) -> CategoryTag:
+        if cat.id is None:
+            cat.id = self.next_id("category")
+        else:
+            self._seen_id("category", cat.id)
+        self.categories[cat.id] = cat
+        self.category_names[cat.name.lower()] = cat.id
+        self._notify("category", cat.id)
+        return cat
+
+    def remove_category(self, cat_id: int) -> Optional[CategoryTag]:
+        cat = self.categories.pop(cat_id, None)
+        if cat and self.category_names.get(cat.name.lower()) == cat_id:
+            del self.category_names[cat.name.lower()]
+        self._notify("category", cat_id)
+        return cat
+
+    # ---------- BOMS ----------
+    def get_bom(self, product_barcode: str) -> Optional[BOM]:
+        return self.boms.get(product_barcode)
+
+    def iter_boms(self) -> Iterator[BOM]:
+        return iter(self.boms.values())
+
+    def put_bom(self, bom: BOM, replaces: Optional[str] = None) -> BOM:
+        if replaces is not None and replaces != bom.product_barcode:
+            self.boms.pop(replaces, None)
+            self._notify("bom", replaces)
+        self.boms[bom.product_barcode] = bom
+        self._notify("bom", bom.product_barcode)
+        return bom
+
+    def remove_bom(self, product_barcode: str) -> Optional[BOM]:
+        bom = self.boms.pop(product_barcode, None)
+        if bom:
+            self._notify("bom", product_barcode)
+        return bom
+
+
+store = InventoryStore()
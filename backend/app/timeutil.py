@@ -0,0 +1,22 @@
+# backend/app/timeutil.py
+
+"""
+Timestamp helpers shared by the routers. The database and the log store
+keep naive UTC timestamps, so aware datetimes from requests are converted
+before they are compared or stored.
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def utcnow() -> datetime:
+    """The current time as a naive UTC datetime, like everything stored."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    """``ts`` as a naive UTC datetime; naive values are taken to be UTC already."""
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
@@ -0,0 +1,153 @@
+# backend/app/transactions.py
+
+"""
+Atomic multi-row stock changes.
+
+A ``StockTransaction`` takes the locks of the items it expects to touch,
+opens an immediate SQLite transaction and catches the store up with the
+change feed, so validation sees every write committed by any worker. The
+caller then reads quantities (its own pending changes included), validates
+and stages quantity changes, field updates, new items and log entries.
+Nothing is written while the block runs: on a clean exit every staged
+change goes to SQLite at once and reaches the in-memory store after COMMIT,
+and an exception anywhere discards all of it. So a request either applies
+completely or leaves no trace.
+
+The IMMEDIATE transaction is what makes writers exclusive, across
+processes too. The per-item locks, sharded by stock id and taken in shard
+order, queue this process's writers to the same items on a lock instead
+of in SQLite's busy-retry loop.
+"""
+
+import sys
+import threading
+from contextlib import ExitStack
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app import crud
+from app.changefeed import change_feed
+from app.database import transaction
+from app.models import Stock, StockLog
+from app.store import store
+from app.timeutil import utcnow
+
+LOCK_SHARDS = 64
+_shards = [threading.Lock() for _ in range(LOCK_SHARDS)]
+
+
+class StockTransaction:
+    def __init__(self, stock_ids: Iterable[int]):
+        self._locks = [_shards[i] for i in sorted({stock_id % LOCK_SHARDS for stock_id in stock_ids})]
+        self._stack = ExitStack()
+        self.quantities: Dict[Tuple[int, int], int] = {}
+        self.draws: crud.LotDraws = {}
+        self.moves: List[Tuple[int, int, int, int]] = []
+        self.fields: Dict[int, dict] = {}
+        self.replaced: Dict[int, List[Tuple[int, int]]] = {}
+        self.created: List[Tuple[Stock, List[Tuple[int, int]]]] = []
+        self.deleted: List[int] = []
+        self.logs: List[StockLog] = []
+
+    def __enter__(self) -> "StockTransaction":
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            stack.enter_context(transaction())
+            change_feed.catch_up()
+            self._stack = stack.pop_all()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self._write()
+            except BaseException:
+                self._stack.__exit__(*sys.exc_info())
+                raise
+        return self._stack.__exit__(exc_type, exc, tb)
+
+    # ---------- READS ----------
+    def quantity(self, stock_id: int, location_id: int) -> Optional[int]:
+        """Quantity at a location after the staged changes; None if there's no row."""
+        key = (stock_id, location_id)
+        if key in self.quantities:
+            return self.quantities[key]
+        if stock_id in self.replaced:
+            return dict(self.replaced[stock_id]).get(location_id)
+        return store.quantity_at(stock_id, location_id)
+
+    def locations(self, stock_id: int) -> List[int]:
+        if stock_id in self.replaced:
+            location_ids = [location_id for location_id, _ in self.replaced[stock_id]]
+        else:
+            location_ids = [location_id for location_id, _ in store.rows_for_item(stock_id)]
+        location_ids += [lid for sid, lid in self.quantities if sid == stock_id and lid not in location_ids]
+        return location_ids
+
+    def field(self, stock_id: int, name: str):
+        """An item's field with staged updates applied."""
+        staged = self.fields.get(stock_id, {})
+        return staged[name] if name in staged else getattr(store.get_item(stock_id), name)
+
+    def total(self, stock_id: int) -> int:
+        return sum(self.quantity(stock_id, location_id) or 0 for location_id in self.locations(stock_id))
+
+    # ---------- STAGED WRITES ----------
+    def set_quantity(self, stock_id: int, location_id: int, quantity: int):
+        if quantity < 0:
+            raise HTTPException(status_code=400, detail="Quantity cannot go below zero")
+        self.quantities[(stock_id, location_id)] = quantity
+
+    def adjust(self, stock_id: int, location_id: int, delta: int) -> int:
+        """Add ``delta`` (negative to take away) at a location; returns the new quantity."""
+        new_qty = (self.quantity(stock_id, location_id) or 0) + delta
+        self.set_quantity(stock_id, location_id, new_qty)
+        return new_qty
+
+    def draw(self, stock_id: int, location_id: int, lot_number: Optional[str], quantity: int) -> int:
+        """Take ``quantity`` of one lot (None: untracked stock) from a location; returns the new quantity."""
+        lots = self.draws.setdefault((stock_id, location_id), {})
+        lots[lot_number] = lots.get(lot_number, 0) + quantity
+        return self.adjust(stock_id, location_id, -quantity)
+
+    def transfer(self, stock_id: int, from_location: int, to_location: int, quantity: int) -> Tuple[int, int]:
+        """Move stock between locations with its lots; returns both new quantities."""
+        self.moves.append((stock_id, from_location, to_location, quantity))
+        return self.adjust(stock_id, from_location, -quantity), self.adjust(stock_id, to_location, quantity)
+
+    def update(self, stock_id: int, **fields):
+        self.fields.setdefault(stock_id, {}).update(fields)
+
+    def replace_rows(self, stock_id: int, quantities: Iterable[Tuple[int, int]]):
+        """Stage a full replacement of an item's per-location rows."""
+        self.replaced[stock_id] = list(quantities)
+        for key in [key for key in self.quantities if key[0] == stock_id]:
+            del self.quantities[key]
+
+    def create(self, item: Stock, quantities: Iterable[Tuple[int, int]]):
+        """Stage a new item; its id is assigned on commit."""
+        self.created.append((item, list(quantities)))
+
+    def delete(self, stock_id: int):
+        self.deleted.append(stock_id)
+
+    def log(self, action: str, barcode: str, amount: int, resulting_qty: int, details: Optional[dict] = None):
+        self.logs.append(StockLog(
+            timestamp=utcnow(), action=action, barcode=barcode,
+            amount=amount, resulting_qty=resulting_qty, details=details,
+        ))
+
+    # ---------- COMMIT ----------
+    def _write(self):
+        for item, quantities in self.created:
+            crud.create_item(item, quantities)
+        for stock_id in set(self.fields) | set(self.replaced):
+            crud.update_item(stock_id, self.fields.get(stock_id, {}), self.replaced.get(stock_id))
+        if self.quantities:
+            crud.set_quantities(((sid, lid, qty) for (sid, lid), qty in self.quantities.items()), self.draws, self.moves)
+        for stock_id in self.deleted:
+            crud.delete_item(stock_id)
+        if self.logs:
+            crud.add_logs(self.logs)
@@ -0,0 +1,223 @@
+# backend/app/uploads.py
+
+"""
+Content-addressed upload storage.
+
+Uploads are streamed in chunks, hashed on the way and written from the
+threadpool so the event loop never blocks on disk. Each distinct content is
+stored once, as ``<kind>/<sha256><ext>``, no matter how many items attach
+it. ``upload_refs`` counts the items pointing at each stored file; crud
+keeps it in step inside the item's own transaction and the file is removed
+once nothing refers to it.
+
+Multipart requests are capped at ``MAX_REQUEST_BYTES`` by
+``UploadLimitMiddleware`` while their body streams in, before Starlette
+spools it; the per-kind limits in ``MAX_BYTES`` are checked afterwards, so a
+single oversized part may still be spooled up to the request cap before its
+413. Content a failed request stored first is removed by
+``discard_uploads``; the startup ``sweep`` catches anything left behind by a
+crashed worker.
+
+Files stored under the old ``<uuid>_<filename>`` scheme are left alone.
+"""
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.database import on_commit
+
+UPLOAD_DIR = Path("app/uploads")
+KINDS = ("images", "files")
+# Resized copies of images, see app/images.py
+DERIVED_DIR = UPLOAD_DIR / "derived"
+CHUNK_SIZE = 1024 * 1024
+MAX_BYTES = {
+    "images": int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024))),
+    "files": int(os.getenv("MAX_FILE_BYTES", str(50 * 1024 * 1024))),
+}
+# Whole multipart request: every kind at its limit plus room for the form fields
+MAX_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", str(sum(MAX_BYTES.values()) + 1024 * 1024)))
+# A file that lost its last reference is kept if it was stored or reused this
+# recently: a request may have it in hand and not have committed its item yet
+GRACE_SECONDS = 300
+
+MANAGED_URL = re.compile(r"^/static/(images|files)/([0-9a-f]{64})(\.[A-Za-z0-9]{1,10})?$")
+
+for kind in KINDS:
+    (UPLOAD_DIR / kind).mkdir(parents=True, exist_ok=True)
+
+
+def _suffix(filename: Optional[str]) -> str:
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,10}", suffix) else ""
+
+
+def path_for(url: str) -> Optional[Path]:
+    """Disk path of a content-addressed upload URL (None for anything else)."""
+    match = MANAGED_URL.match(url or "")
+    if not match:
+        return None
+    return UPLOAD_DIR / match.group(1) / f"{match.group(2)}{match.group(3) or ''}"
+
+
+async def save_upload(upload: UploadFile, kind: str, created: Optional[Dict[str, int]] = None) -> str:
+    """Stream ``upload`` to disk and return its static URL. Content this call
+    stored first is recorded in ``created`` (URL -> mtime) for ``discard_uploads``."""
+    limit = MAX_BYTES[kind]
+    if upload.size is not None and upload.size > limit:
+        raise HTTPException(status_code=413, detail=f"{upload.filename} is larger than {limit} bytes")
+
+    folder = UPLOAD_DIR / kind
+    tmp = folder / f".{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    out = await run_in_threadpool(tmp.open, "wb")
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                raise HTTPException(status_code=413, detail=f"{upload.filename} is larger than {limit} bytes")
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        await run_in_threadpool(out.close)
+        tmp.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(out.close)
+
+    name = f"{digest.hexdigest()}{_suffix(upload.filename)}"
+    url = f"/static/{kind}/{name}"
+    mtime = await run_in_threadpool(_settle, tmp, folder / name)
+    if mtime is not None and created is not None:
+        created[url] = mtime
+    return url
+
+
+def _settle(tmp: Path, final: Path) -> Optional[int]:
+    """Move ``tmp`` into place; returns the stored file's mtime, or None if
+    the same content was already stored."""
+    try:
+        # Same content already stored: keep that copy, mark it as just used
+        os.utime(final)
+        tmp.unlink(missing_ok=True)
+        return None
+    except FileNotFoundError:
+        # Not stored yet, or being discarded by a failed request right now
+        os.replace(tmp, final)
+        return final.stat().st_mtime_ns
+
+
+def discard_uploads(created: Dict[str, int]):
+    """Remove content stored by a request that failed before any item
+    referred to it, unless another request has reused it since."""
+    for url, mtime in created.items():
+        path = path_for(url)
+        # Renamed aside first: a request reusing the content from now on
+        # can't touch it and stores its own copy instead (see _settle)
+        aside = path.with_name(f".{uuid.uuid4().hex}.part")
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            continue
+        if aside.stat().st_mtime_ns != mtime:
+            # Reused in the meantime: put it back
+            os.replace(aside, path)
+            continue
+        aside.unlink(missing_ok=True)
+        _unlink(path)
+
+
+# ---------- REQUEST SIZE ----------
+class UploadLimitMiddleware:
+    """Answers 413 to multipart requests over ``MAX_REQUEST_BYTES``: up front
+    from Content-Length, otherwise as soon as the streamed body passes it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get("headers") or ()) if scope["type"] == "http" else {}
+        if not headers.get(b"content-type", b"").startswith(b"multipart/"):
+            return await self.app(scope, receive, send)
+
+        detail = f"Request is larger than {MAX_REQUEST_BYTES} bytes"
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > MAX_REQUEST_BYTES:
+            response = JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_REQUEST_BYTES:
+                    # Raised from the form parser, FastAPI passes it through as is
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# ---------- REFERENCE COUNTS ----------
+def add_refs(conn, urls: Iterable[Optional[str]]):
+    for url in urls:
+        if path_for(url):
+            conn.execute(
+                "INSERT INTO upload_refs (url, refs) VALUES (?, 1) ON CONFLICT (url) DO UPDATE SET refs = refs + 1",
+                (url,),
+            )
+
+
+def release_refs(conn, urls: Iterable[Optional[str]]):
+    """Drop one reference each; files left unreferenced are deleted after commit."""
+    for url in urls:
+        if not path_for(url):
+            continue
+        conn.execute("UPDATE upload_refs SET refs = refs - 1 WHERE url = ?", (url,))
+        if conn.execute("DELETE FROM upload_refs WHERE url = ? AND refs <= 0", (url,)).rowcount:
+            on_commit(lambda url=url: _remove(url))
+
+
+def _remove(url: str):
+    path = path_for(url)
+    try:
+        if time.time() - path.stat().st_mtime > GRACE_SECONDS:
+            _unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _unlink(path: Path):
+    path.unlink(missing_ok=True)
+    for derived in DERIVED_DIR.glob(f"*/{path.name}.*"):
+        derived.unlink(missing_ok=True)
+
+
+def sweep(conn) -> int:
+    """Delete stored files no item refers to, e.g. from failed requests."""
+    referenced = {url for (url,) in conn.execute("SELECT url FROM upload_refs")}
+    removed = 0
+    cutoff = time.time() - GRACE_SECONDS
+    for kind in KINDS:
+        for path in (UPLOAD_DIR / kind).iterdir():
+            url = f"/static/{kind}/{path.name}"
+            stale = path.stat().st_mtime < cutoff
+            if stale and (path.name.endswith(".part") or (path_for(url) and url not in referenced)):
+                _unlink(path)
+                removed += 1
+    return removed
@@ -0,0 +1,62 @@
+# backend/app/versioning.py
+
+"""
+Conditional GETs and delta sync for the collection endpoints.
+
+The change feed's sequence number is the inventory version. A collection's
+ETag combines the version of the entities it's built from with the query
+string, so a client repeating a request gets a bodiless 304 until
+something it can see has changed. With ``?since=<version>`` the endpoints
+answer with only the records changed or deleted after that version, plus
+the version to ask from next time; ``reset`` is set (and everything is
+sent) when the client is too far behind for the retained events.
+"""
+
+import hashlib
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.changefeed import change_feed
+
+# Change-feed entities each collection is built from (items embed location names)
+DEPENDS = {
+    "stock": ("stock", "rows", "location"),
+    "locations": ("location",),
+    "categories": ("category",),
+    "boms": ("bom",),
+    "stats": ("stock", "rows", "location"),
+    "location_tree": ("location", "rows"),
+}
+
+
+def etag_for(collection: str, request: Request) -> str:
+    version = max(change_feed.versions[entity] for entity in DEPENDS[collection])
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{request.url.path}?{query}".encode(), digest_size=6).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def conditional(collection: str, request: Request, response: Response) -> Optional[Response]:
+    """Tag ``response``; returns a 304 to send instead when the client's copy is current."""
+    etag = etag_for(collection, request)
+    headers = {"ETag": etag, "X-Inventory-Version": str(change_feed.position)}
+    tags = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def changes_since(collection: str, since: int) -> Tuple[int, Optional[List[Tuple[str, str]]]]:
+    """The current version and what changed after ``since`` (None: too old, send everything)."""
+    change_feed.catch_up()
+    version = change_feed.position
+    return version, change_feed.changed_since(since, version, DEPENDS[collection])
+
+
+def delta(version: int, changed: Iterable, deleted: Iterable, reset: bool = False) -> JSONResponse:
+    body = {"version": version, "reset": reset, "changed": list(changed), "deleted": list(deleted)}
+    return JSONResponse(jsonable_encoder(body), headers={"X-Inventory-Version": str(version)})
@@ -0,0 +1,2 @@
+# backend/bench/__init__.py
+"""Benchmarks for the inventory API; see bench/README.md."""
@@ -0,0 +1,130 @@
+# backend/bench/common.py
+
+"""
+Shared pieces of the benchmark scripts: pointing the app at a benchmark
+database, driving it in-process over ASGI, latency summaries and the saved
+baselines new runs are compared against.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).parent
+BASELINE_DIR = BENCH_DIR / "baselines"
+DATA_DIR = BENCH_DIR / "data"  # generated databases; *.db is gitignored
+
+
+def profile_db(profile: str) -> Path:
+    return DATA_DIR / f"{profile}.db"
+
+
+def use_db(path) -> Path:
+    """Point the app at ``path``; must run before anything imports ``app``."""
+    path = Path(path)
+    os.environ["INVENTORY_DB"] = str(path)
+    return path
+
+
+@asynccontextmanager
+async def app_client(url: Optional[str] = None):
+    """An httpx client for a running server at ``url``, or for the app in this
+    process (started and stopped around the block, like uvicorn would)."""
+    import httpx
+
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            yield client
+        return
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client
+
+
+def summarize(samples: List[float], elapsed: Optional[float] = None) -> dict:
+    """Latency percentiles in milliseconds from per-request seconds."""
+    if not samples:
+        return {"n": 0}
+    ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    summary = {
+        "n": len(samples), "mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3), "max_ms": round(float(ms.max()), 3),
+    }
+    if elapsed:
+        summary["rps"] = round(len(samples) / elapsed, 1)
+    return summary
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit,
+        "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+    }
+
+
+def inventory_size() -> dict:
+    from app.store import store
+    from app.logstore import log_store
+
+    return {
+        "parts": len(store.items), "locations": len(store.locations), "rows": store.row_count(),
+        "boms": len(store.boms), "logs": sum(seg["row_count"] for seg in log_store.segment_stats()),
+    }
+
+
+# ---------- BASELINES ----------
+def save_baseline(name: str, report: dict) -> Path:
+    BASELINE_DIR.mkdir(exist_ok=True)
+    path = BASELINE_DIR / f"{name}.json"
+    path.write_text(json.dumps(report, indent=2) + "\n")
+    return path
+
+
+def load_baseline(name: str) -> dict:
+    path = BASELINE_DIR / f"{name}.json"
+    if not path.exists():
+        raise SystemExit(f"No baseline {path}")
+    return json.loads(path.read_text())
+
+
+def print_results(results: Dict[str, dict], baseline: Optional[dict] = None):
+    """One line per case; with a baseline, p50/p95 change in percent (negative is faster)."""
+    old = (baseline or {}).get("results", {})
+    width = max(len(name) for name in results) + 2
+    print(f"{'case':<{width}}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>9}" + ("   vs baseline" if baseline else ""))
+    for name, stats in results.items():
+        if not stats.get("n"):
+            print(f"{name:<{width}}{0:>7}")
+            continue
+        rps = f"{stats['rps']:>9.0f}" if "rps" in stats else f"{'-':>9}"
+        line = (f"{name:<{width}}{stats['n']:>7}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                f"{stats['p99_ms']:>10.2f}{rps}")
+        before = old.get(name)
+        if before and before.get("n"):
+            line += f"   p50 {_change(before['p50_ms'], stats['p50_ms'])}  p95 {_change(before['p95_ms'], stats['p95_ms'])}"
+        if stats.get("errors"):
+            line += f"   errors: {stats['errors']}"
+        print(line)
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "   n/a"
+    return f"{(after - before) / before * 100:+6.1f}%"
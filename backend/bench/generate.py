@@ -0,0 +1,188 @@
+# backend/bench/generate.py
+
+"""
+Synthetic inventory for benchmarks.
+
+Writes parts, locations, per-location quantities, categories, multi-level
+BOMs and a log history straight into a fresh SQLite file, bypassing the API
+so that millions of rows take minutes rather than hours. The same seed and
+scale always give the same data.
+
+    python -m bench.generate --profile medium
+    python -m bench.generate --parts 100000 --locations 500 --rows 2000000 --logs 5000000 --db bench/data/big.db
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bench.common import DATA_DIR, profile_db, use_db
+
+PROFILES = {
+    "small": dict(parts=2000, locations=50, rows=10000, logs=50000, boms=100, bom_levels=3),
+    "medium": dict(parts=20000, locations=200, rows=200000, logs=500000, boms=1000, bom_levels=3),
+    "large": dict(parts=100000, locations=500, rows=2000000, logs=5000000, boms=5000, bom_levels=4),
+}
+WORDS = (
+    "bolt nut washer bracket hinge gasket spring bearing shaft pulley valve sensor relay fuse cable "
+    "panel housing cover clamp seal motor gear plate screw rivet spacer bushing connector switch"
+).split()
+MATERIALS = ("steel", "brass", "nylon", "aluminium", "copper", "rubber", "titanium", "zinc")
+CATEGORIES = ("Fasteners", "Electrical", "Hydraulics", "Mechanical", "Packaging", "Consumables",
+              "Tooling", "Safety", "Sub-assemblies", "Finished goods")
+SITES = ("North", "South", "East", "West")
+# (action, weight, sign): most traffic is scanning on the floor
+LOG_ACTIONS = (
+    ("scan_add", 40, 1), ("scan_remove", 35, -1), ("consume", 10, -1), ("transfer", 8, 0),
+    ("adjust", 4, 1), ("scrap", 3, -1),
+)
+BATCH = 50000
+
+
+def barcode(i: int) -> str:
+    return f"BC{i:07d}"
+
+
+def generate(parts: int, locations: int, rows: int, logs: int, boms: int, bom_levels: int,
+             days: int = 180, seed: int = 1):
+    # Imported late: the database path comes from INVENTORY_DB, set by main()
+    from app.database import init_db, transaction
+    from app.logstore import log_store
+    from app.store import stock_status
+
+    rnd = random.Random(seed)
+    init_db()
+    log_store.init()
+    started = time.perf_counter()
+
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO categories (id, name, color) VALUES (?, ?, ?)",
+            [(i + 1, name, f"#{rnd.randrange(0x1000000):06x}") for i, name in enumerate(CATEGORIES)],
+        )
+        conn.executemany(
+            "INSERT INTO locations (id, name, locationType, storageCategory, company) VALUES (?, ?, ?, ?, ?)",
+            [(i, f"{SITES[i % len(SITES)]} Rack {i:04d}", "Internal Location", rnd.choice(("Bulk", "Shelf", "Cold", "")), "My Company")
+             for i in range(1, locations + 1)],
+        )
+
+    # Quantities first, so each part's status matches its total
+    per_part = [rows // parts + (1 if i < rows % parts else 0) for i in range(parts)]
+    totals = [0] * parts
+    location_ids = range(1, locations + 1)
+
+    def stock_location_rows():
+        for i in range(parts):
+            for location_id in rnd.sample(location_ids, min(per_part[i], locations)):
+                quantity = 0 if rnd.random() < 0.05 else rnd.randint(1, 200)
+                totals[i] += quantity
+                yield i + 1, location_id, quantity
+
+    _insert_batches("INSERT INTO stock_locations (stock_id, location_id, quantity) VALUES (?, ?, ?)", stock_location_rows())
+
+    def stock_rows():
+        for i in range(parts):
+            threshold = rnd.choice((5, 10, 10, 20, 50))
+            yield (
+                i + 1, f"{rnd.choice(MATERIALS)} {rnd.choice(WORDS)} {rnd.choice(WORDS)} {i}", f"PQ-{i:06d}",
+                rnd.choice(CATEGORIES), barcode(i + 1), stock_status(totals[i], threshold), rnd.randrange(3),
+                f"LOT{rnd.randrange(10000):05d}", None, f"Supplier {rnd.randrange(200)}", None, None, None, None,
+                round(rnd.uniform(0.05, 500), 2), threshold,
+            )
+
+    _insert_batches(
+        "INSERT INTO stock (id, name, partId, category, barcode, status, scrap_count, lot_number, bin_numbers, "
+        "supplier, production_stage, notes, image_url, file_url, cost, low_stock_threshold) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        stock_rows(),
+    )
+
+    # Assemblies at level n are built from parts and assemblies below level n,
+    # so the BOM graph is layered and acyclic
+    with transaction() as conn:
+        assemblies = rnd.sample(range(1, parts + 1), min(boms, parts))
+        levels = [assemblies[level::bom_levels] for level in range(bom_levels)]
+        leaves = sorted(set(range(1, parts + 1)) - set(assemblies))
+        below = list(leaves)
+        for level in levels:
+            records = []
+            for product in level:
+                components = rnd.sample(below, min(len(below), rnd.randint(2, 8)))
+                records.append((barcode(product), f"Assembly {product}",
+                                json.dumps({barcode(c): rnd.randint(1, 10) for c in components})))
+            conn.executemany("INSERT INTO boms (product_barcode, description, components) VALUES (?, ?, ?)", records)
+            below.extend(level)
+
+    # Log history, oldest first, evenly spread over the last ``days`` days
+    actions = [action for action, _, _ in LOG_ACTIONS]
+    weights = [weight for _, weight, _ in LOG_ACTIONS]
+    signs = {action: sign for action, _, sign in LOG_ACTIONS}
+    start = datetime.utcnow() - timedelta(days=days)
+    step = days * 86400 / max(logs, 1)
+    for first in range(0, logs, BATCH):
+        batch = []
+        for n, action in zip(range(first, min(first + BATCH, logs)), rnd.choices(actions, weights, k=min(BATCH, logs - first))):
+            amount = rnd.randint(1, 20) * (signs[action] or 1)
+            if action == "adjust" and rnd.random() < 0.5:
+                amount = -amount
+            details = {"location_id": rnd.randint(1, locations)}
+            if action == "transfer":
+                details["to_location_id"] = rnd.randint(1, locations)
+            batch.append((
+                (start + timedelta(seconds=n * step)).isoformat(), barcode(rnd.randint(1, parts)), action,
+                amount, rnd.randint(0, 500), json.dumps(details),
+            ))
+        log_store.append_rows(batch)
+
+    return time.perf_counter() - started
+
+
+def _insert_batches(sql: str, records):
+    from app.database import transaction
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= BATCH:
+            with transaction() as conn:
+                conn.executemany(sql, batch)
+            batch = []
+    if batch:
+        with transaction() as conn:
+            conn.executemany(sql, batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", choices=PROFILES, default="small")
+    parser.add_argument("--db", type=Path, help=f"Database file to create (default {DATA_DIR}/<profile>.db)")
+    parser.add_argument("--force", action="store_true", help="Replace the database file if it exists")
+    for name in ("parts", "locations", "rows", "logs", "boms", "bom_levels"):
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help="Override the profile")
+    parser.add_argument("--days", type=int, default=180, help="Span of the log history")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    scale = dict(PROFILES[args.profile])
+    scale.update({name: getattr(args, name) for name in scale if getattr(args, name) is not None})
+    if scale["rows"] > scale["parts"] * scale["locations"]:
+        parser.error("more rows than (part, location) pairs")
+
+    path = args.db or profile_db(args.profile)
+    if path.exists():
+        if not args.force:
+            parser.error(f"{path} exists; pass --force to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+    use_db(path)
+
+    print(f"Generating {path}: " + ", ".join(f"{value} {name}" for name, value in scale.items()))
+    elapsed = generate(**scale, days=args.days, seed=args.seed)
+    print(f"Done in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# backend/bench/load.py
+
+"""
+Mixed-workload load driver.
+
+A number of concurrent clients each loop for the given duration, picking
+operations by weight: scans from the floor (add, then later remove, the same
+part at the same location), barcode lookups, and dashboard reads (stats,
+first pages of stock and logs, the reorder list). Clients are closed-loop:
+each sends its next request when the previous one has answered. The report
+gives throughput and p50/p95/p99 per kind of operation and overall.
+
+In-process by default; with --url it drives a running server, which must be
+using the same database file (parts and locations are sampled from it).
+
+    python -m bench.load --profile small --duration 20 --concurrency 16
+    python -m bench.load --url http://localhost:8000 --db bench/data/large.db --mix scan=90,dashboard=10
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from bench.common import (
+    app_client, environment, load_baseline, print_results, profile_db, save_baseline, summarize, use_db,
+)
+
+DEFAULT_MIX = "scan=70,lookup=15,dashboard=15"
+DASHBOARD = (
+    ("/stats", {}),
+    ("/stock", {"limit": 50}),
+    ("/stock", {"limit": 3, "fields": "name,locations"}),
+    ("/stock_logs", {"limit": 50}),
+    ("/analytics/reorder", {"limit": 10}),
+)
+
+
+def sample_pairs(db: Path, count: int, seed: int) -> List[Tuple[str, int]]:
+    """``(barcode, location_id)`` of up to ``count`` stocked rows, read from the database file."""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(db)
+    try:
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock").fetchone()[0]
+        ids = rnd.sample(range(1, max_id + 1), min(count, max_id))
+        pairs = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            pairs += conn.execute(
+                "SELECT s.barcode, sl.location_id FROM stock_locations sl JOIN stock s ON s.id = sl.stock_id "
+                f"WHERE sl.quantity > 0 AND sl.stock_id IN ({', '.join('?' * len(chunk))})", chunk,
+            ).fetchall()
+    finally:
+        conn.close()
+    pairs.sort()
+    return pairs
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("scan", "lookup", "dashboard"):
+            raise SystemExit(f"Unknown operation {name!r} in --mix")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class Worker:
+    def __init__(self, client, pairs: List[Tuple[str, int]], mix: Dict[str, float], seed: int):
+        self.client = client
+        self.pairs = pairs
+        self.kinds, self.weights = list(mix), list(mix.values())
+        self.rnd = random.Random(seed)
+        self.pending: List[Tuple[str, int]] = []  # added by this worker, not yet removed
+        self.samples: Dict[str, List[float]] = {kind: [] for kind in mix}
+        self.errors: Dict[str, Dict[int, int]] = {kind: {} for kind in mix}
+
+    def next_request(self, kind: str) -> dict:
+        if kind == "scan":
+            if self.pending and self.rnd.random() < 0.5:
+                barcode, location_id = self.pending.pop(self.rnd.randrange(len(self.pending)))
+                action = "remove"
+            else:
+                barcode, location_id = self.rnd.choice(self.pairs)
+                self.pending.append((barcode, location_id))
+                action = "add"
+            return {"method": "POST", "url": "/scan",
+                    "json": {"barcode": barcode, "location_id": location_id, "quantity": 1, "action": action}}
+        if kind == "lookup":
+            barcode = self.rnd.choice(self.pairs)[0]
+            if self.rnd.random() < 0.8:
+                return {"method": "GET", "url": f"/stock/barcode/{barcode}"}
+            return {"method": "GET", "url": "/stock/suggest", "params": {"q": barcode[:-2]}}
+        path, params = self.rnd.choice(DASHBOARD)
+        return {"method": "GET", "url": path, "params": params}
+
+    async def run(self, deadline: float):
+        while time.perf_counter() < deadline:
+            kind = self.rnd.choices(self.kinds, self.weights)[0]
+            request = self.next_request(kind)
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(**request)
+                status = response.status_code
+            except Exception:
+                status = 599  # connection-level failure
+            self.samples[kind].append(time.perf_counter() - started)
+            if status >= 400:
+                self.errors[kind][status] = self.errors[kind].get(status, 0) + 1
+
+    async def restore(self):
+        """Take back the units this worker added and didn't remove."""
+        for barcode, location_id in self.pending:
+            await self.client.post("/scan", json={"barcode": barcode, "location_id": location_id, "quantity": 1, "action": "remove"})
+        self.pending.clear()
+
+
+async def run(url: Optional[str], pairs, mix: Dict[str, float], concurrency: int, duration: float, seed: int) -> dict:
+    async with app_client(url) as client:
+        workers = [Worker(client, pairs, mix, seed + i) for i in range(concurrency)]
+        started = time.perf_counter()
+        await asyncio.gather(*(worker.run(started + duration) for worker in workers))
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            await worker.restore()
+
+    results = {}
+    every: List[float] = []
+    for kind in mix:
+        samples = [s for worker in workers for s in worker.samples[kind]]
+        every += samples
+        results[kind] = summarize(samples, elapsed)
+        errors: Dict[int, int] = {}
+        for worker in workers:
+            for status, n in worker.errors[kind].items():
+                errors[status] = errors.get(status, 0) + n
+        if errors:
+            results[kind]["errors"] = errors
+    results["all"] = summarize(every, elapsed)
+    return {"kind": "load", "environment": environment(), "target": url or "in-process",
+            "concurrency": concurrency, "duration": round(elapsed, 2), "mix": mix, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default="small", help="Generated database to use (see bench.generate)")
+    parser.add_argument("--db", type=Path, help="Database file, instead of the profile's")
+    parser.add_argument("--url", help="Drive a running server instead of the app in this process")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", metavar="NAME", help="Save the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against baseline NAME")
+    args = parser.parse_args()
+
+    path = args.db or profile_db(args.profile)
+    if not path.exists():
+        parser.error(f"{path} doesn't exist; create it with python -m bench.generate")
+    use_db(path)
+    pairs = sample_pairs(path, 5000, args.seed)
+    if not pairs:
+        parser.error(f"{path} has no stocked rows to scan")
+    baseline = load_baseline(args.compare) if args.compare else None
+
+    report = asyncio.run(run(args.url, pairs, parse_mix(args.mix), args.concurrency, args.duration, args.seed))
+    print(f"{report['target']}, {args.concurrency} clients, {report['duration']}s")
+    print_results(report["results"], baseline)
+    if args.save:
+        print(f"Saved {save_baseline(args.save, report)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# backend/bench/micro.py
+
+"""
+Per-endpoint micro-benchmarks, driven in-process through the ASGI app.
+
+Each case is warmed up, then timed request by request, one at a time, so
+the numbers are service time without queueing. Writes are paired to leave
+the data as they found it (scan add then remove, create then delete).
+
+    python -m bench.micro --profile small --save small-micro
+    python -m bench.micro --profile small --compare small-micro
+    python -m bench.micro --only stock --iterations 500
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bench.common import (
+    app_client, environment, inventory_size, load_baseline, print_results, profile_db, save_baseline,
+    summarize, use_db,
+)
+
+# (requests for one iteration, built from the fixture; iterations as a share of --iterations)
+Case = Tuple[Callable[["Fixture"], List[dict]], float]
+
+
+class Fixture:
+    """Ids and barcodes the cases draw from, sampled from the loaded store."""
+
+    def __init__(self, seed: int):
+        from app.store import store
+
+        self.rnd = random.Random(seed)
+        matrix = store.quantities
+        slots = matrix.live_slots()
+        slots = slots[matrix.qty[slots] > 0]
+        rows = list(zip(matrix.item_ids[matrix.item[slots]].tolist(), matrix.location_ids[matrix.location[slots]].tolist()))
+        self.pairs = [(store.get_item(stock_id).barcode, location_id) for stock_id, location_id in self.rnd.sample(rows, min(len(rows), 5000))]
+        self.barcodes = [barcode for barcode, _ in self.pairs]
+        self.boms = list(store.boms)
+        self.names = [store.get_item(stock_id).name.split()[1] for stock_id, _ in rows[:50]]
+        self.counter = itertools.count()
+        self.created: List[int] = []  # items made by POST /stock, deleted afterwards
+
+    def barcode(self) -> str:
+        return self.rnd.choice(self.barcodes)
+
+    def pair(self) -> Tuple[str, int]:
+        return self.rnd.choice(self.pairs)
+
+
+def get(path: str, **params) -> dict:
+    return {"method": "GET", "url": path, "params": params}
+
+
+def scan_pair(f: Fixture) -> List[dict]:
+    barcode, location_id = f.pair()
+    body = {"barcode": barcode, "location_id": location_id, "quantity": 1}
+    return [{"method": "POST", "url": "/scan", "json": {**body, "action": "add"}},
+            {"method": "POST", "url": "/scan", "json": {**body, "action": "remove"}}]
+
+
+def ops_batch(f: Fixture) -> List[dict]:
+    ops = []
+    for _ in range(25):
+        barcode, location_id = f.pair()
+        body = {"op": "scan", "barcode": barcode, "location_id": location_id, "quantity": 1}
+        ops += [{**body, "action": "add"}, {**body, "action": "remove"}]
+    return [{"method": "POST", "url": "/stock/ops", "json": {"ops": ops}}]
+
+
+def create_item(f: Fixture) -> List[dict]:
+    n = next(f.counter)
+    form = {"name": f"bench item {n}", "partId": f"BENCH-{n}", "category": "Fasteners", "status": "In Stock",
+            "barcode": f"BENCH{time.time_ns()}{n}", "locations": str(f.pair()[1]), "quantities": "5"}
+    return [{"method": "POST", "url": "/stock", "data": form}]
+
+
+def requisition(f: Fixture) -> List[dict]:
+    lines = [{"barcode": barcode, "quantity": 1} for barcode in f.rnd.sample(f.barcodes, min(300, len(f.barcodes)))]
+    return [{"method": "POST", "url": "/allocations/preview", "json": {"lines": lines}}]
+
+
+CASES: Dict[str, Case] = {
+    "GET /stock (full list)": (lambda f: [get("/stock")], 0.05),
+    "GET /stock?limit=50": (lambda f: [get("/stock", limit=50)], 1),
+    "GET /stock?limit=50&sort=quantity": (lambda f: [get("/stock", limit=50, sort="quantity", order="desc")], 1),
+    "GET /stock?status=Low Stock&limit=50": (lambda f: [get("/stock", status="Low Stock", limit=50)], 1),
+    "GET /stock?search=": (lambda f: [get("/stock", search=f.rnd.choice(f.names), limit=50)], 1),
+    "GET /stock?location=&limit=50": (lambda f: [get("/stock", location=str(f.pair()[1]), limit=50)], 1),
+    "GET /stock?fields=name,locations": (lambda f: [get("/stock", limit=50, fields="name,locations")], 1),
+    "GET /stock/barcode/{barcode}": (lambda f: [get(f"/stock/barcode/{f.barcode()}")], 1),
+    "GET /stock/suggest": (lambda f: [get("/stock/suggest", q=f.barcode()[:6])], 1),
+    "GET /stock/low_stock": (lambda f: [get("/stock/low_stock")], 0.2),
+    "GET /stats": (lambda f: [get("/stats")], 1),
+    "GET /locations": (lambda f: [get("/locations")], 1),
+    "GET /stock_logs?limit=100": (lambda f: [get("/stock_logs", limit=100)], 1),
+    "GET /stock_logs?barcode=": (lambda f: [get("/stock_logs", barcode=f.barcode(), limit=100)], 0.2),
+    "GET /boms": (lambda f: [get("/boms")], 0.2),
+    "GET /boms/{barcode}/requirements": (lambda f: [get(f"/boms/{f.rnd.choice(f.boms)}/requirements")], 1),
+    "GET /analytics/reorder": (lambda f: [get("/analytics/reorder", limit=20)], 1),
+    "GET /analytics/rollup?bucket=week": (lambda f: [get("/analytics/rollup", bucket="week", barcode=f.barcode())], 1),
+    "POST /allocations/preview (BOM)": (
+        lambda f: [{"method": "POST", "url": "/allocations/preview", "json": {"product_barcode": f.rnd.choice(f.boms)}}], 1),
+    "POST /allocations/preview (300 lines)": (requisition, 0.2),
+    "POST /scan (add+remove)": (scan_pair, 1),
+    "POST /stock/ops (50 scans)": (ops_batch, 0.2),
+    "POST /stock": (create_item, 0.2),
+}
+
+
+async def run_case(client, fixture: Fixture, build, iterations: int, warmup: int) -> dict:
+    samples: List[float] = []
+    errors: Dict[int, int] = {}
+    for i in range(warmup + iterations):
+        for request in build(fixture):
+            started = time.perf_counter()
+            response = await client.request(**request)
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+            elif request["url"] == "/stock" and request["method"] == "POST":
+                fixture.created.append(response.json()["id"])
+            if i >= warmup:
+                samples.append(elapsed)
+    stats = summarize(samples)
+    if errors:
+        stats["errors"] = errors
+    return stats
+
+
+async def run(iterations: int, warmup: int, only: Optional[str], seed: int) -> dict:
+    async with app_client() as client:
+        fixture = Fixture(seed)
+        results = {}
+        for name, (build, share) in CASES.items():
+            if only and only.lower() not in name.lower():
+                continue
+            results[name] = await run_case(client, fixture, build, max(1, int(iterations * share)), warmup)
+            print(f"  {name}: p50 {results[name].get('p50_ms', 0):.2f} ms", flush=True)
+        # Leave the benchmark database as it was
+        for stock_id in fixture.created:
+            await client.delete(f"/stock/{stock_id}")
+        return {"kind": "micro", "environment": environment(), "inventory": inventory_size(),
+                "iterations": iterations, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", default="small", help="Generated database to use (see bench.generate)")
+    parser.add_argument("--db", type=Path, help="Database file, instead of the profile's")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed requests per case (some cases run fewer)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", help="Run the cases whose name contains this")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", metavar="NAME", help="Save the results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against baseline NAME")
+    args = parser.parse_args()
+
+    path = args.db or profile_db(args.profile)
+    if not path.exists():
+        parser.error(f"{path} doesn't exist; create it with python -m bench.generate")
+    use_db(path)
+    baseline = load_baseline(args.compare) if args.compare else None
+
+    report = asyncio.run(run(args.iterations, args.warmup, args.only, args.seed))
+    print(f"\n{report['inventory']}")
+    print_results(report["results"], baseline)
+    if args.save:
+        print(f"Saved {save_baseline(args.save, report)}")
+
+
+if __name__ == "__main__":
+    main()
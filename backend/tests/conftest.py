@@ -0,0 +1,56 @@
+# backend/tests/conftest.py
+
+"""
+Shared fixtures. Every test gets its own database file and upload
+directory, and a client whose lifespan loads the store from them.
+
+Run from ``backend/`` after ``pip install -r requirements.txt -r tests/requirements.txt``:
+
+    python -m pytest
+"""
+
+from typing import Iterable, Optional, Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import database, images, uploads
+from app.main import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "inventory.db")
+    # Startup sweeps unreferenced uploads, so keep it away from the real ones
+    for kind in uploads.KINDS:
+        (tmp_path / "uploads" / kind).mkdir(parents=True)
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(uploads, "DERIVED_DIR", tmp_path / "uploads" / "derived")
+    monkeypatch.setattr(images, "UPLOAD_DIR", uploads.UPLOAD_DIR)
+    monkeypatch.setattr(images, "DERIVED_DIR", uploads.DERIVED_DIR)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def add_location(client):
+    def add(name: str, parent_id: Optional[int] = None) -> int:
+        response = client.post("/locations", json={"name": name, "parent_id": parent_id})
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return add
+
+
+@pytest.fixture
+def add_item(client):
+    """Create an item through POST /stock; ``placements`` are (location_id, quantity) pairs."""
+    def add(barcode: str, placements: Iterable[Tuple[int, int]], **fields) -> int:
+        placements = list(placements)
+        response = client.post("/stock", data={
+            "name": barcode, "partId": barcode, "category": "Parts", "barcode": barcode, "status": "ok",
+            "locations": [location_id for location_id, _ in placements],
+            "quantities": [quantity for _, quantity in placements], **fields,
+        })
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return add
@@ -0,0 +1,107 @@
+# backend/tests/test_allocation.py
+
+import pytest
+
+from app import allocation
+from app.store import store
+from app.transactions import StockTransaction
+
+
+class Discard(Exception):
+    pass
+
+
+@pytest.fixture
+def milk(client, add_location, add_item):
+    """Bay A holds L-OLD (received Jan, expires Dec) and L-MID (received Feb,
+    never expires); Bay B holds L-NEW (received Mar, expires Jun)."""
+    bay_a, bay_b = add_location("Bay A"), add_location("Bay B")
+    milk = add_item("MILK", [(bay_a, 6)], lot_number="L-OLD")
+
+    def receive(lot_number: str, location_id: int, quantity: int, received_at: str, expires_at=None):
+        # Stock arrives as the item's current lot
+        item = store.get_item(milk)
+        response = client.put(f"/stock/{milk}", json={
+            "name": item.name, "partId": item.partId, "category": item.category, "barcode": item.barcode,
+            "status": item.status, "lot_number": lot_number,
+            "locations": [{"location_id": lid, "quantity": qty} for lid, qty in store.rows_for_item(milk)],
+        })
+        assert response.status_code == 200, response.text
+        assert client.post("/stock/adjust", json={"stock_id": milk, "location_id": location_id, "amount": quantity}).status_code == 200
+        date(lot_number, location_id, received_at, expires_at)
+
+    def date(lot_number: str, location_id: int, received_at: str, expires_at=None):
+        response = client.put(f"/stock/{milk}/lots/{location_id}", json={
+            "lot_number": lot_number, "received_at": received_at, "expires_at": expires_at,
+        })
+        assert response.status_code == 200, response.text
+
+    date("L-OLD", bay_a, "2026-01-01T00:00:00", "2026-12-01")
+    receive("L-MID", bay_a, 4, "2026-02-01T00:00:00")
+    receive("L-NEW", bay_b, 10, "2026-03-01T00:00:00", "2026-06-01")
+    return milk, bay_a, bay_b
+
+
+def test_a_bin_keeps_each_lot(client, milk):
+    milk, bay_a, bay_b = milk
+
+    lots = [(lot["location_id"], lot["lot_number"], lot["quantity"]) for lot in client.get(f"/stock/{milk}/lots").json()]
+
+    assert sorted(lots) == [(bay_a, "L-MID", 4), (bay_a, "L-OLD", 6), (bay_b, "L-NEW", 10)]
+
+
+def test_fefo_and_fifo_order(client, milk):
+    milk, bay_a, bay_b = milk
+
+    with StockTransaction([milk]) as tx:
+        fefo = allocation.plan_in(tx, {milk: 18}, "fefo")
+        fifo = allocation.plan_in(tx, {milk: 18}, "fifo")
+        short = allocation.plan_in(tx, {milk: 25})
+
+    assert fefo.picks[milk] == [(bay_b, "L-NEW", 10), (bay_a, "L-OLD", 6), (bay_a, "L-MID", 2)]
+    assert fifo.picks[milk] == [(bay_a, "L-OLD", 6), (bay_a, "L-MID", 4), (bay_b, "L-NEW", 8)]
+    assert fefo.plan_id != fifo.plan_id
+    assert short.missing == {milk: 5}
+
+
+def test_plan_sees_staged_quantities(client, milk):
+    milk, bay_a, bay_b = milk
+
+    with pytest.raises(Discard):
+        with StockTransaction([milk]) as tx:
+            tx.set_quantity(milk, bay_b, 3)
+            tx.set_quantity(milk, bay_a, 5)
+            plan = allocation.plan_in(tx, {milk: 9})
+            raise Discard
+
+    # Lots are capped at what their row holds in the transaction
+    assert plan.picks[milk] == [(bay_b, "L-NEW", 3), (bay_a, "L-OLD", 5)]
+    assert plan.missing == {milk: 1}
+    assert store.total_quantity(milk) == 20
+
+
+def test_commit_draws_the_picked_lots(client, milk):
+    milk, bay_a, bay_b = milk
+
+    response = client.post("/allocations/commit", json={"lines": [{"barcode": "MILK", "quantity": 12}], "reference": "WO-1"})
+
+    assert response.status_code == 200, response.text
+    lots = [(lot["location_id"], lot["lot_number"], lot["quantity"]) for lot in client.get(f"/stock/{milk}/lots").json()]
+    assert sorted(lots) == [(bay_a, "L-MID", 4), (bay_a, "L-OLD", 4)]
+    log = client.get("/stock_logs", params={"barcode": "MILK", "limit": 1, "order": "desc"}).json()[0]
+    assert log["details"]["lots"] == ["L-NEW", "L-OLD"]
+    assert log["details"]["locations"] == {str(bay_b): 10, str(bay_a): 2}
+
+
+def test_preferred_locations_break_ties(client, add_location, add_item):
+    bay_a, bay_b = add_location("Bay A"), add_location("Bay B")
+    bolt = add_item("BOLT", [(bay_a, 5), (bay_b, 5)])
+    for location_id in (bay_a, bay_b):
+        client.put(f"/stock/{bolt}/lots/{location_id}", json={"received_at": "2026-01-01T00:00:00"})
+
+    with StockTransaction([bolt]) as tx:
+        walk = allocation.plan_in(tx, {bolt: 6})
+        preferred = allocation.plan_in(tx, {bolt: 6}, prefer=[bay_b])
+
+    assert [(lid, qty) for lid, _, qty in walk.picks[bolt]] == [(bay_a, 5), (bay_b, 1)]
+    assert [(lid, qty) for lid, _, qty in preferred.picks[bolt]] == [(bay_b, 5), (bay_a, 1)]
@@ -0,0 +1,107 @@
+# backend/tests/test_bom.py
+
+import json
+
+import pytest
+
+from app.changefeed import change_feed
+from app.database import open_connection
+from app.store import store
+
+
+@pytest.fixture
+def assembly(client, add_location, add_item):
+    """TOP is built from one SUB and one P2; SUB from two P1."""
+    shelf = add_location("Shelf")
+    for barcode, quantity in (("P1", 5), ("P2", 10), ("SUB", 1)):
+        add_item(barcode, [(shelf, quantity)])
+    client.post("/boms", json={"product_barcode": "SUB", "components": {"P1": 2}})
+    client.post("/boms", json={"product_barcode": "TOP", "components": {"SUB": 1, "P2": 1}})
+    return shelf
+
+
+def test_self_reference_is_rejected(client):
+    response = client.post("/boms", json={"product_barcode": "A", "components": {"A": 1}})
+
+    assert response.status_code == 400
+    assert "cycle" in response.json()["detail"]
+    assert store.get_bom("A") is None
+
+
+def test_indirect_cycle_is_rejected_on_create_and_update(client, assembly):
+    response = client.post("/boms", json={"product_barcode": "P1", "components": {"TOP": 1}})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "BOM would create a cycle: P1 -> TOP -> SUB -> P1"
+    assert store.get_bom("P1") is None
+
+    response = client.put("/boms/SUB", json={"product_barcode": "SUB", "components": {"P1": 2, "TOP": 1}})
+    assert response.status_code == 400
+    assert store.get_bom("SUB").components == {"P1": 2}
+
+
+def test_buildable_counts(client, assembly):
+    result = client.get("/boms/TOP/buildable").json()
+
+    # One level: only the SUB on hand
+    assert result["max_buildable"] == 1
+    assert [c["barcode"] for c in result["limiting_components"]] == ["SUB"]
+    # All levels: two more SUBs from the five P1
+    assert result["max_buildable_exploded"] == 3
+    assert result["limiting_parts"] == [{"barcode": "P1", "on_hand": 5, "needed_for_next": 6}]
+
+
+def test_buildable_follows_stock_changes(client, assembly):
+    p1 = store.get_by_barcode("P1")
+    client.post("/scan", json={"stock_id": p1.id, "location_id": assembly, "quantity": 3, "action": "add"})
+
+    assert client.get("/boms/TOP/buildable").json()["max_buildable_exploded"] == 5
+
+
+def test_requirements_net_out_sub_assemblies_on_hand(client, assembly):
+    result = client.get("/boms/TOP/requirements", params={"quantity": 2}).json()
+
+    assert result["parts"] == {"P1": 4, "P2": 2}
+    assert result["net_parts"] == {"P1": 2, "P2": 2}
+
+
+def write_bom_as_other_worker(product: str, components: dict):
+    conn = open_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT OR REPLACE INTO boms (product_barcode, description, components) VALUES (?, '', ?)",
+                      (product, json.dumps(components)))
+        conn.execute("INSERT INTO change_events (entity, key, op) VALUES ('bom', ?, 'put')", (product,))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def test_writes_check_boms_committed_by_other_workers(client):
+    # With the poller stopped, only the write's own catch-up can see these
+    change_feed.stop()
+    write_bom_as_other_worker("KIT", {"BOX": 1})
+    write_bom_as_other_worker("BOX", {"LID": 2})
+
+    response = client.post("/boms", json={"product_barcode": "KIT", "components": {"LID": 1}})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "BOM for this product already exists"
+
+    response = client.post("/boms", json={"product_barcode": "LID", "components": {"KIT": 1}})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "BOM would create a cycle: LID -> KIT -> BOX -> LID"
+    assert store.get_bom("BOX").components == {"LID": 2}
+
+
+def test_a_committed_cycle_does_not_break_rollups(client, assembly):
+    # Checks on write keep cycles out, but a direct database write can still make one
+    write_bom_as_other_worker("P1", {"TOP": 1})
+    change_feed.catch_up()
+
+    response = client.get("/boms/TOP/requirements")
+    assert response.status_code == 200
+    assert response.json()["parts"] == {"TOP": 2, "P2": 1}
+
+    response = client.get("/boms/TOP/buildable")
+    assert response.status_code == 200
+    # P1 on hand still covers three; only a fourth would need P1 built from TOP
+    assert response.json()["max_buildable_exploded"] == 3
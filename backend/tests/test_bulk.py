@@ -0,0 +1,154 @@
+# backend/tests/test_bulk.py
+
+import json
+import sqlite3
+
+from app import bulk, crud
+from app.database import open_connection
+from app.store import store
+
+
+def test_stock_import_reports_each_bad_row(client, add_location):
+    add_location("Shelf")
+    body = "\n".join([
+        "barcode,name,partId,category,status,location,quantity",
+        "A1,Bolt,P-1,Parts,ok,Shelf,5",
+        ",Nameless,P-2,Parts,ok,,",
+        "A3,Nut,P-3,Parts,ok,Shelf,lots",
+        "A4,Washer,P-4,Parts,ok,Attic,1",
+        "A1,Bolt again,P-1,Parts,ok,,",
+        "A6,Spacer,P-6,Parts,ok,Shelf,-2",
+        "A7,Pin,P-7,Parts,ok,,",
+    ]) + "\n"
+
+    report = client.post("/stock/import", content=body).json()
+
+    assert (report["rows"], report["created"], report["failed"]) == (7, 2, 5)
+    assert report["errors"] == [
+        {"line": 3, "error": "barcode is required"},
+        {"line": 4, "error": "quantity must be a whole number"},
+        {"line": 5, "error": "Location Attic not found"},
+        {"line": 6, "error": "Barcode A1 is already used on line 2"},
+        {"line": 7, "error": "quantity cannot be negative"},
+    ]
+    assert store.total_quantity(store.get_by_barcode("A1").id) == 5
+    assert store.get_by_barcode("A7") is not None
+
+
+def test_existing_items_need_upsert(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    add_item("A1", [(shelf, 1)])
+    body = "barcode,name\nA1,Renamed\n"
+
+    report = client.post("/stock/import", content=body).json()
+    assert report["errors"] == [{"line": 2, "error": "Item with this barcode already exists"}]
+
+    report = client.post("/stock/import", params={"upsert": True}, content=body).json()
+    assert (report["updated"], report["failed"]) == (1, 0)
+    assert store.get_by_barcode("A1").name == "Renamed"
+
+
+def test_ndjson_rejects_unparseable_lines(client):
+    lines = [
+        json.dumps({"barcode": "N1", "name": "n", "partId": "p", "category": "c", "status": "ok"}),
+        "{not json",
+        "[1, 2]",
+        "",
+        json.dumps({"barcode": "N2", "partId": "p", "category": "c", "status": "ok"}),
+    ]
+
+    report = client.post("/stock/import", params={"format": "ndjson"}, content="\n".join(lines)).json()
+
+    assert report["created"] == 1
+    assert report["errors"] == [
+        {"line": 2, "error": "Not valid JSON"},
+        {"line": 3, "error": "Each line must be a JSON object"},
+        {"line": 5, "error": "name: Field required"},
+    ]
+
+
+def test_errors_come_back_in_file_order(client, add_location, add_item, monkeypatch):
+    monkeypatch.setattr(bulk, "IMPORT_BATCH_ROWS", 3)
+    shelf = add_location("Shelf")
+    add_item("A1", [(shelf, 1)])
+    # Unknown items are caught before the batch's transaction, bad rows of
+    # known items inside it
+    body = "barcode,location,quantity\nA1,Attic,1\nNOPE,Shelf,1\nA1,Shelf,x\nA1,Shelf,4\nGONE,Shelf,1\n"
+
+    report = client.post("/stock_locations/import", content=body).json()
+
+    assert [error["line"] for error in report["errors"]] == [2, 3, 4, 6]
+    assert report["updated"] == 1
+    assert store.quantity_at(store.get_by_barcode("A1").id, shelf) == 4
+
+
+def test_database_error_rolls_back_its_batch_and_stops(client, monkeypatch):
+    monkeypatch.setattr(bulk, "IMPORT_BATCH_ROWS", 2)
+    # Written behind the store's back, so the importer's own checks can't see it
+    conn = open_connection()
+    conn.execute("INSERT INTO locations (name, locationType, company) VALUES ('Ghost', 'Shelf', 'Co')")
+    conn.close()
+    body = "name\nBay 1\nBay 2\nBay 3\nGhost\nBay 5\n"
+
+    response = client.post("/locations/import", content=body)
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["created"] == 2
+    assert report["aborted"] == "Lines 4-5 were rolled back (UNIQUE constraint failed: locations.name); the last line imported is 3"
+    assert sorted(location["name"] for location in client.get("/locations").json()) == ["Bay 1", "Bay 2"]
+
+
+def test_export_round_trips_quantities(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    add_item("A1", [(shelf, 3)])
+
+    exported = client.get("/stock_locations/export").text
+
+    assert exported.splitlines() == ["stock_id,barcode,location_id,location,quantity", f"1,A1,{shelf},Shelf,3"]
+    report = client.post("/stock_locations/import", content=exported.replace(",3", ",8")).json()
+    assert report["updated"] == 1
+    assert store.quantity_at(1, shelf) == 8
+
+
+def test_any_database_error_ends_the_import_with_a_report(client, monkeypatch):
+    monkeypatch.setattr(bulk, "IMPORT_BATCH_ROWS", 2)
+    save_location = crud.save_location
+
+    def save_or_fail(location):
+        if location.name == "Bay 4":
+            raise sqlite3.OperationalError("database is locked")
+        return save_location(location)
+
+    monkeypatch.setattr(crud, "save_location", save_or_fail)
+    body = "name\nBay 1\nBay 2\nBay 3\nBay 4\nBay 5\n"
+
+    response = client.post("/locations/import", content=body)
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["created"] == 2
+    assert report["aborted"] == "Lines 4-5 were rolled back (database is locked); the last line imported is 3"
+    assert sorted(location["name"] for location in client.get("/locations").json()) == ["Bay 1", "Bay 2"]
+
+
+def test_barcodes_are_trimmed_for_locks_and_lookups(client, add_location, add_item, monkeypatch):
+    shelf = add_location("Shelf")
+    bolt = add_item("A1", [(shelf, 1)])
+    locked = []
+    stock_transaction = bulk.StockTransaction
+
+    def recording(ids):
+        ids = list(ids)
+        locked.append(ids)
+        return stock_transaction(ids)
+
+    monkeypatch.setattr(bulk, "StockTransaction", recording)
+    lines = [json.dumps({"barcode": " A1 ", "name": "Bolt", "location": "Shelf", "quantity": 7})]
+
+    report = client.post("/stock/import", params={"format": "ndjson", "upsert": True}, content="\n".join(lines)).json()
+
+    assert (report["updated"], report["failed"]) == (1, 0)
+    assert locked == [[bolt]]
+    assert store.get_item(bolt).barcode == "A1"
+    assert store.quantity_at(bolt, shelf) == 7
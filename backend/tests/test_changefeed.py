@@ -0,0 +1,116 @@
+# backend/tests/test_changefeed.py
+
+import threading
+import time
+
+from app.changefeed import change_feed
+from app.database import open_connection
+from app.store import store
+
+
+def write_as_other_worker(statements):
+    """Commit writes and their change events on a connection of its own, as another worker process would."""
+    conn = open_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for sql, params in statements:
+            conn.execute(sql, params)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def new_item(stock_id: int, barcode: str, location_id: int, quantity: int):
+    return [
+        ("INSERT INTO stock (id, name, partId, category, barcode, status) VALUES (?, ?, ?, 'Parts', ?, 'ok')",
+         (stock_id, barcode, barcode, barcode)),
+        ("INSERT INTO stock_locations (stock_id, location_id, quantity) VALUES (?, ?, ?)", (stock_id, location_id, quantity)),
+        ("INSERT INTO change_events (entity, key, op) VALUES ('stock', ?, 'put')", (str(stock_id),)),
+    ]
+
+
+def test_catch_up_applies_another_connections_commits(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 4)])
+
+    write_as_other_worker(new_item(100, "NUT", shelf, 7) + [
+        ("UPDATE stock_locations SET quantity = 9 WHERE stock_id = ? AND location_id = ?", (bolt, shelf)),
+        ("INSERT INTO change_events (entity, key, op) VALUES ('rows', ?, 'put')", (str(bolt),)),
+    ])
+    change_feed.catch_up()
+
+    assert store.get_by_barcode("NUT").id == 100
+    assert store.quantity_at(100, shelf) == 7
+    assert store.total_quantity(bolt) == 9
+    assert change_feed.catch_up() == 0  # Nothing is applied twice
+    assert client.get("/stock/barcode/NUT").json()["locations"] == [{"location_id": shelf, "location_name": "Shelf", "quantity": 7}]
+
+
+def test_deletes_and_renames_reach_cached_responses(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 4)])
+    nut = add_item("NUT", [(shelf, 2)])
+    assert client.get("/stock/barcode/BOLT").json()["locations"][0]["location_name"] == "Shelf"
+
+    write_as_other_worker([
+        ("UPDATE locations SET name = 'Top shelf' WHERE id = ?", (shelf,)),
+        ("INSERT INTO change_events (entity, key, op) VALUES ('location', ?, 'put')", (str(shelf),)),
+        ("DELETE FROM stock_locations WHERE stock_id = ?", (nut,)),
+        ("DELETE FROM stock WHERE id = ?", (nut,)),
+        ("INSERT INTO change_events (entity, key, op) VALUES ('stock', ?, 'delete')", (str(nut),)),
+    ])
+    change_feed.catch_up()
+
+    assert client.get("/stock/barcode/BOLT").json()["locations"][0]["location_name"] == "Top shelf"
+    assert client.get("/stock/barcode/NUT").status_code == 404
+    assert [item["barcode"] for item in client.get("/stock").json()] == ["BOLT"]
+
+
+def test_poller_follows_without_a_local_write(client, add_location):
+    shelf = add_location("Shelf")
+
+    write_as_other_worker(new_item(100, "NUT", shelf, 7))
+
+    deadline = time.monotonic() + 5
+    while client.get("/stock/barcode/NUT").status_code == 404:
+        assert time.monotonic() < deadline, "the poller never applied the other connection's commit"
+        time.sleep(0.05)
+    assert store.total_quantity(100) == 7
+
+
+def test_local_writes_start_by_catching_up(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 4)])
+    write_as_other_worker([
+        ("UPDATE stock_locations SET quantity = 10 WHERE stock_id = ? AND location_id = ?", (bolt, shelf)),
+        ("INSERT INTO change_events (entity, key, op) VALUES ('rows', ?, 'put')", (str(bolt),)),
+    ])
+
+    # Validated against the committed 10, not the 4 this worker last saw
+    response = client.post("/scan", json={"stock_id": bolt, "location_id": shelf, "quantity": 6, "action": "remove"})
+
+    assert response.status_code == 200, response.text
+    assert store.quantity_at(bolt, shelf) == 4
+
+
+def test_reads_stay_whole_while_the_poller_applies_batches(client, add_location):
+    shelf = add_location("Shelf")
+    done = threading.Event()
+
+    def other_worker():
+        for batch in range(20):
+            write_as_other_worker([
+                statement for n in range(20) for statement in new_item(1000 + batch * 20 + n, f"X{batch}-{n}", shelf, 1)
+            ])
+        done.set()
+
+    writer = threading.Thread(target=other_worker)
+    writer.start()
+    try:
+        while not done.is_set():
+            listed = client.get("/stock", params={"sort": "name"}).json()
+            # Every listed item comes with its rows: none is caught half-applied
+            assert all(item["locations"] == [{"location_id": shelf, "location_name": "Shelf", "quantity": 1}] for item in listed)
+            assert client.get("/stats").status_code == 200
+    finally:
+        writer.join()
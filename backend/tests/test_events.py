@@ -0,0 +1,122 @@
+# backend/tests/test_events.py
+
+import asyncio
+
+import pytest
+
+from app import changefeed
+from app.changefeed import change_feed
+from app.events import Client, EventFilter, event_hub, format_sse
+
+
+@pytest.fixture
+def bays(client, add_location, add_item):
+    """BOLT in Bay A, NUT in Bay B."""
+    bay_a, bay_b = add_location("Bay A"), add_location("Bay B")
+    add_item("BOLT", [(bay_a, 4)])
+    add_item("NUT", [(bay_b, 2)])
+    return bay_a, bay_b
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def drain(loop, client: Client) -> list:
+    """Messages delivered to ``client`` so far."""
+    loop.run_until_complete(asyncio.sleep(0))
+    messages = []
+    while not client.queue.empty():
+        messages.append(client.queue.get_nowait())
+    return messages
+
+
+def summary(messages) -> list:
+    result = []
+    for message in messages:
+        if message["event"] == "log":
+            result += [("log", entry["barcode"], entry["action"]) for entry in message["data"]["logs"]]
+        else:
+            result.append((message["event"], message["data"].get("barcode"), message["data"]["op"]))
+    return result
+
+
+def scan(client, barcode: str, location_id: int):
+    response = client.post("/scan", json={"barcode": barcode, "location_id": location_id, "quantity": 1})
+    assert response.status_code == 200, response.text
+
+
+def test_live_messages_are_filtered_per_client(client, bays, loop):
+    bay_a, bay_b = bays
+    everything = Client(loop, EventFilter())
+    bolts = Client(loop, EventFilter(barcodes={"BOLT"}))
+    in_bay_b = Client(loop, EventFilter(locations={bay_b}, actions={"scan_add"}))
+    for sse_client in (everything, bolts, in_bay_b):
+        assert event_hub.connect(sse_client, None) == []
+    try:
+        scan(client, "BOLT", bay_a)
+        scan(client, "NUT", bay_b)
+        change_feed.catch_up()
+
+        assert summary(drain(loop, everything)) == [
+            ("stock", "BOLT", "quantity"), ("log", "BOLT", "scan_add"),
+            ("stock", "NUT", "quantity"), ("log", "NUT", "scan_add"),
+        ]
+        assert summary(drain(loop, bolts)) == [("stock", "BOLT", "quantity"), ("log", "BOLT", "scan_add")]
+        assert summary(drain(loop, in_bay_b)) == [("log", "NUT", "scan_add")]
+    finally:
+        for sse_client in (everything, bolts, in_bay_b):
+            event_hub.remove(sse_client)
+
+
+def test_reconnects_replay_what_they_missed(client, bays, loop):
+    _, bay_b = bays
+    last_seen = change_feed.position
+    scan(client, "NUT", bay_b)
+    scan(client, "BOLT", bays[0])
+
+    sse_client = Client(loop, EventFilter(barcodes={"NUT"}))
+    try:
+        replay = event_hub.connect(sse_client, last_seen)
+        assert summary(replay) == [("stock", "NUT", "quantity"), ("log", "NUT", "scan_add")]
+        assert all(message["id"] > last_seen for message in replay)
+        assert format_sse(replay[0]).startswith(f"id: {replay[0]['id']}\nevent: stock\ndata: {{")
+
+        # Nothing already replayed is delivered again
+        change_feed.catch_up()
+        assert drain(loop, sse_client) == []
+    finally:
+        event_hub.remove(sse_client)
+
+
+def test_clients_behind_the_retained_events_start_over(client, bays, loop, monkeypatch):
+    monkeypatch.setattr(changefeed, "CHANGE_FEED_RETAIN", 1)
+    scan(client, "NUT", bays[1])
+    change_feed.trim()
+
+    sse_client = Client(loop, EventFilter())
+    try:
+        assert event_hub.connect(sse_client, 0) is None
+    finally:
+        event_hub.remove(sse_client)
+
+
+def test_slow_clients_overflow(client, bays, loop):
+    sse_client = Client(loop, EventFilter(), maxsize=1)
+    event_hub.connect(sse_client, None)
+    try:
+        scan(client, "BOLT", bays[0])
+        change_feed.catch_up()
+        loop.run_until_complete(asyncio.sleep(0))
+        assert sse_client.overflowed
+    finally:
+        event_hub.remove(sse_client)
+
+
+def test_unknown_location_filters_are_rejected(client, bays):
+    response = client.get("/events", params={"location": "Bay Z"})
+
+    assert (response.status_code, response.json()["detail"]) == (400, "Location not found")
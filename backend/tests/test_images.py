@@ -0,0 +1,65 @@
+# backend/tests/test_images.py
+
+import io
+
+import pytest
+
+from app import images
+
+
+@pytest.fixture
+def upload_image(client, add_location):
+    """Attach ``content`` to a new item as its image; returns the stored name."""
+    shelf = add_location("Shelf")
+
+    def upload(barcode: str, content: bytes, filename: str = "photo.png") -> str:
+        response = client.post("/stock", data={
+            "name": barcode, "partId": barcode, "category": "Parts", "barcode": barcode, "status": "ok",
+            "locations": [shelf], "quantities": [1],
+        }, files={"image": (filename, content, "image/png")})
+        assert response.status_code == 200, response.text
+        return response.json()["image_url"].rsplit("/", 1)[1]
+    return upload
+
+
+def test_unknown_sizes_and_names_are_404(client, upload_image):
+    name = upload_image("CAM", b"not really a png")
+
+    assert client.get(f"/images/huge/{name}").status_code == 404
+    assert client.get("/images/thumb/missing.png").status_code == 404
+    assert client.get("/images/thumb/.hidden").status_code == 404
+
+
+def test_unrenderable_images_fall_back_to_the_original(client, upload_image):
+    name = upload_image("CAM", b"not really a png")
+
+    response = client.get(f"/images/thumb/{name}")
+
+    assert response.status_code == 200
+    assert response.content == b"not really a png"
+    assert response.headers["cache-control"] == "public, max-age=300"
+
+
+def test_the_name_is_the_etag(client, upload_image):
+    name = upload_image("CAM", b"not really a png")
+
+    response = client.get(f"/images/preview/{name}", headers={"If-None-Match": f'"preview-{name}"'})
+
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == images.IMMUTABLE
+
+
+def test_derivatives_fit_their_box(client, upload_image):
+    Image = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    Image.new("RGB", (1280, 320), "red").save(buf, "PNG")
+    name = upload_image("CAM", buf.getvalue())
+
+    for size, box in images.SIZES.items():
+        response = client.get(f"/images/{size}/{name}")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["etag"] == f'"{size}-{name}"'
+        assert response.headers["cache-control"] == images.IMMUTABLE
+        assert Image.open(io.BytesIO(response.content)).size == (box, box // 4)
+    assert images.derived_path("thumb", name).exists()
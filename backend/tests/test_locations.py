@@ -0,0 +1,121 @@
+# backend/tests/test_locations.py
+
+import pytest
+
+from app.changefeed import change_feed
+from app.database import open_connection
+from app.store import store
+
+
+@pytest.fixture
+def warehouse(add_location, add_item):
+    """Site > (Area 1 > Rack 1, Area 2); BOLT in Rack 1 and Area 2, NUT in Rack 1."""
+    site = add_location("Site")
+    area1 = add_location("Area 1", site)
+    rack = add_location("Rack 1", area1)
+    area2 = add_location("Area 2", site)
+    add_item("BOLT", [(rack, 4), (area2, 6)])
+    add_item("NUT", [(rack, 2)])
+    return site, area1, rack, area2
+
+
+def node_totals(tree) -> dict:
+    totals = {}
+    for node in tree:
+        totals[node["name"]] = (node["units"], node["rows"])
+        totals.update(node_totals(node["children"]))
+    return totals
+
+
+def test_tree_sums_every_subtree(client, warehouse):
+    assert node_totals(client.get("/locations/tree").json()) == {
+        "Site": (12, 3), "Area 1": (6, 2), "Rack 1": (6, 2), "Area 2": (6, 1),
+    }
+
+
+def test_subtree_stock(client, warehouse):
+    site, area1, _, _ = warehouse
+
+    body = client.get(f"/locations/{site}/stock").json()
+    assert (body["locations"], body["items"], body["units"]) == (4, 2, 12)
+    assert [(row["barcode"], row["quantity"]) for row in body["stock"]] == [("BOLT", 10), ("NUT", 2)]
+    assert client.get(f"/locations/{site}/stock", params={"limit": 1}).json()["stock"][0]["barcode"] == "BOLT"
+
+    body = client.get(f"/locations/{area1}/stock").json()
+    assert body["path"] == ["Site", "Area 1"]
+    assert [(row["barcode"], row["quantity"]) for row in body["stock"]] == [("BOLT", 4), ("NUT", 2)]
+
+    listed = client.get("/stock", params={"location": "Area 1", "sublocations": True}).json()
+    assert sorted(item["barcode"] for item in listed) == ["BOLT", "NUT"]
+
+
+def test_move_carries_stock_along(client, warehouse):
+    _, area1, rack, area2 = warehouse
+
+    response = client.post(f"/locations/{rack}/move", json={"parent_id": area2})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["path"] == ["Site", "Area 2", "Rack 1"]
+    totals = node_totals(client.get("/locations/tree").json())
+    assert (totals["Area 1"], totals["Area 2"]) == ((0, 0), (12, 3))
+    assert store.subtree_ids(area1) == [area1]
+
+
+def test_move_checks(client, warehouse):
+    site, area1, rack, _ = warehouse
+
+    response = client.post(f"/locations/{area1}/move", json={"parent_id": rack})
+    assert response.status_code == 400
+
+    response = client.post(f"/locations/{area1}/move", json={"parent_id": None, "require_empty": True})
+    assert response.status_code == 409
+    assert [row["name"] for row in response.json()["detail"]["in_use"]] == ["Rack 1"]
+
+    response = client.post(f"/locations/{area1}/move", json={"parent_id": None, "dry_run": True})
+    assert response.json()["moved"] is False
+    assert store.get_location(area1).parent_id == site
+
+
+def test_delete_refuses_subtrees_with_stock(client, warehouse, add_location):
+    site, area1, rack, area2 = warehouse
+
+    assert client.delete(f"/locations/{area1}").status_code == 400
+    response = client.delete(f"/locations/{area1}", params={"recursive": True})
+    assert response.status_code == 400
+    assert [row["name"] for row in response.json()["detail"]["in_use"]] == ["Rack 1"]
+
+    empty = add_location("Area 3", site)
+    add_location("Bin 3", empty)
+    response = client.delete(f"/locations/{empty}", params={"recursive": True})
+    assert response.status_code == 200
+    assert len(response.json()["deleted"]) == 2
+    assert store.subtree_ids(site) == [site, area1, rack, area2]
+
+
+def place_as_other_worker(item_id: int, location_id: int, quantity: int):
+    conn = open_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT INTO stock_locations (stock_id, location_id, quantity) VALUES (?, ?, ?)",
+                      (item_id, location_id, quantity))
+        conn.execute("INSERT INTO change_events (entity, key, op) VALUES ('rows', ?, 'put')", (str(item_id),))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def test_moves_and_deletes_check_stock_committed_by_other_workers(client, warehouse, add_location):
+    site, _, _, _ = warehouse
+    area3 = add_location("Area 3", site)
+    bin3 = add_location("Bin 3", area3)
+    # With the poller stopped, only the write's own catch-up can see this
+    change_feed.stop()
+    place_as_other_worker(store.get_by_barcode("NUT").id, bin3, 5)
+
+    response = client.post(f"/locations/{area3}/move", json={"parent_id": None, "require_empty": True})
+    assert response.status_code == 409
+    assert [row["name"] for row in response.json()["detail"]["in_use"]] == ["Bin 3"]
+
+    response = client.delete(f"/locations/{area3}", params={"recursive": True})
+    assert response.status_code == 400
+    assert store.subtree_ids(area3) == [area3, bin3]
@@ -0,0 +1,127 @@
+# backend/tests/test_logstore.py
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import logstore
+from app.database import get_connection
+from app.logstore import log_store
+
+
+def rows_at(start: datetime, count: int, step: timedelta = timedelta(hours=1)) -> list:
+    return [((start + i * step).isoformat(), f"P{i}", "add", 1, i, None) for i in range(count)]
+
+
+def stored_ids() -> list:
+    return [row[0] for row in log_store.iter_rows()]
+
+
+def make_flat_table(count: int):
+    conn = get_connection()
+    conn.execute(
+        "CREATE TABLE stock_logs (id INTEGER PRIMARY KEY, timestamp TEXT, barcode TEXT, action TEXT, "
+        "amount INTEGER, resulting_qty INTEGER, details TEXT)"
+    )
+    conn.executemany(
+        "INSERT INTO stock_logs (timestamp, barcode, action, amount, resulting_qty, details) VALUES (?, ?, ?, ?, ?, ?)",
+        rows_at(datetime(2024, 1, 1), count, timedelta(seconds=1)),
+    )
+    conn.commit()
+
+
+def test_segments_roll_over_by_rows_and_by_days(client, monkeypatch):
+    monkeypatch.setattr(logstore, "LOG_SEGMENT_ROWS", 3)
+    monkeypatch.setattr(logstore, "LOG_SEGMENT_DAYS", 2)
+
+    # Hourly rows fill segments by count; a week's gap starts a new one early
+    assert log_store.append_rows(rows_at(datetime(2024, 1, 1), 4)) == (1, 4)
+    assert log_store.append_rows(rows_at(datetime(2024, 1, 8), 1)) == (5, 5)
+
+    segments = client.get("/stock_logs/segments").json()
+    assert [(seg["first_id"], seg["last_id"], seg["sealed"]) for seg in segments] == [(1, 3, 1), (4, 4, 1), (5, 5, 0)]
+    assert stored_ids() == [1, 2, 3, 4, 5]
+
+
+def test_pages_and_filters_run_across_segments(client, monkeypatch):
+    monkeypatch.setattr(logstore, "LOG_SEGMENT_ROWS", 2)
+    log_store.append_rows(rows_at(datetime(2024, 1, 1), 5))
+
+    seen, cursor = [], None
+    while True:
+        params = {"order": "asc", "limit": 2, **({"after": cursor} if cursor else {})}
+        response = client.get("/stock_logs", params=params)
+        seen.append([log["barcode"] for log in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [["P0", "P1"], ["P2", "P3"], ["P4"]]
+
+    newest = client.get("/stock_logs", params={"limit": 2}).json()
+    assert [log["barcode"] for log in newest] == ["P4", "P3"]
+    window = client.get("/stock_logs", params={"since": "2024-01-01T01:00:00", "until": "2024-01-01T03:00:00Z"}).json()
+    assert [log["barcode"] for log in window] == ["P2", "P1"]
+    assert [log["barcode"] for log in client.get("/stock_logs", params={"barcode": "P3"}).json()] == ["P3"]
+
+
+def test_exports_stream_every_matching_row(client, monkeypatch):
+    monkeypatch.setattr(logstore, "LOG_SEGMENT_ROWS", 2)
+    log_store.append_rows(rows_at(datetime(2024, 1, 1), 3))
+
+    lines = client.get("/stock_logs/export").text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2, 3]
+    rows = list(csv.reader(io.StringIO(client.get("/stock_logs/export", params={"format": "csv", "barcode": "P1"}).text)))
+    assert rows == [list(logstore.LOG_COLUMNS), ["2", "2024-01-01T01:00:00", "P1", "add", "1", "1", ""]]
+
+
+def test_retention_drops_old_sealed_segments(client, monkeypatch):
+    monkeypatch.setattr(logstore, "LOG_SEGMENT_ROWS", 2)
+    log_store.append_rows(rows_at(datetime(2020, 1, 1), 3))
+
+    response = client.post("/stock_logs/compact", params={"retention_days": 30})
+
+    assert response.json() == {"dropped_segments": 1, "merged_segments": 0}
+    assert stored_ids() == [3]
+    assert log_store.first_id() == 3
+
+
+def test_a_failed_migration_leaves_the_flat_table_for_the_next_start(client, monkeypatch):
+    make_flat_table(6000)
+    append_rows = log_store.append_rows
+    calls = []
+
+    def crash_on_second_batch(rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("killed")
+        return append_rows(rows)
+
+    monkeypatch.setattr(log_store, "append_rows", crash_on_second_batch)
+    with pytest.raises(RuntimeError):
+        log_store.init()
+    assert stored_ids() == []
+
+    monkeypatch.setattr(log_store, "append_rows", append_rows)
+    log_store.init()
+    assert stored_ids() == list(range(1, 6001))
+    assert not get_connection().execute("SELECT 1 FROM sqlite_master WHERE name = 'stock_logs'").fetchone()
+
+
+def test_compact_keeps_merged_segments_within_the_day_limit(client, monkeypatch):
+    monkeypatch.setattr(logstore, "LOG_SEGMENT_ROWS", 1)
+    monkeypatch.setattr(logstore, "LOG_SEGMENT_DAYS", 2)
+    # One row per segment: two a day apart, two a week later, one still open
+    for day in (1, 2, 9, 10, 11):
+        log_store.append_rows(rows_at(datetime(2024, 1, day), 1))
+
+    monkeypatch.setattr(logstore, "LOG_SEGMENT_ROWS", 3)
+    assert log_store.compact() == 2
+    spans = [(seg["start_ts"][:10], seg["end_ts"][:10], seg["row_count"], seg["sealed"])
+             for seg in log_store.segment_stats()]
+    assert spans == [
+        ("2024-01-01", "2024-01-02", 2, 1), ("2024-01-09", "2024-01-10", 2, 1), ("2024-01-11", "2024-01-11", 1, 0),
+    ]
+    assert stored_ids() == [1, 2, 3, 4, 5]
@@ -0,0 +1,62 @@
+# backend/tests/test_metrics.py
+
+import pytest
+
+from app import metrics as metrics_module
+from app.metrics import Histogram, Metrics
+from app.routers import metrics as metrics_router
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    """Count from zero: the middleware and /metrics share one Metrics for the process."""
+    fresh = Metrics()
+    monkeypatch.setattr(metrics_module, "metrics", fresh)
+    monkeypatch.setattr(metrics_router, "metrics", fresh)
+    return fresh
+
+
+def samples(text: str) -> dict:
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            result[name] = float(value)
+    return result
+
+
+def test_histograms_are_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.render("t", 'route="/x"') == [
+        't_bucket{route="/x",le="0.1"} 2', 't_bucket{route="/x",le="1.0"} 3', 't_bucket{route="/x",le="+Inf"} 4',
+        't_sum{route="/x"} 3.65', 't_count{route="/x"} 4',
+    ]
+
+
+def test_requests_are_recorded_per_route_template(client, fresh_metrics, add_location, add_item):
+    add_item("BOLT", [(add_location("Shelf"), 4)])
+    client.get("/stock/barcode/BOLT")
+    client.get("/stock/barcode/NOPE")
+    client.get("/no/such/path")
+
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    values = samples(response.text)
+    route = 'method="GET",route="/stock/barcode/{barcode}"'
+    assert values[f"http_requests_total{{{route},status=\"200\"}}"] == 1
+    assert values[f"http_requests_total{{{route},status=\"404\"}}"] == 1
+    assert values[f"http_request_duration_seconds_count{{{route}}}"] == 2
+    assert values[f"http_response_size_bytes_bucket{{{route},le=\"+Inf\"}}"] == 2
+    assert values['http_requests_total{method="GET",route="unmatched",status="404"}'] == 1
+    assert values['http_requests_total{method="POST",route="/stock",status="200"}'] == 1
+    assert values["inventory_items"] == 1
+    assert values["inventory_locations"] == 1
+    assert not any(name.startswith("http_request_errors_total") for name in values)
+
+
+def test_profiles_are_off_by_default(client):
+    assert client.get("/debug/profiles").status_code == 404
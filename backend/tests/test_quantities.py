@@ -0,0 +1,84 @@
+# backend/tests/test_quantities.py
+
+import numpy as np
+
+from app.quantities import QuantityMatrix
+
+
+def totals(matrix: QuantityMatrix, stock_ids, location_ids):
+    return ([matrix.item_total(sid) for sid in stock_ids],
+            [(matrix.location_total(lid), matrix.location_count(lid)) for lid in location_ids])
+
+
+def test_totals_follow_set_move_and_delete():
+    matrix = QuantityMatrix()
+    assert matrix.set(1, 10, 5) == 5
+    matrix.set(1, 20, 3)
+    matrix.set(2, 10, 7)
+    assert matrix.set(2, 10, 4) == -3
+    assert len(matrix) == 3
+    assert totals(matrix, [1, 2], [10, 20]) == ([8, 4], [(9, 2), (3, 1)])
+
+    # A move drops the row at one location and adds to the row at another
+    moved = matrix.drop(1, 10)
+    matrix.set(1, 20, matrix.get(1, 20) + moved)
+    assert matrix.get(1, 10) is None
+    assert matrix.item_rows(1) == [(20, 8)]
+    assert totals(matrix, [1, 2], [10, 20]) == ([8, 4], [(4, 1), (8, 1)])
+
+    assert matrix.drop(2, 10) == 4
+    assert matrix.drop(2, 10) is None
+    matrix.forget_item(2)
+    assert totals(matrix, [1, 2], [10, 20]) == ([8, 0], [(0, 0), (8, 1)])
+    assert len(matrix) == 1
+    assert matrix.ids_at([10]).tolist() == []
+    assert matrix.ids_at([10, 20]).tolist() == [1]
+
+
+def test_freed_slots_and_codes_are_reused():
+    matrix = QuantityMatrix()
+    matrix.set(1, 10, 1)
+    matrix.set(2, 10, 2)
+    matrix.drop(2, 10)
+    matrix.forget_item(2)
+    size = matrix.size
+
+    matrix.set(3, 20, 6)
+
+    assert matrix.size == size
+    assert matrix.item_codes[3] == 1
+    assert matrix.item_total(3) == 6
+    assert matrix.item_total(2) == 0
+    assert matrix.item_rows(2) == []
+    keys, sums = matrix.totals_at([10, 20])
+    assert dict(zip(keys.tolist(), sums.tolist())) == {1: 1, 3: 6}
+
+
+def test_forget_keeps_items_that_still_have_rows():
+    matrix = QuantityMatrix()
+    matrix.set(1, 10, 1)
+    matrix.set(1, 20, 2)
+    matrix.drop(1, 10)
+
+    matrix.forget_item(1)
+
+    assert matrix.item_total(1) == 2
+    assert matrix.get(1, 20) == 2
+
+
+def test_load_matches_incremental_sets():
+    rows = [(5, 30, 2), (1, 10, 4), (5, 10, 1), (2, 20, 9), (1, 30, 0)]
+    loaded, built = QuantityMatrix(), QuantityMatrix()
+    loaded.load(*(np.array(column) for column in zip(*rows)))
+    for sid, lid, qty in rows:
+        built.set(sid, lid, qty)
+
+    for matrix in (loaded, built):
+        assert totals(matrix, [1, 2, 5], [10, 20, 30]) == ([4, 9, 3], [(5, 2), (9, 1), (2, 2)])
+        assert sorted(matrix.item_rows(1)) == [(10, 4), (30, 0)]
+        assert sorted(matrix.ids_at([10, 30]).tolist()) == [1, 5]
+
+    # Writes after a load keep the totals right
+    loaded.set(5, 10, 11)
+    loaded.drop(2, 20)
+    assert totals(loaded, [2, 5], [10, 20]) == ([0, 13], [(15, 2), (0, 0)])
@@ -0,0 +1,55 @@
+# backend/tests/test_scan.py
+
+import pytest
+
+
+@pytest.fixture
+def bins(add_location, add_item):
+    """BOLT with 10 in Bin 1 and 2 in Bin 2."""
+    bin1, bin2 = add_location("Bin 1"), add_location("Bin 2")
+    add_item("BOLT", [(bin1, 10), (bin2, 2)])
+    return bin1, bin2
+
+
+def quantities(client, barcode: str) -> dict:
+    return {row["location_name"]: row["quantity"] for row in client.get(f"/stock/barcode/{barcode}").json()["locations"]}
+
+
+def test_barcode_lookup(client, bins):
+    response = client.get("/stock/barcode/BOLT")
+
+    assert response.status_code == 200
+    assert response.json()["barcode"] == "BOLT"
+    assert quantities(client, "BOLT") == {"Bin 1": 10, "Bin 2": 2}
+    assert client.get("/stock/barcode/NOPE").status_code == 404
+
+
+def test_the_scanner_page_payload_scans_into_the_first_location(client, bins):
+    response = client.post("/scan", json={"barcode": "BOLT", "action": "remove", "amount": 4})
+
+    assert response.status_code == 200, response.text
+    assert quantities(client, "BOLT") == {"Bin 1": 6, "Bin 2": 2}
+    log = client.get("/stock_logs").json()[0]
+    assert (log["action"], log["amount"], log["resulting_qty"]) == ("scan_remove", 4, 6)
+
+
+def test_a_batch_applies_events_in_order_and_reports_failures(client, bins):
+    bin1, bin2 = bins
+    events = [
+        {"barcode": "BOLT", "location_id": bin2, "action": "remove", "quantity": 2},
+        {"barcode": "BOLT", "location_id": bin2, "action": "remove", "quantity": 1},  # Bin 2 is empty by now
+        {"barcode": "NOPE", "location_id": bin1, "quantity": 1},
+        {"barcode": "BOLT", "location_id": bin1, "action": "sideways", "quantity": 1},
+        {"barcode": "BOLT", "location_id": bin1, "quantity": 5},
+    ]
+
+    response = client.post("/scan/batch", json=events)
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["applied"], body["failed"]) == (2, 3)
+    assert [(r["index"], r["ok"], r.get("resulting_qty"), r.get("status_code")) for r in body["results"]] == [
+        (0, True, 0, None), (1, False, None, 400), (2, False, None, 404), (3, False, None, 400), (4, True, 15, None),
+    ]
+    assert quantities(client, "BOLT") == {"Bin 1": 15, "Bin 2": 0}
+    assert [log["action"] for log in client.get("/stock_logs", params={"order": "asc"}).json()][-2:] == ["scan_remove", "scan_add"]
@@ -0,0 +1,75 @@
+# backend/tests/test_search.py
+
+from app.models import Stock
+from app.search import SearchIndex, SCORE_EXACT_CODE, SCORE_NAME, SCORE_OTHER, SCORE_PREFIX_CODE, SCORE_PREFIX_NAME
+
+
+def stock(stock_id: int, name: str, barcode: str, part_id: str = "", **fields) -> Stock:
+    return Stock(id=stock_id, name=name, partId=part_id or barcode, category="Parts", barcode=barcode, status="ok", **fields)
+
+
+def index_of(*items: Stock) -> SearchIndex:
+    index = SearchIndex()
+    for item in items:
+        index.add(item)
+    return index
+
+
+def test_ranking_prefers_codes_then_names():
+    index = index_of(
+        stock(1, "Resistor pack", "RES-100"),
+        stock(2, "Carbon resistor", "CR-7"),
+        stock(3, "Resin", "RSN-1"),
+        stock(4, "Cable", "CB-2", supplier="Resco"),
+        stock(5, "Res", "RES"),
+    )
+
+    matches = index.search("res")
+
+    assert matches == {1: SCORE_PREFIX_CODE, 2: SCORE_NAME, 3: SCORE_PREFIX_NAME, 4: SCORE_OTHER, 5: SCORE_EXACT_CODE}
+    ranked = sorted(matches, key=lambda stock_id: index.rank_key(stock_id, matches[stock_id]))
+    assert ranked == [5, 1, 3, 2, 4]
+
+
+def test_long_queries_intersect_trigrams_and_verify():
+    index = index_of(stock(1, "Hex bolt M8", "HB-8"), stock(2, "Bolt hex M8", "BH-8"))
+
+    assert set(index.search("hex bolt")) == {1}
+    assert set(index.search("  HEX  ")) == {1, 2}
+    assert index.search("") == {}
+    assert index.search("washer") == {}
+
+
+def test_prefix_lookup_by_barcode_and_part_id():
+    index = index_of(
+        stock(1, "a", "ABC-2", "P-10"), stock(2, "b", "ABC-1", "P-2"), stock(3, "c", "ABD-1", "Q-1"), stock(4, "d", "XABC", "P-1"),
+    )
+
+    assert index.prefix("abc") == [2, 1]
+    assert index.prefix("AB", limit=2) == [2, 1]
+    assert index.prefix("p-1", field="partId") == [4, 1]
+    assert index.prefix("zz") == []
+
+
+def test_updates_and_removals_leave_no_stale_entries():
+    index = index_of(stock(1, "Washer", "W-1"), stock(2, "Washer large", "W-2"))
+
+    index.update(stock(1, "Spacer", "S-1"))
+    index.discard(2)
+
+    assert index.search("washer") == {}
+    assert set(index.search("spacer")) == {1}
+    assert index.prefix("w") == []
+    assert index.prefix("s") == [1]
+
+
+def test_stock_search_orders_by_best_match(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    add_item("CR-7", [(shelf, 1)], name="Carbon resistor")
+    add_item("RES-100", [(shelf, 1)], name="Resistor pack")
+
+    found = client.get("/stock", params={"search": "res"}).json()
+
+    assert [item["barcode"] for item in found] == ["RES-100", "CR-7"]
+    suggested = client.get("/stock/suggest", params={"q": "RE"}).json()
+    assert [item["barcode"] for item in suggested] == ["RES-100"]
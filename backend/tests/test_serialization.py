@@ -0,0 +1,54 @@
+# backend/tests/test_serialization.py
+
+from app.changefeed import change_feed
+from app.serialization import FragmentCache, log_fragments, stock_fragments
+
+
+def test_cached_items_follow_their_changes(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 4)])
+    add_item("NUT", [(shelf, 2)])
+    assert client.get("/stock").json()[0]["locations"][0]["quantity"] == 4
+    assert len(stock_fragments) == 2
+
+    client.post("/scan", json={"barcode": "BOLT", "location_id": shelf, "quantity": 1})
+    assert client.get("/stock/barcode/BOLT").json()["locations"][0]["quantity"] == 5
+
+    client.put(f"/locations/{shelf}", json={"name": "Top shelf"})
+    assert [item["locations"][0]["location_name"] for item in client.get("/stock").json()] == ["Top shelf", "Top shelf"]
+
+    client.delete(f"/stock/{bolt}")
+    assert [item["barcode"] for item in client.get("/stock").json()] == ["NUT"]
+
+
+def test_cached_boms_follow_their_changes(client):
+    client.post("/boms", json={"product_barcode": "KIT", "components": {"BOLT": 2}})
+    assert client.get("/boms").json()[0]["components"] == {"BOLT": 2}
+
+    client.put("/boms/KIT", json={"product_barcode": "KIT", "components": {"BOLT": 3}})
+    assert client.get("/boms").json()[0]["components"] == {"BOLT": 3}
+    client.delete("/boms/KIT")
+    assert client.get("/boms").json() == []
+
+
+def test_a_fragment_built_across_a_change_is_not_kept():
+    cache = FragmentCache()
+
+    def build_while_changing():
+        cache.invalidate("BOLT")
+        return b"stale"
+
+    assert cache.get("BOLT", build_while_changing) == b"stale"
+    assert cache.get("BOLT", lambda: b"fresh") == b"fresh"
+    assert cache.get("BOLT", lambda: b"not rebuilt") == b"fresh"
+
+
+def test_a_reload_drops_every_fragment(client, add_location, add_item):
+    add_item("BOLT", [(add_location("Shelf"), 4)])
+    client.get("/stock")
+    client.get("/stock_logs")
+    assert len(stock_fragments) and len(log_fragments)
+
+    change_feed.load()
+
+    assert (len(stock_fragments), len(log_fragments)) == (0, 0)
@@ -0,0 +1,38 @@
+# backend/tests/test_stats.py
+
+from app.changefeed import change_feed
+from app.store import store
+
+
+def test_stats_follow_every_write(client, add_location, add_item):
+    top, bottom = add_location("Top"), add_location("Bottom")
+    bolt = add_item("BOLT", [(top, 12), (bottom, 8)], cost=0.25)
+    nut = add_item("NUT", [(top, 5)], cost=0.1, category="Fasteners")
+    add_item("GEAR", [(bottom, 1)], cost=7.5, category="Drive")
+
+    client.post("/stock/scrap", json={"stock_id": nut, "location_id": top, "quantity": 5})
+    client.post("/stock/transfer", json={"stock_id": bolt, "location_id": top, "to_location_id": bottom, "quantity": 2})
+    client.delete(f"/stock/{store.get_by_barcode('GEAR').id}")
+
+    stats = client.get("/stats").json()
+    assert {key: stats[key] for key in ("items", "units", "value", "scrapped", "low_stock", "out_of_stock")} == {
+        "items": 2, "units": 20, "value": 5.0, "scrapped": 5, "low_stock": 0, "out_of_stock": 1,
+    }
+    assert stats["by_status"] == {"Out of Stock": 1, "Low Stock": 0, "In Stock": 1}
+    assert stats["by_category"] == {"Parts": 1, "Fasteners": 1}
+    # An emptied row still counts as an item placed there
+    assert [(loc["name"], loc["items"], loc["units"]) for loc in stats["by_location"]] == [("Top", 2, 10), ("Bottom", 1, 10)]
+
+    # The running aggregates match a recount from scratch
+    change_feed.load()
+    assert client.get("/stats").json() == stats
+
+
+def test_stats_revalidate(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    add_item("BOLT", [(shelf, 4)])
+    etag = client.get("/stats").headers["ETag"]
+
+    assert client.get("/stats", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/scan", json={"barcode": "BOLT", "location_id": shelf, "quantity": 1})
+    assert client.get("/stats", headers={"If-None-Match": etag}).json()["units"] == 5
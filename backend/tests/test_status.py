@@ -0,0 +1,65 @@
+# backend/tests/test_status.py
+
+import pytest
+
+from app.store import store
+
+
+@pytest.fixture
+def shelves(add_location, add_item):
+    """BOLT 20 and NUT 5 (default threshold 10), WASHER 5 with a threshold of 3."""
+    top, bottom = add_location("Top"), add_location("Bottom")
+    add_item("BOLT", [(top, 12), (bottom, 8)])
+    add_item("NUT", [(top, 5)])
+    add_item("WASHER", [(bottom, 5)], low_stock_threshold=3)
+    return top, bottom
+
+
+def with_status(client, status: str) -> list:
+    return [item["barcode"] for item in client.get("/stock", params={"status": status}).json()]
+
+
+def test_items_start_in_their_buckets(client, shelves):
+    assert with_status(client, "In Stock") == ["BOLT", "WASHER"]
+    assert with_status(client, "Low Stock") == ["NUT"]
+    assert with_status(client, "Out of Stock") == []
+    assert [row["barcode"] for row in client.get("/stock/low_stock").json()] == ["NUT"]
+
+
+def test_writes_move_items_between_buckets(client, shelves):
+    top, bottom = shelves
+    nut, bolt = store.get_by_barcode("NUT").id, store.get_by_barcode("BOLT").id
+
+    response = client.post("/stock/scrap", json={"stock_id": nut, "location_id": top, "quantity": 5})
+    assert response.status_code == 200, response.text
+    response = client.post("/stock/adjust", json={"barcode": "BOLT", "amount": 15, "mode": "remove"})
+    assert response.status_code == 200, response.text
+
+    assert (store.total_quantity(bolt), store.status_of(bolt)) == (5, "Low Stock")
+    assert (store.location_total(top), store.location_total(bottom)) == (0, 10)
+    assert with_status(client, "Out of Stock") == ["NUT"]
+    low = client.get("/stock/low_stock").json()
+    assert [(row["barcode"], row["quantity"], row["stock_status"]) for row in low] == [
+        ("NUT", 0, "Out of Stock"), ("BOLT", 5, "Low Stock"),
+    ]
+
+    # Transfers move units, not totals
+    response = client.post("/stock/transfer", json={"stock_id": bolt, "location_id": bottom, "to_location_id": top, "quantity": 5})
+    assert response.status_code == 200, response.text
+    assert (store.location_total(top), store.location_total(bottom), store.status_of(bolt)) == (5, 5, "Low Stock")
+
+
+def test_a_threshold_change_rebuckets_the_item(client, shelves):
+    washer = store.get_by_barcode("WASHER")
+    body = {
+        "name": washer.name, "partId": washer.partId, "category": washer.category, "barcode": washer.barcode,
+        "status": washer.status, "low_stock_threshold": 6,
+        "locations": [{"location_id": location_id, "quantity": quantity} for location_id, quantity in store.rows_for_item(washer.id)],
+    }
+
+    assert client.put(f"/stock/{washer.id}", json=body).status_code == 200
+    assert with_status(client, "Low Stock") == ["NUT", "WASHER"]
+
+    del body["low_stock_threshold"]
+    assert client.put(f"/stock/{washer.id}", json=body).status_code == 200
+    assert store.get_item(washer.id).low_stock_threshold == 6
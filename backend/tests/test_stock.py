@@ -0,0 +1,95 @@
+# backend/tests/test_stock.py
+
+from app.changefeed import change_feed
+from app.database import open_connection
+from app.store import store
+
+
+def item_body(item_id: int, **changes) -> dict:
+    item = store.get_item(item_id)
+    return {
+        "name": item.name, "partId": item.partId, "category": item.category, "barcode": item.barcode,
+        "status": item.status, "locations": [
+            {"location_id": location_id, "quantity": quantity} for location_id, quantity in store.rows_for_item(item_id)
+        ], **changes,
+    }
+
+
+def test_a_barcode_change_is_logged_under_the_new_barcode(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 4)])
+
+    response = client.put(f"/stock/{bolt}", json=item_body(bolt, barcode="BOLT-M6"))
+
+    assert response.status_code == 200, response.text
+    logs = client.get("/stock_logs", params={"action": "update"}).json()
+    assert [(log["barcode"], log["details"]) for log in logs] == [
+        ("BOLT-M6", {"updated_item": bolt, "previous_barcode": "BOLT"}),
+    ]
+
+
+def test_a_delete_rechecks_the_item_inside_its_transaction(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 4)])
+    # Another worker deletes it; with the poller stopped only the delete's own catch-up sees that
+    change_feed.stop()
+    conn = open_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM stock_locations WHERE stock_id = ?", (bolt,))
+        conn.execute("DELETE FROM stock WHERE id = ?", (bolt,))
+        conn.execute("INSERT INTO change_events (entity, key, op) VALUES ('stock', ?, 'delete')", (str(bolt),))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    assert client.delete(f"/stock/{bolt}").status_code == 404
+    assert client.get("/stock_logs", params={"action": "delete"}).json() == []
+
+
+def pages(client, **params) -> list:
+    """Every page of GET /stock, following X-Next-Cursor."""
+    result, cursor = [], None
+    while True:
+        response = client.get("/stock", params={**params, **({"after": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        result.append([item["barcode"] for item in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return result
+
+
+def test_cursor_pages_follow_the_sort_order(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    for barcode, quantity in (("NUT", 5), ("BOLT", 9), ("WASHER", 1), ("GEAR", 5), ("AXLE", 3)):
+        add_item(barcode, [(shelf, quantity)])
+
+    assert pages(client, limit=2) == [["NUT", "BOLT"], ["WASHER", "GEAR"], ["AXLE"]]
+    assert pages(client, limit=2, sort="name") == [["AXLE", "BOLT"], ["GEAR", "NUT"], ["WASHER"]]
+    # Ties on the sort key are broken by id, in both directions
+    assert pages(client, limit=3, sort="quantity", order="desc") == [["BOLT", "GEAR", "NUT"], ["AXLE", "WASHER"]]
+    assert pages(client, limit=2, sort="name", search="NUT") == [["NUT"]]
+
+
+def test_cursors_are_checked(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    add_item("NUT", [(shelf, 5)])
+    add_item("BOLT", [(shelf, 9)])
+    cursor = client.get("/stock", params={"limit": 1, "sort": "name"}).headers["X-Next-Cursor"]
+
+    response = client.get("/stock", params={"limit": 1, "sort": "cost", "after": cursor})
+    assert (response.status_code, response.json()["detail"]) == (400, "Cursor does not match sort order")
+    assert client.get("/stock", params={"after": "not a cursor"}).status_code == 400
+    assert client.get("/stock", params={"sort": "colour"}).status_code == 400
+
+
+def test_fields_project_each_item(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    add_item("NUT", [(shelf, 5)])
+
+    assert client.get("/stock", params={"fields": "name,barcode"}).json() == [{"id": 1, "name": "NUT", "barcode": "NUT"}]
+    body = client.get("/stock", params={"fields": "locations"}).json()
+    assert body == [{"id": 1, "locations": [{"location_id": shelf, "location_name": "Shelf", "quantity": 5}]}]
+
+    response = client.get("/stock", params={"fields": "name,colour"})
+    assert (response.status_code, response.json()["detail"]) == (400, "Unknown fields: colour")
@@ -0,0 +1,69 @@
+# backend/tests/test_stock_ops.py
+
+import pytest
+
+from app.store import store
+
+
+@pytest.fixture
+def shelves(add_location, add_item):
+    a, b = add_location("Bay A"), add_location("Bay B")
+    bolt = add_item("BOLT", [(a, 10)])
+    return a, b, bolt
+
+
+def test_atomic_batch_with_a_failing_op_is_rejected(client, shelves):
+    a, b, bolt = shelves
+    logs_before = len(client.get("/stock_logs").json())
+
+    response = client.post("/stock/ops", json={"ops": [
+        {"op": "transfer", "stock_id": bolt, "location_id": a, "to_location_id": b, "quantity": 4},
+        {"op": "scrap", "stock_id": bolt, "location_id": a, "quantity": 50},
+        {"op": "adjust", "barcode": "BOLT", "location_id": b, "amount": 1, "mode": "add"},
+    ]})
+
+    assert response.status_code == 409
+    detail = response.json()["detail"]
+    assert (detail["applied"], detail["failed"]) == (0, 1)
+    assert [result["ok"] for result in detail["results"]] == [True, False, True]
+    assert detail["results"][1]["error"] == "Invalid scrap amount"
+    assert store.quantity_at(bolt, a) == 10
+    assert store.quantity_at(bolt, b) is None
+    assert len(client.get("/stock_logs").json()) == logs_before
+
+
+def test_non_atomic_batch_applies_what_passes(client, shelves):
+    a, b, bolt = shelves
+
+    response = client.post("/stock/ops", json={"atomic": False, "ops": [
+        {"op": "transfer", "stock_id": bolt, "location_id": a, "to_location_id": b, "quantity": 4},
+        {"op": "scan", "barcode": "NOPE", "location_id": a, "amount": 1},
+        {"op": "scrap", "stock_id": bolt, "location_id": b, "quantity": 1},
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["applied"], body["failed"]) == (2, 1)
+    assert body["results"][1]["status_code"] == 404
+    assert store.quantity_at(bolt, a) == 6
+    assert store.quantity_at(bolt, b) == 3
+
+
+def test_ops_see_earlier_ops(client, shelves):
+    a, b, bolt = shelves
+
+    # B holds nothing until the transfer, and the scrap then empties A
+    response = client.post("/stock/ops", json={"ops": [
+        {"op": "transfer", "stock_id": bolt, "location_id": a, "to_location_id": b, "quantity": 7},
+        {"op": "scan", "stock_id": bolt, "location_id": b, "quantity": 2, "action": "remove"},
+        {"op": "scrap", "stock_id": bolt, "location_id": a, "quantity": 3},
+        {"op": "adjust", "stock_id": bolt, "amount": 5, "mode": "remove"},
+    ]})
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert results[0]["to_qty"] == 7
+    assert results[1]["resulting_qty"] == 5
+    assert results[2]["resulting_qty"] == 0
+    assert results[3]["quantity"] == 0
+    assert store.total_quantity(bolt) == 0
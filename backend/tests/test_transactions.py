@@ -0,0 +1,56 @@
+# backend/tests/test_transactions.py
+
+import pytest
+from fastapi import HTTPException
+
+from app.store import store
+from app.transactions import StockTransaction
+
+
+def test_build_with_short_component_changes_nothing(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 10)])
+    nut = add_item("NUT", [(shelf, 1)])
+    client.post("/boms", json={"product_barcode": "KIT", "components": {"BOLT": 2, "NUT": 1}})
+    logs_before = len(client.get("/stock_logs").json())
+
+    response = client.post("/stock", data={
+        "name": "Kit", "partId": "KIT", "category": "Parts", "barcode": "KIT", "status": "ok",
+        "locations": [shelf], "quantities": [2],
+    })
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Not enough NUT in stock"
+    # BOLT had enough, but nothing of the build was applied
+    assert store.total_quantity(bolt) == 10
+    assert store.total_quantity(nut) == 1
+    assert store.get_by_barcode("KIT") is None
+    assert client.get("/stock/barcode/KIT").status_code == 404
+    assert len(client.get("/stock_logs").json()) == logs_before
+
+
+def test_build_consumes_components(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 10)])
+    nut = add_item("NUT", [(shelf, 5)])
+    client.post("/boms", json={"product_barcode": "KIT", "components": {"BOLT": 2, "NUT": 1}})
+
+    add_item("KIT", [(shelf, 3)])
+
+    assert store.total_quantity(bolt) == 4
+    assert store.total_quantity(nut) == 2
+
+
+def test_exception_in_block_discards_staged_changes(client, add_location, add_item):
+    shelf = add_location("Shelf")
+    bolt = add_item("BOLT", [(shelf, 10)])
+
+    with pytest.raises(HTTPException):
+        with StockTransaction([bolt]) as tx:
+            tx.adjust(bolt, shelf, -4)
+            tx.log("adjust", "BOLT", -4, 6)
+            tx.adjust(bolt, shelf, -7)  # Below zero
+
+    assert store.quantity_at(bolt, shelf) == 10
+    with StockTransaction([bolt]) as tx:
+        assert tx.quantity(bolt, shelf) == 10
@@ -0,0 +1,109 @@
+# backend/tests/test_uploads.py
+
+import hashlib
+
+import pytest
+
+from app import uploads
+from app.database import get_connection
+
+
+def stored(kind: str) -> list:
+    return sorted(path.name for path in (uploads.UPLOAD_DIR / kind).iterdir())
+
+
+@pytest.fixture
+def kit(client, add_location, add_item):
+    """A KIT needs 5 BOLT per unit and only 1 BOLT is stocked."""
+    bay = add_location("Bay A")
+    add_item("BOLT", [(bay, 1)])
+    response = client.post("/boms", json={"product_barcode": "KIT", "components": {"BOLT": 5}})
+    assert response.status_code == 200, response.text
+    return bay
+
+
+def post_item(client, barcode: str, bay: int, files: dict):
+    return client.post("/stock", data={
+        "name": barcode, "partId": barcode, "category": "Parts", "barcode": barcode, "status": "ok",
+        "locations": [bay], "quantities": [1],
+    }, files=files)
+
+
+def refs() -> dict:
+    return dict(get_connection().execute("SELECT url, refs FROM upload_refs"))
+
+
+def test_identical_content_is_stored_once_and_counted(client, kit, monkeypatch):
+    monkeypatch.setattr(uploads, "GRACE_SECONDS", -1)
+    first = post_item(client, "SPEC-1", kit, {"file": ("a.PDF", b"same bytes", "application/pdf")}).json()
+    second = post_item(client, "SPEC-2", kit, {"file": ("b.pdf", b"same bytes", "application/pdf")}).json()
+
+    url = f"/static/files/{hashlib.sha256(b'same bytes').hexdigest()}.pdf"
+    assert first["file_url"] == second["file_url"] == url
+    assert stored("files") == [url.rsplit("/", 1)[1]]
+    assert refs() == {url: 2}
+
+    client.delete(f"/stock/{first['id']}")
+    assert (refs(), len(stored("files"))) == ({url: 1}, 1)
+    client.delete(f"/stock/{second['id']}")
+    assert (refs(), stored("files")) == ({}, [])
+
+
+def test_each_kind_has_its_own_size_limit(client, kit, monkeypatch):
+    monkeypatch.setitem(uploads.MAX_BYTES, "files", 10)
+
+    response = post_item(client, "BIG", kit, {"file": ("big.bin", b"x" * 11, "application/octet-stream")})
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "big.bin is larger than 10 bytes"
+    assert stored("files") == []
+
+
+def test_the_sweep_removes_stale_unreferenced_files(client, kit, monkeypatch):
+    kept = post_item(client, "SPEC", kit, {"file": ("spec.pdf", b"kept", "application/pdf")}).json()["file_url"]
+    orphan = uploads.UPLOAD_DIR / "files" / f"{hashlib.sha256(b'orphan').hexdigest()}.pdf"
+    orphan.write_bytes(b"orphan")
+    (uploads.UPLOAD_DIR / "files" / ".abc.part").write_bytes(b"partial")
+    legacy = uploads.UPLOAD_DIR / "files" / "0b8e_manual.pdf"
+    legacy.write_bytes(b"old scheme")
+
+    assert uploads.sweep(get_connection()) == 0  # Everything is still within its grace period
+    monkeypatch.setattr(uploads, "GRACE_SECONDS", -1)
+    assert uploads.sweep(get_connection()) == 2
+    assert stored("files") == sorted([legacy.name, kept.rsplit("/", 1)[1]])
+
+
+def test_a_failed_create_removes_what_it_stored(client, kit):
+    response = post_item(client, "KIT", kit, {"file": ("manual.pdf", b"kit manual", "application/pdf")})
+
+    assert response.status_code == 400
+    assert stored("files") == []
+
+
+def test_a_failed_create_keeps_content_items_refer_to(client, kit):
+    response = post_item(client, "SPEC", kit, {"file": ("spec.pdf", b"shared", "application/pdf")})
+    assert response.status_code == 200, response.text
+    kept = stored("files")
+
+    response = post_item(client, "KIT", kit, {"file": ("copy.pdf", b"shared", "application/pdf")})
+
+    assert response.status_code == 400
+    assert stored("files") == kept and len(kept) == 1
+
+
+def test_oversized_requests_are_refused_before_they_are_spooled(client, kit, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_REQUEST_BYTES", 4096)
+
+    response = post_item(client, "BIG", kit, {"file": ("big.bin", b"x" * 8192, "application/octet-stream")})
+    assert response.status_code == 413
+
+    # Without a Content-Length the limit applies to the stream itself
+    boundary = "limit"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.bin\"\r\n\r\n".encode()
+            + b"x" * 8192 + f"\r\n--{boundary}--\r\n".encode())
+    chunks = (body[i:i + 1024] for i in range(0, len(body), 1024))
+    response = client.post("/stock", content=chunks,
+                           headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Request is larger than 4096 bytes"
+    assert client.get("/stock/barcode/BIG").status_code == 404
@@ -0,0 +1,77 @@
+# backend/tests/test_versioning.py
+
+import pytest
+
+from app import changefeed
+from app.changefeed import change_feed
+
+
+@pytest.fixture
+def shelf(add_location, add_item):
+    shelf = add_location("Shelf")
+    add_item("BOLT", [(shelf, 4)])
+    add_item("NUT", [(shelf, 2)])
+    return shelf
+
+
+def revalidate(client, path: str, etag: str, **params) -> int:
+    return client.get(path, params=params, headers={"If-None-Match": etag}).status_code
+
+
+def test_unchanged_collections_answer_304(client, shelf):
+    first = client.get("/stock")
+    etag = first.headers["ETag"]
+
+    assert revalidate(client, "/stock", etag) == 304
+    assert revalidate(client, "/stock", etag, sort="name") == 200
+    categories = client.get("/categories").headers["ETag"]
+
+    client.post("/scan", json={"barcode": "BOLT", "location_id": shelf, "quantity": 1})
+    assert revalidate(client, "/stock", etag) == 200
+    # Categories aren't built from stock, so their copy stays current
+    assert revalidate(client, "/categories", categories) == 304
+
+    # Items embed their locations' names
+    etag = client.get("/stock").headers["ETag"]
+    locations = client.get("/locations").headers["ETag"]
+    client.put(f"/locations/{shelf}", json={"name": "Top shelf"})
+    assert revalidate(client, "/stock", etag) == 200
+    assert revalidate(client, "/locations", locations) == 200
+
+
+def test_since_sends_only_what_changed(client, shelf, add_item):
+    version = int(client.get("/stock").headers["X-Inventory-Version"])
+    bolt, nut = (item["id"] for item in client.get("/stock").json())
+
+    client.post("/scan", json={"barcode": "NUT", "location_id": shelf, "quantity": 1})
+    client.delete(f"/stock/{bolt}")
+    add_item("WASHER", [(shelf, 3)])
+
+    body = client.get("/stock", params={"since": version}).json()
+    assert body["reset"] is False
+    assert [(item["barcode"], item["locations"][0]["quantity"]) for item in body["changed"]] == [("NUT", 3), ("WASHER", 3)]
+    assert body["deleted"] == [bolt]
+
+    body = client.get("/stock", params={"since": body["version"]}).json()
+    assert (body["changed"], body["deleted"]) == ([], [])
+
+    client.put(f"/locations/{shelf}", json={"name": "Top shelf"})
+    body = client.get("/stock", params={"since": body["version"]}).json()
+    assert [item["locations"][0]["location_name"] for item in body["changed"]] == ["Top shelf", "Top shelf"]
+    assert [loc["name"] for loc in client.get("/locations", params={"since": version}).json()["changed"]] == ["Top shelf"]
+
+    response = client.get("/stock", params={"since": version, "limit": 10})
+    assert response.status_code == 400
+
+
+def test_since_resets_clients_behind_the_retained_events(client, shelf, monkeypatch):
+    monkeypatch.setattr(changefeed, "CHANGE_FEED_RETAIN", 1)
+    client.post("/scan", json={"barcode": "BOLT", "location_id": shelf, "quantity": 1})
+    change_feed.trim()
+
+    body = client.get("/stock", params={"since": 0}).json()
+
+    assert body["reset"] is True
+    assert sorted(item["barcode"] for item in body["changed"]) == ["BOLT", "NUT"]
+    body = client.get("/boms", params={"since": 0}).json()
+    assert (body["reset"], body["changed"]) == (True, [])
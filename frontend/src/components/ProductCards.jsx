@@ -6,7 +6,9 @@ export default function ProductCards({ products }) {
         {products.slice(0, 3).map((product) => (
           <div key={product.id} className="bg-gray-700 p-4 rounded text-center">
             <div className="text-sm">{product.name}</div>
-            <div className="text-lg font-bold">{product.quantity}</div>
+            <div className="text-lg font-bold">
+              {product.locations.reduce((sum, loc) => sum + loc.quantity, 0)}
+            </div>
           </div>
         ))}
       </div>
@@ -1,17 +1,43 @@
+import { useEffect, useState } from 'react';
+import { API_BASE } from '../config';
+
+const ACTIONS = 'create,update,delete,scan_add,scan_remove,transfer_to,scrap,consume';
+const MAX_ITEMS = 8;
+
+const describe = (log) => {
+  switch (log.action) {
+    case 'scan_add': return `Added ${log.amount} × ${log.barcode}`;
+    case 'scan_remove': return `Removed ${log.amount} × ${log.barcode}`;
+    case 'transfer_to': return `Moved ${log.amount} × ${log.barcode}`;
+    case 'scrap': return `Scrapped ${log.amount} × ${log.barcode}`;
+    case 'consume': return `Used ${log.amount} × ${log.barcode} in a build`;
+    case 'create': return `New part ${log.barcode}`;
+    case 'update': return `Updated ${log.barcode}`;
+    case 'delete': return `Deleted ${log.barcode}`;
+    default: return `${log.action} ${log.barcode}`;
+  }
+};
+
 export default function RecentActivities() {
-  const activities = [
-    'New order placed',
-    'Product restocked',
-    'Updated product quantity',
-    'Checked stock levels',
-  ];
+  const [activities, setActivities] = useState([]);
+
+  useEffect(() => {
+    // Pushed by the server as changes happen; the browser reconnects and resumes by itself
+    const source = new EventSource(`${API_BASE}/events?action=${ACTIONS}`);
+    source.addEventListener('log', (e) => {
+      const { logs } = JSON.parse(e.data);
+      setActivities((prev) => [...logs.reverse(), ...prev].slice(0, MAX_ITEMS));
+    });
+    return () => source.close();
+  }, []);
 
   return (
     <div className="bg-gray-800 rounded p-4 shadow">
       <h2 className="text-lg font-semibold mb-2">Recent Activities</h2>
       <ul className="text-sm space-y-2 text-gray-400">
-        {activities.map((act, i) => (
-          <li key={i}>• {act}</li>
+        {activities.length === 0 && <li>Waiting for activity…</li>}
+        {activities.map((log) => (
+          <li key={log.id}>• {describe(log)}</li>
         ))}
       </ul>
     </div>
@@ -1,9 +1,16 @@
+import { useEffect, useState } from 'react';
+import { API_BASE } from '../config';
+
 export default function RequisitionList() {
-  const requisitions = [
-    { item: 'Dinner Set', units: 10 },
-    { item: 'Sports Bottles', units: 15 },
-    { item: 'Coffee Mugs', units: 150 },
-  ];
+  const [requisitions, setRequisitions] = useState([]);
+
+  useEffect(() => {
+    // Items at or below their reorder point, least days of cover first
+    fetch(`${API_BASE}/analytics/reorder?limit=10`)
+      .then((res) => (res.ok ? res.json() : []))
+      .then(setRequisitions)
+      .catch((error) => console.error('Error fetching reorder list:', error));
+  }, []);
 
   return (
     <div className="bg-gray-800 rounded p-4 shadow">
@@ -17,11 +24,18 @@ export default function RequisitionList() {
           </tr>
         </thead>
         <tbody>
-          {requisitions.map((req, i) => (
-            <tr key={i} className="border-b border-gray-700">
-              <td className="p-2">{req.item}</td>
-              <td className="p-2">{req.units}</td>
-              <td className="p-2 text-gray-500">-</td>
+          {requisitions.length === 0 && (
+            <tr>
+              <td colSpan={3} className="p-2 text-gray-500">Nothing needs reordering</td>
+            </tr>
+          )}
+          {requisitions.map((req) => (
+            <tr key={req.stock_id} className="border-b border-gray-700">
+              <td className="p-2">{req.name} <span className="text-gray-500">({req.barcode})</span></td>
+              <td className="p-2">{req.order_qty}</td>
+              <td className="p-2 text-gray-500">
+                {req.on_hand} on hand, {req.days_of_cover ?? '—'} days of cover at {req.rate_per_day}/day
+              </td>
             </tr>
           ))}
         </tbody>
@@ -1,15 +1,27 @@
+import { useEffect, useState } from 'react';
+import { API_BASE } from '../config';
+
 export default function StatWidgets() {
+  const [totals, setTotals] = useState(null);
+
+  useEffect(() => {
+    fetch(`${API_BASE}/stats`)
+      .then((res) => (res.ok ? res.json() : null))
+      .then(setTotals)
+      .catch((error) => console.error('Error fetching stats:', error));
+  }, []);
+
   const stats = [
-    { label: 'No. of Sales', value: '2,225' },
-    { label: 'Last Month Profit', value: '57.43%' },
-    { label: 'Net Profit', value: '61.37%' },
-    { label: 'Items in Stock', value: '96' },
+    { label: 'Items in Stock', value: totals?.items },
+    { label: 'Total Units', value: totals?.units },
+    { label: 'Inventory Value', value: totals && `$${totals.value.toLocaleString(undefined, { minimumFractionDigits: 2 })}` },
+    { label: 'Low / Out of Stock', value: totals && `${totals.low_stock} / ${totals.out_of_stock}` },
   ];
 
   return stats.map((stat, i) => (
     <div key={i} className="bg-gray-800 rounded p-4 shadow">
       <div className="text-sm opacity-70">{stat.label}</div>
-      <div className="text-xl font-bold">{stat.value}</div>
+      <div className="text-xl font-bold">{stat.value?.toLocaleString() ?? '—'}</div>
     </div>
   ));
 }
@@ -12,7 +12,7 @@ import {
   Trash2,
   ArrowLeftRight,
 } from "lucide-react";
-import { API_BASE as CONFIG_API_BASE } from "../../config";
+import { API_BASE as CONFIG_API_BASE, imageVariant } from "../../config";
 import TransferItemModal from "./TransferItemModal";
 import ScrapItemModal from "./ScrapItemModal";
 
@@ -110,7 +110,7 @@ const ItemDetailsModal = ({ isOpen, onClose, item, onEdit }) => {
   }, [isOpen]);
 
   // Compute debug info (don’t rely on item existing yet)
-  const imageSrc = item?.image_url ? joinUrl(SAFE_API_BASE, item.image_url) : "";
+  const imageSrc = item?.image_url ? joinUrl(SAFE_API_BASE, imageVariant(item.image_url, "preview")) : "";
   useEffect(() => {
     console.debug("[ItemDetailsModal] SAFE_API_BASE:", SAFE_API_BASE);
     console.debug("[ItemDetailsModal] item?.image_url:", item?.image_url);
@@ -1,6 +1,6 @@
 // src/components/stockPage/StockItemPopup.jsx
 import React, { useState } from 'react';
-import { API_BASE } from '../../config';
+import { API_BASE, imageVariant } from '../../config';
 import AdjustQuantityModal from './AdjustQuantityModal.jsx';
 
 export default function StockItemPopup({ item, onClose, onEdit, onDelete }) {
@@ -20,7 +20,7 @@ export default function StockItemPopup({ item, onClose, onEdit, onDelete }) {
           </button>
           <div className="flex gap-4">
             <img
-              src={item.image_url ? `${API_BASE}${item.image_url}` : '/placeholder.png'}
+              src={item.image_url ? `${API_BASE}${imageVariant(item.image_url, 'thumb')}` : '/placeholder.png'}
               alt={item.name}
               className="w-32 h-32 object-cover rounded"
             />
@@ -1,5 +1,5 @@
 import React from 'react';
-import { API_BASE } from '../../config';
+import { API_BASE, imageVariant } from '../../config';
 
 export default function StockItemWidget({ item, onClick, selectedLocation }) {
   let displayedQty = 0;
@@ -25,7 +25,7 @@ export default function StockItemWidget({ item, onClick, selectedLocation }) {
       <div className="w-full h-32 flex items-center justify-center">
         {item.image_url ? (
           <img
-            src={`${API_BASE}${item.image_url}`}
+            src={`${API_BASE}${imageVariant(item.image_url, 'thumb')}`}
             alt={item.name}
             className="h-full object-contain"
             onError={(e) => { e.target.style.display = 'none'; }}
@@ -1,3 +1,7 @@
 //export const API_BASE = import.meta.env.VITE_API_BASE
 //export const API_BASE = '/api';
 export const API_BASE = "http://localhost:8000";
+
+// Resized copy of an uploaded image: size is 'thumb' or 'preview'
+export const imageVariant = (url, size) =>
+  url && url.startsWith('/static/images/') ? `/images/${size}/${url.slice('/static/images/'.length)}` : url;
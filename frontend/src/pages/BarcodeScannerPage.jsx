@@ -68,8 +68,8 @@ export default function BarcodeScannerPage() {
 
       if (!res.ok) throw new Error("Failed to update stock");
 
-      const updatedItem = await res.json();
-      setScannedData(updatedItem);
+      // The scan response only echoes the item; reload it for fresh quantities
+      await fetchItem(scannedData.barcode);
       setAdjustAmount('');
     } catch (err) {
       setError(err.message);
@@ -96,8 +96,11 @@ export default function BarcodeScannerPage() {
         <div className="mt-4 bg-white text-black p-4 rounded shadow space-y-2">
           <h2 className="text-lg font-semibold">Scanned Item</h2>
           <p><strong>Name:</strong> {scannedData.name}</p>
-          <p><strong>Quantity:</strong> {scannedData.quantity}</p>
-          <p><strong>Location:</strong> {scannedData.location}</p>
+          <p><strong>Quantity:</strong> {(scannedData.locations || []).reduce((sum, loc) => sum + loc.quantity, 0)}</p>
+          <p>
+            <strong>Location:</strong>{' '}
+            {(scannedData.locations || []).map((loc) => `${loc.location_name} (${loc.quantity})`).join(', ') || '-'}
+          </p>
           <p><strong>Status:</strong> {scannedData.status}</p>
 
           <div className="mt-4 flex flex-col sm:flex-row items-center space-y-2 sm:space-y-0 sm:space-x-4">
@@ -17,7 +17,8 @@ export default function InventoryDashboard() {
   useEffect(() => {
     const fetchProducts = async () => {
       try {
-        const res = await fetch(`${API_BASE}/stock`);
+        // Only the few cards shown; totals come from /stats
+        const res = await fetch(`${API_BASE}/stock?limit=3&fields=name,locations`);
         if (!res.ok) {
           console.warn('Products fetch failed:', res.status);
           setProducts([]);
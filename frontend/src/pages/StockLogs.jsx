@@ -1,20 +1,35 @@
 import { useEffect, useState } from 'react';
 import { API_BASE } from '../config';
 
+const PAGE_SIZE = 500;
+
 export default function StockLogsPage() {
   const [logs, setLogs] = useState([]);
+  const [cursor, setCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+
+  // The API pages the log; ask for the oldest entries first and follow
+  // X-Next-Cursor for the rest
+  const fetchLogs = async (after = null) => {
+    setLoading(true);
+    try {
+      const params = new URLSearchParams({ order: 'asc', limit: PAGE_SIZE });
+      if (after !== null) params.set('after', after);
+      const res = await fetch(`${API_BASE}/stock_logs?${params}`);
+      const data = await res.json();
+      const page = Array.isArray(data) ? data : [];
+      setLogs(prev => (after === null ? page : [...prev, ...page]));
+      setCursor(res.headers.get('X-Next-Cursor'));
+    } catch (err) {
+      console.error('Failed to fetch logs:', err);
+      if (after === null) setLogs([]);
+      setCursor(null);
+    } finally {
+      setLoading(false);
+    }
+  };
 
   useEffect(() => {
-    const fetchLogs = async () => {
-      try {
-        const res = await fetch(`${API_BASE}/stock_logs`);
-        const data = await res.json();
-        setLogs(Array.isArray(data) ? data : []);
-      } catch (err) {
-        console.error('Failed to fetch logs:', err);
-        setLogs([]);
-      }
-    };
     fetchLogs();
   }, []);
 
@@ -95,6 +110,15 @@ export default function StockLogsPage() {
           </tbody>
         </table>
       </div>
+      {cursor && (
+        <button
+          onClick={() => fetchLogs(cursor)}
+          disabled={loading}
+          className="mt-4 px-3 py-2 bg-blue-600 rounded-md hover:bg-blue-700 disabled:opacity-50"
+        >
+          {loading ? 'Loading...' : 'Load more'}
+        </button>
+      )}
     </div>
   );
 }